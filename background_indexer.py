@@ -0,0 +1,247 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from .folder_scanner import SUPPORTED_EXTENSIONS, extract_metadata, get_file_type
+from .metadata_index import get_metadata_index, normalize_path, stat_signature
+from .thumbnail_cache import get_thumbnail_cache
+from .gallery_stats import get_gallery_stats
+
+BACKGROUND_INDEX = os.environ.get("COMFYUI_GALLERY_BACKGROUND_INDEX", "1") != "0"
+PRIORITY_VISIBLE, PRIORITY_RECENT, PRIORITY_BACKLOG = 0, 1, 2  # Lower runs first
+PRIORITY_NAMES = ("visible", "recent", "backlog")
+RECENT_SECONDS = float(os.environ.get("COMFYUI_GALLERY_INDEX_RECENT_DAYS", "2")) * 86400  # Folders modified within are "recent"
+BUSY_DUTY = 0.1  # Share of the time visible-folder work may take while a prompt executes
+IDLE_CHECK_INTERVAL = 0.5  # Seconds between prompt queue checks while paused
+
+
+def queue_busy():
+    """True while ComfyUI's prompt queue is executing or has prompts waiting."""
+    try:
+        from server import PromptServer
+        return PromptServer.instance.prompt_queue.get_tasks_remaining() > 0
+    except Exception:
+        return False
+
+
+def wait_while_busy(interrupt=None):
+    """Blocks while the prompt queue is busy, or until interrupt() returns True. Returns whether it had to wait."""
+    waited = False
+    while queue_busy() and not (interrupt is not None and interrupt()):
+        waited = True
+        time.sleep(IDLE_CHECK_INTERVAL)
+    return waited
+
+
+def folder_priority(path):
+    """PRIORITY_RECENT for folders modified within RECENT_SECONDS, else PRIORITY_BACKLOG."""
+    try:
+        recent = time.time() - os.stat(path).st_mtime < RECENT_SECONDS
+    except OSError:
+        recent = False
+    return PRIORITY_RECENT if recent else PRIORITY_BACKLOG
+
+
+class BackgroundIndexer:
+    """
+    Fills the metadata index (and, for visible and recent folders, the thumbnail cache) on one
+    background thread, folder by folder in priority order: folders being viewed, then recently
+    modified ones, then the cold backlog. It stays out of generation's way: backlog and recent work
+    pause while the prompt queue is busy and visible-folder work is throttled to BUSY_DUTY. The queue
+    is persisted in the index database, and files already indexed are skipped, so work resumes after a restart.
+    """
+
+    def __init__(self, enabled=BACKGROUND_INDEX):
+        self.enabled = enabled
+        self._heap = []  # (priority, order, path); entries whose priority no longer matches _tasks are stale
+        self._tasks = {}  # path -> (priority, root, recursive)
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._restored = False
+        self.current = None  # Folder being indexed
+        self.paused = False
+
+    def _push(self, path, root, priority, recursive):
+        """Adds or upgrades a task (caller holds the lock). Returns False if an equal or better one is queued."""
+        queued = self._tasks.get(path)
+        if queued is not None:
+            if queued[0] <= priority and (queued[2] or not recursive):
+                return False
+            priority, recursive = min(priority, queued[0]), recursive or queued[2]
+        self._tasks[path] = (priority, root, recursive)
+        heapq.heappush(self._heap, (priority, next(self._order), path))
+        return True
+
+    def _pop(self):
+        """Returns (path, (priority, root, recursive)) of the best task, or None (caller holds the lock)."""
+        while self._heap:
+            priority, _, path = heapq.heappop(self._heap)
+            task = self._tasks.get(path)
+            if task is not None and task[0] == priority:
+                del self._tasks[path]
+                return path, task
+        return None
+
+    def _best_priority(self):
+        """Returns the priority of the best queued task, or None. Checked per file, so it peeks the heap."""
+        with self._lock:
+            while self._heap:
+                priority, _, path = self._heap[0]
+                task = self._tasks.get(path)
+                if task is not None and task[0] == priority:
+                    return priority
+                heapq.heappop(self._heap)  # Stale, _pop would skip it as well
+            return None
+
+    def _start(self):
+        """Starts the worker thread if it isn't running (caller holds the lock)."""
+        if self._thread is None and self._tasks:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="GalleryIndexer")
+            self._thread.start()
+
+    def resume(self):
+        """Reloads the tasks left over from the last run and continues them."""
+        index = get_metadata_index()
+        if not self.enabled or index is None:
+            return
+        with self._lock:
+            if not self._restored:
+                self._restored = True
+                for path, root, priority, recursive in index.queued_folders():
+                    self._push(path, root, priority, recursive)
+            self._start()
+
+    def schedule(self, tasks):
+        """Queues [(folder path, root, priority, recursive)]; recursive tasks queue every subfolder in turn."""
+        index = get_metadata_index()
+        if not self.enabled or index is None:
+            return
+        self.resume()
+        with self._lock:
+            added = [
+                (path, root, priority, recursive) for path, root, priority, recursive in
+                ((os.path.abspath(path), root, priority, recursive) for path, root, priority, recursive in tasks)
+                if self._push(path, root, priority, recursive)
+            ]
+            self._start()
+        if added:
+            index.queue_folders(added)
+
+    def status(self):
+        """Returns the queued folders per priority, the folder being indexed and whether work is paused."""
+        with self._lock:
+            queued = dict.fromkeys(PRIORITY_NAMES, 0)
+            for priority, _, _ in self._tasks.values():
+                queued[PRIORITY_NAMES[priority]] += 1
+            status = {"enabled": self.enabled, "queued": queued, "current": self.current, "paused": self.paused}
+        status["busy"] = queue_busy()
+        return status
+
+    def _run(self):
+        while True:
+            with self._lock:
+                task = self._pop()
+                if task is None:
+                    self._thread = None
+                    self.current = None
+                    return
+                path, (priority, root, recursive) = task
+                self.current = path
+            try:
+                finished = self._index_folder(path, root, priority, recursive)
+            except Exception as e:
+                print(f"Gallery: Error indexing {path} in the background: {e}")
+                finished = True
+            with self._lock:
+                if not finished:
+                    # Preempted, the rest comes later; its subfolders are queued already
+                    self._push(path, root, priority, False)
+                    continue
+                queued_again = path in self._tasks
+            if not queued_again:
+                get_metadata_index().dequeue_folder(path)
+
+    def _yield(self, priority, work_seconds):
+        """
+        Gives way to generation: throttles visible-folder work to BUSY_DUTY and pauses the rest while the
+        prompt queue is busy. Returns False if a better-priority task is waiting and this folder should stop.
+        """
+        if priority == PRIORITY_VISIBLE:
+            if queue_busy():
+                time.sleep(work_seconds * (1 - BUSY_DUTY) / BUSY_DUTY)
+            return True
+
+        def preempted():
+            best = self._best_priority()
+            return best is not None and best < priority
+
+        self.paused = True
+        try:
+            if wait_while_busy(preempted):
+                get_gallery_stats().count("background_pauses")
+        finally:
+            self.paused = False
+        return not preempted()
+
+    def _index_folder(self, path, root, priority, recursive):
+        """Indexes the files of one folder and queues its subfolders. Returns False when preempted."""
+        index = get_metadata_index()
+        if index is None:
+            return True
+        files = []
+        subfolders = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if recursive and not entry.name.startswith("."):
+                                subfolders.append(entry.path)
+                        elif entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                            files.append(entry)
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Gallery: Background indexer can't list {path}: {e}")
+            return True
+
+        if subfolders:
+            self.schedule([(subfolder, root, folder_priority(subfolder), True) for subfolder in subfolders])
+
+        known = index.signatures(path)
+        thumbnails = get_thumbnail_cache() if priority < PRIORITY_BACKLOG else None
+        stats = get_gallery_stats()
+        work_seconds = 0.0
+        for entry in files:
+            if not self._yield(priority, work_seconds):
+                index.flush()
+                return False
+            started = time.perf_counter()
+            try:
+                stat_result = entry.stat()
+                if known.get(normalize_path(entry.path)) != stat_signature(stat_result):
+                    extract_metadata(entry.path, stat_result, index, "summary")
+                    stats.count("background_indexed")
+                if thumbnails is not None and get_file_type(entry.path) != "unknown":
+                    thumbnails.request(entry.path, stat_result).result()  # Returns at once when already cached
+            except Exception as e:
+                print(f"Gallery: Background indexer skipped {entry.path}: {e}")
+            work_seconds = time.perf_counter() - started
+        index.flush()
+        return True
+
+
+_indexer = None
+_indexer_lock = threading.Lock()
+
+
+def get_background_indexer():
+    """Returns the shared background indexer."""
+    global _indexer
+    if _indexer is None:
+        with _indexer_lock:
+            if _indexer is None:
+                _indexer = BackgroundIndexer()
+    return _indexer
@@ -0,0 +1,68 @@
+"""
+Compares the header-only PNG chunk reader against the previous PIL based extraction.
+
+Usage: python benchmarks/bench_png_metadata.py <folder with ComfyUI PNG outputs> [--limit N]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import load_gallery_module, find_files, time_per_call
+
+
+def pil_extract(path):
+    """The extraction buildMetadata did before the chunk reader: full PIL open plus img.info."""
+    from PIL import Image
+    with Image.open(path) as img:
+        resolution = (img.width, img.height)
+        info = dict(img.info)
+    for key in ("prompt", "workflow"):
+        if isinstance(info.get(key), str):
+            info[key] = json.loads(info[key])
+    return resolution, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    png_reader = load_gallery_module("png_reader")
+    metadata_extractor = load_gallery_module("metadata_extractor")
+
+    def chunk_extract(path):
+        width, height, info = png_reader.read_png_info(path)
+        for key in ("prompt", "workflow"):
+            if isinstance(info.get(key), str):
+                info[key] = json.loads(info[key])
+        return (width, height), info
+
+    files = find_files(args.folder, (".png",))[:args.limit]
+    if not files:
+        sys.exit(f"No PNG files found below {args.folder}")
+
+    # Both readers must agree on what the gallery uses before timing them
+    mismatches = 0
+    for path in files:
+        pil_resolution, pil_info = pil_extract(path)
+        chunk_resolution, chunk_info = chunk_extract(path)
+        if pil_resolution != chunk_resolution or any(pil_info.get(k) != chunk_info.get(k) for k in ("prompt", "workflow")):
+            mismatches += 1
+            print(f"Mismatch: {path}")
+
+    pil_time = time_per_call(pil_extract, files, args.repeat)
+    chunk_time = time_per_call(chunk_extract, files, args.repeat)
+    build_time = time_per_call(metadata_extractor.buildMetadata, files, args.repeat)
+
+    print(f"files:               {len(files)} ({mismatches} mismatches)")
+    print(f"PIL open + info:     {pil_time * 1e6:10.1f} us/file")
+    print(f"chunk reader:        {chunk_time * 1e6:10.1f} us/file ({pil_time / chunk_time:.1f}x faster)")
+    print(f"buildMetadata:       {build_time * 1e6:10.1f} us/file")
+
+
+if __name__ == "__main__":
+    main()
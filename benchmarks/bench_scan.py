@@ -0,0 +1,172 @@
+"""
+Benchmarks the scanner end to end on a synthetic (or given) output tree: cold and warm scan time,
+per-file extraction cost, listing response size, change detection and peak RSS.
+
+Usage: python benchmarks/bench_scan.py [--files N] [--depth D] [--fanout F] [--png-size S] [--folder existing tree]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import load_gallery_module, find_files, time_per_call, prompt_server, peak_rss_mb
+from generate_tree import generate_tree
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def retained_bytes(func, *args):
+    """Returns (result, bytes allocated by func that are still held by its result)."""
+    tracemalloc.start()
+    result = func(*args)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held
+
+
+def nested_listing(folder_scanner, tree):
+    """Scans tree into {folder_key: {name: file_info}} dicts, the listing layout the catalog replaced."""
+    folders = {}
+    for relative_dir, (name, stat_result, file_type, summary) in folder_scanner.iter_scan_records(tree):
+        folder_key = os.path.join("output", relative_dir) if relative_dir else "output"
+        folders.setdefault(folder_key, {})[name] = folder_scanner.format_entry(
+            name, relative_dir, "output", stat_result.st_mtime, stat_result.st_mtime_ns, stat_result.st_size, file_type, summary
+        )
+    return folders
+
+
+def change_latency(folder_monitor, generate, tree, new_files, timeout):
+    """
+    Starts a FileSystemMonitor on tree, writes new_files files once its initial snapshot is done and
+    returns (initial snapshot seconds, seconds until every new file was announced, or None on timeout).
+    """
+    server = prompt_server()
+    seen = set()
+
+    def listener(message):
+        _, event, data = message
+        if event == "Gallery.file_change":
+            for files in data["folders"].values():
+                seen.update(name for name, change in files.items() if change.get("action") != "remove")
+
+    server.listeners.append(listener)
+    monitor = folder_monitor.FileSystemMonitor(tree)
+    target = os.path.join(tree, "gallery_bench_latency")
+    try:
+        start = time.perf_counter()
+        monitor.start_monitoring()
+        if not monitor.event_handler.ready.wait(timeout):
+            return None, None
+        initial = time.perf_counter() - start
+
+        os.makedirs(target, exist_ok=True)
+        names = {os.path.basename(path) for path in generate(target, new_files)}
+        start = time.perf_counter()
+        while not names <= seen:
+            if time.perf_counter() - start > timeout:
+                return initial, None
+            time.sleep(0.005)
+        return initial, time.perf_counter() - start
+    finally:
+        monitor.stop_monitoring()
+        server.listeners.remove(listener)
+        shutil.rmtree(target, ignore_errors=True)  # Don't leave files behind in a --folder tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--folder", help="Benchmark an existing output tree instead of generating one")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--png-size", type=int, default=128)
+    parser.add_argument("--sample", type=int, default=200, help="Files timed for per-file extraction cost")
+    parser.add_argument("--new-files", type=int, default=10, help="Files written for the change detection latency")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--skip-monitor", action="store_true", help="Skip the watchdog change detection latency")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated tree, index and thumbnails")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="gallery_bench_")
+    # The index and thumbnails must not touch the ones next to the extension; set before importing
+    os.environ["COMFYUI_GALLERY_INDEX"] = os.path.join(work_dir, "gallery_index.db")
+    os.environ["COMFYUI_GALLERY_THUMBNAILS"] = os.path.join(work_dir, "thumbnails")
+
+    try:
+        if args.folder:
+            tree = os.path.abspath(args.folder)
+        else:
+            tree = os.path.join(work_dir, "output")
+            _, seconds = _timed(generate_tree, tree, args.files, args.depth, args.fanout, args.png_size)
+            print(f"generated:           {args.files} files in {seconds:.1f}s below {tree}")
+
+        folder_scanner = load_gallery_module("folder_scanner")
+        gallery_catalog = load_gallery_module("gallery_catalog")
+        folder_monitor = load_gallery_module("folder_monitor")
+        server = load_gallery_module("server")
+        files = find_files(tree, folder_scanner.SUPPORTED_EXTENSIONS)
+        if not files:
+            sys.exit(f"No media files found below {tree}")
+
+        # Cold: empty index, every file is parsed. Warm: every file is an index hit.
+        catalog, cold = _timed(gallery_catalog.scan_catalog, tree, "output")
+        catalog, warm = _timed(gallery_catalog.scan_catalog, tree, "output")
+        count = len(catalog)
+        folders = list(catalog.iter_folders())
+
+        sample = files[:args.sample]
+        extract = time_per_call(folder_scanner._build_metadata, sample, repeat=1)
+
+        body, serialize_time = _timed(server._serialize_catalog, catalog, 0, "")
+        del catalog
+        catalog, catalog_bytes = retained_bytes(gallery_catalog.scan_catalog, tree, "output")
+        del catalog
+        nested, nested_bytes = retained_bytes(nested_listing, folder_scanner, tree)
+        del nested
+        handler = folder_monitor.GalleryEventHandler(tree)
+        tracemalloc.start()
+        handler.known_folders, snapshot_time = _timed(handler.snapshot_tree)
+        fingerprint_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        _, sweep_time = _timed(handler.sweep)
+
+        print(f"files:               {len(files)} on disk, {count} listed in {len(folders)} folders")
+        print(f"cold scan:           {cold:10.3f} s ({cold / count * 1e6:.0f} us/file, {count / cold:.0f} files/s)")
+        print(f"warm scan:           {warm:10.3f} s ({warm / count * 1e6:.0f} us/file, {cold / warm:.1f}x faster than cold)")
+        print(f"metadata extraction: {extract * 1e6:10.1f} us/file ({len(sample)} files, no index)")
+        print(f"sanitize + dumps:    {serialize_time * 1e3:10.1f} ms")
+        print(f"response size:       {len(body) / 1024:10.1f} KB ({len(body) / count:.0f} bytes/file)")
+        print(f"listing memory:      {catalog_bytes / 1024:10.1f} KB as catalog, {nested_bytes / 1024:.1f} KB as nested dicts")
+        print(f"monitor snapshot:    {snapshot_time * 1e3:10.1f} ms ({fingerprint_bytes / 1024:.0f} KB of fingerprints)")
+        print(f"unchanged sweep:     {sweep_time * 1e3:10.1f} ms")
+
+        if not args.skip_monitor:
+            def generate(target, new_files):
+                return generate_tree(target, new_files, depth=0, png_size=args.png_size, seed=int(time.time()))
+
+            initial, latency = change_latency(folder_monitor, generate, tree, args.new_files, args.timeout)
+            if initial is None:
+                print(f"monitor:             initial snapshot did not finish within {args.timeout}s")
+            else:
+                print(f"monitor start:       {initial:10.3f} s (initial snapshot)")
+                print(f"change latency:      " + (f"{latency * 1e3:10.1f} ms ({args.new_files} new files)" if latency is not None else "timed out"))
+
+        rss = peak_rss_mb()
+        print(f"peak RSS:            " + (f"{rss:10.1f} MB" if rss is not None else "n/a"))
+    finally:
+        if args.keep:
+            print(f"kept:                {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Shared helpers for the offline benchmarks: loads the extension as a package outside ComfyUI."""
+import os
+import sys
+import types
+import importlib
+import importlib.util
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "comfyui_gallery"
+
+
+class _StubRoutes:
+    """Accepts route registrations (@routes.get(...)) and leaves the handlers untouched."""
+
+    def __getattr__(self, method):
+        return lambda path: (lambda handler: handler)
+
+
+class _StubPromptServer:
+    """Stands in for PromptServer.instance: records every send_sync message with its time."""
+
+    def __init__(self):
+        self.routes = _StubRoutes()
+        self.messages = []  # (perf_counter time, event, data)
+        self.listeners = []
+
+    def send_sync(self, event, data, sid=None):
+        import time
+        message = (time.perf_counter(), event, data)
+        self.messages.append(message)
+        for listener in self.listeners:
+            listener(message)
+
+
+def install_comfy_stubs():
+    """Registers minimal stand-ins for the ComfyUI modules the extension imports at module level."""
+    if "folder_paths" not in sys.modules:
+        folder_paths = types.ModuleType("folder_paths")
+        folder_paths.get_output_directory = lambda: os.path.join(os.getcwd(), "output")
+        folder_paths.get_input_directory = lambda: os.path.join(os.getcwd(), "input")
+        folder_paths.get_temp_directory = lambda: os.path.join(os.getcwd(), "temp")
+        sys.modules["folder_paths"] = folder_paths
+    if "server" not in sys.modules:
+        server = types.ModuleType("server")
+        server.PromptServer = type("PromptServer", (), {"instance": _StubPromptServer()})
+        sys.modules["server"] = server
+
+
+def prompt_server():
+    """Returns the stub PromptServer.instance (see install_comfy_stubs)."""
+    install_comfy_stubs()
+    return sys.modules["server"].PromptServer.instance
+
+
+def load_gallery_module(name):
+    """Imports a submodule of the extension (e.g. "metadata_extractor") without ComfyUI."""
+    install_comfy_stubs()
+    if PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE_NAME, os.path.join(REPO_ROOT, "__init__.py"), submodule_search_locations=[REPO_ROOT]
+        )
+        sys.modules[PACKAGE_NAME] = importlib.util.module_from_spec(spec)  # Package body (routes) is not executed
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+def find_files(root, extensions):
+    """Returns every file below root with one of the given (lowercase) extensions."""
+    matches = []
+    for dir_path, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(extensions):
+                matches.append(os.path.join(dir_path, filename))
+    return matches
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MB, or None where it can't be measured."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KB elsewhere
+
+
+def time_per_call(func, items, repeat=3):
+    """Returns the best average seconds per item of func over `repeat` passes."""
+    import time
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, (time.perf_counter() - start) / max(len(items), 1))
+    return best
@@ -0,0 +1,216 @@
+"""
+Generates a synthetic ComfyUI output tree for the benchmarks: PNGs with prompt/workflow text chunks,
+JPEGs with ComfyUI-style EXIF, MP4s with a VideoHelperSuite-style comment and animated GIFs.
+
+Usage: python benchmarks/generate_tree.py <target folder> [--files N] [--depth D] [--fanout F] [--png-size S]
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import time
+import zlib
+
+WORDS = (
+    "masterpiece best quality portrait landscape castle forest river city night neon cyberpunk "
+    "watercolor oil painting cinematic lighting volumetric fog detailed intricate sharp focus bokeh "
+    "mountain ocean sunset dragon knight robot cat dog flowers snow desert ruins spaceship"
+).split()
+CHECKPOINTS = ("sd_xl_base_1.0.safetensors", "v1-5-pruned-emaonly.safetensors", "dreamshaper_8.safetensors", "flux1-dev.safetensors")
+LORAS = ("detail_tweaker.safetensors", "add_more_details.safetensors", "film_grain.safetensors", "pixel_art_xl.safetensors")
+SAMPLERS = ("euler", "euler_ancestral", "dpmpp_2m", "dpmpp_2m_sde", "uni_pc")
+SCHEDULERS = ("normal", "karras", "simple", "sgm_uniform")
+
+
+def _text(rng, words):
+    return ", ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_prompt(rng, width, height, loras=1):
+    """Returns an API-format prompt graph like the default workflow, with a LoRA chain and random settings."""
+    prompt = {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": rng.choice(CHECKPOINTS)}},
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": width, "height": height, "batch_size": 1}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": _text(rng, rng.randint(10, 60)), "clip": ["4", 1]}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": _text(rng, rng.randint(3, 15)), "clip": ["4", 1]}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+        "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "ComfyUI", "images": ["8", 0]}},
+    }
+    model = ["4", 0]
+    for i in range(loras):
+        node_id = str(20 + i)
+        prompt[node_id] = {"class_type": "LoraLoader", "inputs": {
+            "lora_name": rng.choice(LORAS), "strength_model": round(rng.uniform(0.3, 1.2), 2),
+            "strength_clip": 1.0, "model": model, "clip": ["4", 1],
+        }}
+        model = [node_id, 0]
+    prompt["3"] = {"class_type": "KSampler", "inputs": {
+        "seed": rng.getrandbits(48), "steps": rng.choice((20, 25, 30)), "cfg": rng.choice((5.0, 7.0, 8.0)),
+        "sampler_name": rng.choice(SAMPLERS), "scheduler": rng.choice(SCHEDULERS), "denoise": 1.0,
+        "model": model, "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0],
+    }}
+    return prompt
+
+
+def make_workflow(rng, prompt, extra_nodes=0):
+    """Returns a UI-format workflow for prompt (nodes with positions and widget values), padded with extra nodes."""
+    nodes = []
+    for node_id, node in prompt.items():
+        widgets = [value for value in node["inputs"].values() if not isinstance(value, list)]
+        nodes.append({
+            "id": int(node_id), "type": node["class_type"], "pos": [rng.randint(0, 2000), rng.randint(0, 1500)],
+            "size": {"0": 315, "1": 262}, "flags": {}, "order": len(nodes), "mode": 0,
+            "inputs": [{"name": key, "type": "*", "link": None} for key, value in node["inputs"].items() if isinstance(value, list)],
+            "outputs": [], "properties": {"Node name for S&R": node["class_type"]}, "widgets_values": widgets,
+        })
+    for i in range(extra_nodes):
+        nodes.append({
+            "id": 1000 + i, "type": "Note", "pos": [rng.randint(0, 2000), rng.randint(0, 1500)], "size": {"0": 400, "1": 200},
+            "flags": {}, "order": len(nodes), "mode": 0, "properties": {}, "widgets_values": [_text(rng, 40)],
+        })
+    return {"last_node_id": 1000 + extra_nodes, "last_link_id": 20, "nodes": nodes, "links": [], "groups": [], "config": {}, "extra": {}, "version": 0.4}
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+
+
+def write_png(path, width, height, text, rng):
+    """Writes an RGB PNG of noise (realistic compressed size) with tEXt chunks, without PIL."""
+    rows = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+    chunks = [_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))]
+    chunks += [_png_chunk(b"tEXt", key.encode("latin-1") + b"\x00" + value.encode("latin-1", "replace")) for key, value in text.items()]
+    chunks += [_png_chunk(b"IDAT", zlib.compress(rows, 1)), _png_chunk(b"IEND", b"")]
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + b"".join(chunks))
+
+
+def write_jpeg(path, width, height, prompt, workflow, rng):
+    """Writes a JPEG with prompt/workflow in EXIF Model/Make, like ComfyUI's WebP/JPEG savers. Needs Pillow."""
+    from PIL import Image
+    img = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    exif = img.getexif()
+    exif[0x0110] = "prompt:" + json.dumps(prompt)
+    exif[0x010F] = "workflow:" + json.dumps(workflow)
+    img.save(path, "JPEG", quality=90, exif=exif)
+
+
+def _box(box_type, payload):
+    return struct.pack(">I", 8 + len(payload)) + box_type + payload
+
+
+def write_mp4(path, width, height, frames, fps, comment, mdat_size):
+    """Writes an MP4 with the boxes the gallery's header probe reads (no decodable video), moov at the end."""
+    timescale = 1000
+    duration = int(frames * timescale / fps)
+    mvhd = _box(b"mvhd", b"\x00" * 4 + struct.pack(">IIII", 0, 0, timescale, duration) + b"\x00" * 80)
+    tkhd = _box(b"tkhd", b"\x00\x00\x00\x03" + b"\x00" * 72 + struct.pack(">II", width << 16, height << 16))
+    mdhd = _box(b"mdhd", b"\x00" * 4 + struct.pack(">IIII", 0, 0, timescale, duration) + b"\x00" * 4)
+    hdlr = _box(b"hdlr", b"\x00" * 8 + b"vide" + b"\x00" * 12 + b"VideoHandler\x00")
+    stsz = _box(b"stsz", b"\x00" * 8 + struct.pack(">I", frames))
+    trak = _box(b"trak", tkhd + _box(b"mdia", mdhd + hdlr + _box(b"minf", _box(b"stbl", stsz))))
+    text = comment.encode("utf-8")
+    udta = _box(b"udta", _box(b"\xa9cmt", struct.pack(">HH", len(text), 0) + text))
+    with open(path, "wb") as f:
+        f.write(_box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41"))
+        f.write(struct.pack(">I", 8 + mdat_size) + b"mdat")
+        f.write(b"\x00" * mdat_size)
+        f.write(_box(b"moov", mvhd + trak + udta))
+
+
+def write_gif(path, width, height, frames):
+    """Writes an animated GIF of single-pixel frames on a width x height screen."""
+    data = b"GIF89a" + struct.pack("<HHBBB", width, height, 0x80, 0, 0) + b"\x00\x00\x00\xff\xff\xff"
+    data += b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"  # Loop forever
+    for _ in range(frames):
+        data += b"\x21\xf9\x04\x00\x04\x00\x00\x00"  # 40 ms frame delay
+        data += b"\x2c" + struct.pack("<HHHHB", 0, 0, 1, 1, 0) + b"\x02\x02\x44\x01\x00"
+    with open(path, "wb") as f:
+        f.write(data + b"\x3b")
+
+
+def folder_layout(depth, fanout):
+    """Returns relative folder paths: the root plus date-like subfolders fanout wide and depth deep."""
+    folders = [""]
+    level = [""]
+    for d in range(depth):
+        level = [os.path.join(parent, f"2024-{d + 1:02d}-{i + 1:02d}" if d == 0 else f"batch_{i + 1:03d}") for parent in level for i in range(fanout)]
+        folders += level
+    return folders
+
+
+def generate_tree(root, files=1000, depth=2, fanout=4, png_size=256, jpeg_ratio=0.1, video_ratio=0.02, gif_ratio=0.02,
+                  workflow_nodes=20, days=90, seed=0):
+    """
+    Writes `files` media files below root spread over folder_layout(depth, fanout) and returns their paths.
+    Modification times are spread over the last `days` days, newest files last like real output folders.
+    """
+    rng = random.Random(seed)
+    folders = folder_layout(depth, fanout)
+    for folder in folders:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    have_pil = True
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        have_pil = False
+        print("Pillow not installed, generating PNGs instead of JPEGs")
+
+    now = time.time()
+    paths = []
+    folder_mtimes = {}
+    for i in range(files):
+        folder = os.path.join(root, folders[i % len(folders)])
+        width = height = png_size
+        prompt = make_prompt(rng, width, height, loras=rng.randint(0, 2))
+        workflow = make_workflow(rng, prompt, workflow_nodes)
+        kind = rng.random()
+        if kind < video_ratio:
+            path = os.path.join(folder, f"AnimateDiff_{i:05d}.mp4")
+            comment = json.dumps({"prompt": json.dumps(prompt), "workflow": json.dumps(workflow)})
+            write_mp4(path, width, height, frames=48, fps=8, comment=comment, mdat_size=width * height)
+        elif kind < video_ratio + gif_ratio:
+            path = os.path.join(folder, f"AnimateDiff_{i:05d}.gif")
+            write_gif(path, width, height, frames=16)
+        elif kind < video_ratio + gif_ratio + jpeg_ratio and have_pil:
+            path = os.path.join(folder, f"ComfyUI_{i:05d}_.jpg")
+            write_jpeg(path, width, height, prompt, workflow, rng)
+        else:
+            path = os.path.join(folder, f"ComfyUI_{i:05d}_.png")
+            write_png(path, width, height, {"prompt": json.dumps(prompt), "workflow": json.dumps(workflow)}, rng)
+        mtime = now - days * 86400 * (files - i) / files
+        os.utime(path, (mtime, mtime))
+        folder_mtimes[folder] = mtime
+        paths.append(path)
+    for folder, mtime in folder_mtimes.items():
+        os.utime(folder, (mtime, mtime))  # Like a real tree, folders were last changed by their newest file
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("target")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--png-size", type=int, default=256)
+    parser.add_argument("--jpeg-ratio", type=float, default=0.1)
+    parser.add_argument("--video-ratio", type=float, default=0.02)
+    parser.add_argument("--gif-ratio", type=float, default=0.02)
+    parser.add_argument("--workflow-nodes", type=int, default=20, help="Extra note nodes padding each workflow")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = generate_tree(
+        args.target, args.files, args.depth, args.fanout, args.png_size, args.jpeg_ratio,
+        args.video_ratio, args.gif_ratio, args.workflow_nodes, seed=args.seed,
+    )
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"Generated {len(paths)} files ({size / (1024 * 1024):.1f} MB) in {time.perf_counter() - start:.1f}s below {args.target}")
+
+
+if __name__ == "__main__":
+    main()
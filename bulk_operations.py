@@ -0,0 +1,202 @@
+import os
+import shutil
+import zipfile
+from .folder_scanner import SUPPORTED_EXTENSIONS, ScanCancelled
+from .gallery_listing import resolve_folder
+from .gallery_search import parse_query
+from .metadata_index import get_metadata_index
+from .monitor_registry import get_monitor_registry
+from .gallery_stats import get_gallery_stats
+
+MAX_SELECTION = int(os.environ.get("COMFYUI_GALLERY_MAX_SELECTION", "10000"))  # Files one bulk request may touch
+QUERY_BATCH = 500  # Index rows fetched per query page
+ZIP_CHUNK_SIZE = 256 * 1024  # Bytes handed to the response per write
+
+
+def resolve_selection(full_base_path, base_path, files=(), folder=None, query=None):
+    """
+    Returns the absolute paths of a selection: files as [{"folder": folder_key, "name": name}], plus, when
+    query is given (gallery_search syntax, "" for everything), every indexed file below folder matching it.
+    Raises ValueError for names outside the gallery root, unsupported files or more than MAX_SELECTION files.
+    """
+    paths = []
+    seen = set()
+
+    def add(path):
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+            if len(paths) > MAX_SELECTION:
+                raise ValueError(f"Selection is larger than {MAX_SELECTION} files")
+
+    for item in files or ():
+        name = item.get("name") if isinstance(item, dict) else None
+        if not isinstance(name, str) or name in ("", ".", "..") or os.path.basename(name) != name or "/" in name:
+            raise ValueError(f"Invalid file name: {name!r}")
+        if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise ValueError(f"Unsupported file: {name}")
+        relative_folder = resolve_folder(full_base_path, base_path, item.get("folder") or base_path)
+        add(os.path.normpath(os.path.join(full_base_path, relative_folder, name)))
+
+    if query is not None:
+        index = get_metadata_index()
+        if index is None:
+            raise ValueError("Metadata index unavailable, select files by name")
+        subtree = os.path.join(full_base_path, resolve_folder(full_base_path, base_path, folder or base_path))
+        filters = parse_query(query)
+        after = None
+        while True:
+            rows = index.search(subtree, order="desc", after=after, limit=QUERY_BATCH, **filters)
+            for path, _ in rows:
+                add(path)
+            if len(rows) < QUERY_BATCH:
+                break
+            after = (rows[-1][1], rows[-1][0])
+    return paths
+
+
+class _ChunkWriter:
+    """Write-only, unseekable file object passing what is written to emit(bytes) in ZIP_CHUNK_SIZE chunks."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self.buffer = bytearray()
+        self.position = 0
+        self.aborted = False
+
+    def write(self, data):
+        if self.aborted:
+            return len(data)
+        self.buffer += data
+        self.position += len(data)
+        if len(self.buffer) >= ZIP_CHUNK_SIZE:
+            self.flush()
+        return len(data)
+
+    def tell(self):
+        return self.position  # No seek(), so zipfile writes data descriptors instead of going back
+
+    def flush(self):
+        if self.buffer and not self.aborted:
+            self.emit(bytes(self.buffer))
+            self.buffer.clear()
+
+    def abort(self):
+        """Drops what is buffered and everything written from now on."""
+        self.aborted = True
+        self.buffer.clear()
+
+
+def write_zip(paths, full_base_path, emit, cancel_event=None):
+    """
+    Writes paths into a zip archive streamed through emit(bytes), with their paths below full_base_path
+    as names. Files are stored uncompressed (media formats are compressed already) and read in small
+    blocks, so neither the archive nor a whole file is ever held in memory. Files that vanished are left
+    out. Returns how many files were written; raises ScanCancelled as soon as cancel_event is set. Any
+    other error (a file that can't be read) is raised without finishing the archive: nothing more is
+    emitted, the central directory included, so the client can't mistake it for a complete export.
+    """
+    writer = _ChunkWriter(emit)
+    written = 0
+    archive = zipfile.ZipFile(writer, "w", zipfile.ZIP_STORED, allowZip64=True)
+    try:
+        for path in paths:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ScanCancelled()
+            try:
+                archive.write(path, os.path.relpath(path, full_base_path).replace(os.sep, "/"))
+            except FileNotFoundError:
+                continue  # Stat and open happen before anything is written for the file
+            written += 1
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        archive.close()  # Writes the central directory, or nothing once aborted
+    writer.flush()
+    get_gallery_stats().count("bulk_exported", written)
+    return written
+
+
+def delete_files(root, paths):
+    """
+    Deletes files and applies the removals to the index and to the monitors in one batch each.
+    Returns (deleted paths, [(path, error)]); files already gone count as deleted.
+    """
+    registry = get_monitor_registry()
+    registry.suppress(root, paths)  # Their watchdog events would only repeat what is applied below
+    deleted, errors = [], []
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            errors.append((path, str(e)))
+            continue
+        deleted.append(path)
+
+    index = get_metadata_index()
+    if index is not None:
+        index.remove_paths(deleted)
+    registry.apply_paths(root, deleted)
+    get_gallery_stats().count("bulk_deleted", len(deleted))
+    return deleted, errors
+
+
+def _move_no_replace(source, target):
+    """
+    Moves a file to target, raising FileExistsError instead of replacing a file that is there. A hard link
+    claims the target name atomically, then the source is removed; where linking fails (another file
+    system, FAT) the file is copied into a target opened with exclusive create, keeping its times.
+    """
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError:
+        with open(source, "rb") as src, open(target, "xb") as dst:
+            try:
+                shutil.copyfileobj(src, dst)
+            except BaseException:
+                dst.close()
+                os.remove(target)
+                raise
+        shutil.copystat(source, target)
+    try:
+        os.remove(source)
+    except OSError:
+        os.remove(target)  # Leave the file where it was rather than in both places
+        raise
+
+
+def move_files(root, paths, destination):
+    """
+    Moves files into the destination directory (created if missing), keeping their names; files whose
+    name is taken there are left in place. Index entries are re-keyed rather than extracted again and
+    the monitors get one batch. Returns ([(source, target)], [(path, error)]).
+    """
+    os.makedirs(destination, exist_ok=True)
+    pairs = [(path, os.path.join(destination, os.path.basename(path))) for path in paths]
+    registry = get_monitor_registry()
+    registry.suppress(root, [destination] + [path for pair in pairs for path in pair])
+    moved, errors = [], []
+    for source, target in pairs:
+        if os.path.normcase(source) == os.path.normcase(target):
+            continue  # Already there
+        try:
+            _move_no_replace(source, target)
+        except FileExistsError:
+            errors.append((source, f"{os.path.basename(target)} already exists in the destination"))
+            continue
+        except OSError as e:
+            errors.append((source, str(e)))
+            continue
+        moved.append((source, target))
+
+    index = get_metadata_index()
+    if index is not None:
+        index.move_paths(moved)
+    registry.apply_paths(root, [path for pair in moved for path in pair])
+    get_gallery_stats().count("bulk_moved", len(moved))
+    return moved, errors
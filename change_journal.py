@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+from collections import deque, OrderedDict
+
+JOURNAL_RETENTION = 20000  # Change records kept for /Gallery/changes catch-up
+MIN_EMIT_INTERVAL = 0.25  # Seconds between two Gallery.file_change messages
+MAX_BATCH = 500  # Change records per message; bigger bursts are split over several messages
+
+
+class ChangeJournal:
+    """
+    Numbers every change below one monitored folder with a monotonically increasing sequence number,
+    keeps the most recent ones for catch-up, and emits them to clients coalesced and rate-limited.
+    Folder keys are relative to that folder, so each (root, path) has its own journal and event scope.
+    """
+
+    def __init__(self, root="output", path="", event_name="Gallery.file_change", retention=JOURNAL_RETENTION, min_interval=MIN_EMIT_INTERVAL, max_batch=MAX_BATCH):
+        self.root = root  # Gallery root (output, input, temp) whose changes this journal numbers
+        self.path = path  # Monitored folder below the root directory ("" for the root itself), the event scope
+        self.event_name = event_name
+        self.min_interval = min_interval
+        self.max_batch = max_batch
+        self.seq = 0
+        self._records = deque(maxlen=retention)  # (seq, folder, name, change)
+        self._pending = OrderedDict()  # (folder, name) -> (seq, change), newest change per file wins
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_emit = 0.0
+        self._emitted_seq = 0  # Every change up to this sequence number has been emitted
+
+    def record(self, changes):
+        """Adds a {"folders": {folder: {file: change}}} delta to the journal and schedules its emission."""
+        with self._lock:
+            for folder, folder_changes in changes.get("folders", {}).items():
+                for name, change in folder_changes.items():
+                    self.seq += 1
+                    self._records.append((self.seq, folder, name, change))
+                    key = (folder, name)
+                    self._pending.pop(key, None)  # Re-insert so ordering follows the latest change
+                    self._pending[key] = (self.seq, change)
+            self._schedule()
+
+    def _schedule(self):
+        """Arms the emit timer (caller holds the lock)."""
+        if not self._pending or self._timer is not None:
+            return
+        delay = 0.0 if len(self._pending) >= self.max_batch else max(0.0, self._last_emit + self.min_interval - time.monotonic())
+        self._timer = threading.Timer(delay, self._emit)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _emit(self):
+        with self._lock:
+            self._timer = None
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False))
+            self._last_emit = time.monotonic()
+            if self._pending:
+                self._schedule()
+            if not batch:
+                return
+            # Pending changes are ordered by sequence number, so this batch settles every change
+            # up to its last one (older changes to the same files were coalesced into it)
+            first_seq = self._emitted_seq + 1
+            last_seq = self._emitted_seq = batch[-1][1][0]
+
+        payload = {"root": self.root, "path": self.path, "folders": {}, "first_seq": first_seq, "seq": last_seq}
+        for (folder, name), (_, change) in batch:
+            payload["folders"].setdefault(folder, {})[name] = change
+
+        from server import PromptServer
+        PromptServer.instance.send_sync(self.event_name, payload)
+
+    def since(self, seq):
+        """
+        Returns every change after seq, coalesced per file, in the Gallery.file_change format.
+        "reset" is True when seq is older than the retained history; the client must reload.
+        """
+        with self._lock:
+            current = self.seq
+            oldest = self._records[0][0] if self._records else current + 1
+            if seq > current or seq < oldest - 1:
+                return {"root": self.root, "path": self.path, "seq": current, "reset": seq != current, "folders": {}}
+            folders = {}
+            for record_seq, folder, name, change in self._records:
+                if record_seq > seq:
+                    folders.setdefault(folder, {})[name] = change
+        return {"root": self.root, "path": self.path, "seq": current, "reset": False, "folders": folders}
+
+
+_journals = {}
+_journal_lock = threading.Lock()
+
+
+def get_change_journal(root, full_path):
+    """Returns the shared change journal of the monitored folder full_path below a gallery root."""
+    key = (root, os.path.normpath(full_path))
+    journal = _journals.get(key)
+    if journal is None:
+        with _journal_lock:
+            journal = _journals.get(key)
+            if journal is None:
+                from .folder_scanner import root_relative_path  # Imports the metadata extraction, only needed here
+                journal = _journals[key] = ChangeJournal(root, root_relative_path(root, full_path))
+    return journal
@@ -0,0 +1,228 @@
+import os
+import hashlib
+import threading
+from PIL import Image
+from .folder_scanner import get_file_type, listing_entry
+from .metadata_index import get_metadata_index, normalize_path
+from .thumbnail_cache import get_thumbnail_cache
+from .background_indexer import wait_while_busy
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HASH_ALGORITHM = "xxh3" if xxhash is not None else "blake2b"
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_ON_SCAN = os.environ.get("COMFYUI_GALLERY_HASHING", "0") == "1"  # Hash new files after every full listing
+HASH_BATCH = 64  # Files hashed per index round trip
+DEFAULT_SIMILARITY = 4  # Max differing bits of two 64-bit perceptual hashes in one cluster
+MAX_SIMILARITY = 10
+
+
+def content_hash(path):
+    """Returns "<algorithm>:<hex digest>" of the file contents, read in chunks."""
+    hasher = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return f"{HASH_ALGORITHM}:{hasher.hexdigest()}"
+
+
+def perceptual_hash(image_path):
+    """Returns the 64-bit difference hash (dHash) of an image as a signed integer, for SQLite."""
+    with Image.open(image_path) as img:
+        img.draft("L", (64, 64))
+        pixels = list(img.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _hash_file(path):
+    """Returns (content_hash, phash) for a file; the perceptual hash comes from its thumbnail."""
+    digest = content_hash(path)
+    if get_file_type(path) == "unknown":
+        return digest, None
+    try:
+        stat_result = os.stat(path)
+        cache = get_thumbnail_cache()
+        thumbnail = cache.get(path, stat_result) or cache.request(path, stat_result).result()
+        return digest, perceptual_hash(thumbnail)
+    except Exception as e:
+        print(f"Gallery: No perceptual hash for {path}: {e}")
+        return digest, None
+
+
+class DuplicateHasher:
+    """Fills in content and perceptual hashes for indexed files on a single background thread."""
+
+    def __init__(self, batch_size=HASH_BATCH):
+        self.batch_size = batch_size
+        self._roots = []  # Roots waiting for a hashing pass, oldest first
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, root):
+        """Queues a hashing pass over every indexed file below root."""
+        root = normalize_path(root)
+        with self._lock:
+            if root not in self._roots:
+                self._roots.append(root)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="GalleryHasher")
+                self._thread.start()
+
+    def pending(self, root):
+        """Returns whether a hashing pass over root is queued or running."""
+        with self._lock:
+            return normalize_path(root) in self._roots
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._roots:
+                    self._thread = None
+                    return
+                root = self._roots[0]
+            try:
+                self._hash_root(root)
+            except Exception as e:
+                print(f"Gallery: Error hashing files below {root}: {e}")
+            with self._lock:
+                self._roots.remove(root)
+
+    def _hash_root(self, root):
+        index = get_metadata_index()
+        if index is None:
+            return
+        after = ""
+        hashed = 0
+        while True:
+            wait_while_busy()  # Hashing reads whole files, so it waits for generation to finish
+            rows = index.unhashed(root, HASH_ALGORITHM, after, self.batch_size)
+            if not rows:
+                break
+            results = []
+            for path, mtime_ns, size in rows:
+                try:
+                    results.append((path, mtime_ns, size, *_hash_file(path)))
+                except OSError:
+                    continue  # Removed or unreadable; its index entry is purged by the next scan or verify
+            index.store_hashes(results)
+            hashed += len(results)
+            after = rows[-1][0]  # Keyset over paths, so files that can't be hashed are not retried this pass
+        if hashed:
+            print(f"Gallery: Hashed {hashed} files below {root}")
+
+
+def _popcount(values):
+    """Vectorized popcount of a uint64 NumPy array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def _close_pairs(hashes, members, threshold):
+    """Returns (i, j) pairs of members (indexes into hashes) whose Hamming distance is <= threshold."""
+    if np is not None:
+        values = np.array([hashes[i] for i in members], dtype=np.uint64)
+        pairs = []
+        for row, i in enumerate(members[:-1]):
+            distances = _popcount(values[row + 1:] ^ values[row])
+            pairs.extend((i, members[row + 1 + k]) for k in np.nonzero(distances <= threshold)[0].tolist())
+        return pairs
+    return [
+        (i, j) for row, i in enumerate(members) for j in members[row + 1:]
+        if bin(hashes[i] ^ hashes[j]).count("1") <= threshold
+    ]
+
+
+def similar_clusters(hashes, threshold=DEFAULT_SIMILARITY):
+    """
+    Groups unsigned 64-bit perceptual hashes into clusters of indexes whose members are linked by
+    Hamming distance <= threshold. Uses threshold + 1 hash bands: two hashes within the threshold agree
+    on at least one band, so only hashes sharing a band value are compared (no n^2 scan).
+    """
+    unique = {}  # Identical hashes are compared once
+    for i, value in enumerate(hashes):
+        unique.setdefault(value, []).append(i)
+    values = list(unique)
+
+    parent = list(range(len(values)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    bands = threshold + 1
+    bits = 64 // bands
+    for band in range(bands):
+        buckets = {}
+        for i, value in enumerate(values):
+            buckets.setdefault((value >> (band * bits)) & ((1 << bits) - 1), []).append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                for i, j in _close_pairs(values, members, threshold):
+                    parent[find(i)] = find(j)
+
+    clusters = {}
+    for i, value in enumerate(values):
+        clusters.setdefault(find(i), []).extend(unique[value])
+    return [sorted(members) for members in clusters.values() if len(members) > 1]
+
+
+def find_duplicates(index, full_base_path, base_path, root=None, mode="exact", threshold=DEFAULT_SIMILARITY, limit=100):
+    """
+    Returns {"groups": [[file_info, ...], ...], "hashing": bool} for the files below root (default
+    full_base_path): byte-identical files (mode="exact") or perceptually similar ones (mode="similar").
+    Unhashed files are queued for background hashing; "hashing" tells whether results may still grow.
+    """
+    root = root or full_base_path
+    hasher = get_duplicate_hasher()
+    hasher.schedule(root)
+    limit = max(1, min(int(limit), 1000))
+
+    if mode == "exact":
+        path_groups = {}
+        for digest, path, _ in index.duplicate_hashes(root, limit):
+            path_groups.setdefault(digest, []).append(path)
+        path_groups = list(path_groups.values())
+    elif mode == "similar":
+        threshold = max(0, min(int(threshold), MAX_SIMILARITY))
+        rows = index.perceptual_hashes(root)
+        hashes = [phash & 0xFFFFFFFFFFFFFFFF for _, phash in rows]
+        clusters = sorted(similar_clusters(hashes, threshold), key=len, reverse=True)[:limit]
+        path_groups = [[rows[i][0] for i in cluster] for cluster in clusters]
+    else:
+        raise ValueError(f"Invalid mode: {mode}")
+
+    groups = []
+    for paths in path_groups:
+        files = [info for info in (listing_entry(path, full_base_path, base_path) for path in paths) if info is not None]
+        if len(files) > 1:
+            groups.append(files)
+    return {"groups": groups, "hashing": hasher.pending(root)}
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_duplicate_hasher():
+    """Returns the shared background hasher."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = DuplicateHasher()
+    return _hasher
@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+from .folder_scanner import SUPPORTED_EXTENSIONS
+from .gallery_listing import resolve_file
+from .metadata_extractor import buildExecutionMetadata, buildSummary
+from .metadata_index import get_metadata_index
+from .monitor_registry import get_monitor_registry, gallery_roots
+from .gallery_stats import get_gallery_stats
+
+INGEST_ENABLED = os.environ.get("COMFYUI_GALLERY_INGEST", "1") != "0"
+
+try:
+    from comfy.cli_args import args as comfy_args
+    METADATA_DISABLED = bool(getattr(comfy_args, "disable_metadata", False))  # Saved PNGs carry no prompt then
+except Exception:
+    METADATA_DISABLED = False
+
+
+def output_files(output):
+    """Returns [(type, subfolder, filename)] of the supported media files in an "executed" message's ui output."""
+    files = []
+    for items in (output or {}).values():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            if isinstance(item, dict) and isinstance(item.get("filename"), str) and item["filename"].lower().endswith(SUPPORTED_EXTENSIONS):
+                files.append((item.get("type") or "output", item.get("subfolder") or "", item["filename"]))
+    return files
+
+
+def running_prompt(server, prompt_id):
+    """Returns (prompt, extra_pnginfo) of a prompt that is executing, (None, None) if it can't be found."""
+    try:
+        prompt_queue = server.prompt_queue
+        with prompt_queue.mutex:
+            items = list(prompt_queue.currently_running.values())
+    except Exception:
+        return None, None
+    for item in items:
+        # (number, prompt_id, prompt, extra_data, outputs_to_execute, ...)
+        if len(item) > 3 and item[1] == prompt_id:
+            return item[2], (item[3] or {}).get("extra_pnginfo")
+    return None, None
+
+
+class OutputIngestor:
+    """
+    Applies the files ComfyUI reports in "executed" messages to the gallery as soon as they are written:
+    PNGs are indexed from the running prompt instead of being parsed again, then every monitor watching
+    the file sends a single-file delta. Runs on its own thread so the execution thread never waits.
+    Watchdog (or polling) still catches changes made outside ComfyUI.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, files, prompt=None, extra_pnginfo=None):
+        """Queues [(type, subfolder, filename)] written by a prompt."""
+        if not files:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="GalleryIngest", daemon=True)
+                self._thread.start()
+        self._queue.put((files, prompt, extra_pnginfo))
+
+    def _run(self):
+        while True:
+            files, prompt, extra_pnginfo = self._queue.get()
+            for root, subfolder, filename in files:
+                try:
+                    self.ingest(root, subfolder, filename, prompt, extra_pnginfo)
+                except Exception as e:
+                    print(f"Gallery: Error ingesting {subfolder}/{filename}: {e}")
+
+    def ingest(self, root, subfolder, filename, prompt=None, extra_pnginfo=None):
+        """Indexes one reported file and applies it to the monitors watching it."""
+        root_dir = gallery_roots().get(root)
+        if root_dir is None:
+            return
+        full_path = resolve_file(root_dir, subfolder, filename)
+        try:
+            stat_result = os.stat(full_path)
+        except OSError:
+            return  # Already gone (e.g. a temp preview that was replaced)
+        stats = get_gallery_stats()
+        stats.count("outputs_ingested")
+
+        index = get_metadata_index()
+        if index is not None and isinstance(prompt, dict) and not METADATA_DISABLED and filename.lower().endswith(".png"):
+            try:
+                metadata = buildExecutionMetadata(full_path, prompt, extra_pnginfo)
+            except ValueError:
+                pass  # Not a PNG, or not saved with this prompt: extracted from the file as usual
+            else:
+                index.store(full_path, stat_result.st_mtime_ns, stat_result.st_size, metadata, buildSummary(metadata))
+                stats.count("outputs_prefilled")
+
+        get_monitor_registry().ingest(root, os.path.normpath(full_path))
+        if index is not None:
+            index.flush()
+
+
+def install_output_ingest(server):
+    """Wraps server.send_sync to pass every "executed" message's files to the shared OutputIngestor."""
+    if not INGEST_ENABLED or getattr(server.send_sync, "_gallery_ingest", False):
+        return
+    ingestor = OutputIngestor()
+    send_sync = server.send_sync
+
+    def send_sync_with_ingest(event, data, sid=None):
+        send_sync(event, data, sid)
+        if event != "executed" or not isinstance(data, dict):
+            return
+        try:
+            files = output_files(data.get("output"))
+            if files:
+                prompt, extra_pnginfo = running_prompt(server, data.get("prompt_id"))
+                ingestor.submit(files, prompt, extra_pnginfo)
+        except Exception as e:
+            print(f"Gallery: Error reading execution output: {e}")
+
+    send_sync_with_ingest._gallery_ingest = True
+    server.send_sync = send_sync_with_ingest
@@ -1,42 +1,211 @@
 import os
+import sys
+import stat
 import time
 import threading
+from collections import deque
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, PatternMatchingEventHandler
-from .folder_scanner import _scan_for_images, SUPPORTED_EXTENSIONS  # Import folder scanner and supported extensions
+from .folder_scanner import process_file, get_file_type, SUPPORTED_EXTENSIONS, RACY_MTIME_NS, ScanCancelled  # Import folder scanner and supported extensions
+from .metadata_index import get_metadata_index
+from .change_journal import get_change_journal
+from .gallery_listing import get_listing_cache
+from .gallery_stats import get_gallery_stats
+
+TEMP_FILE_SUFFIXES = ('.swp', '.tmp', '~', '.part')
+RECONCILE_INTERVAL = 300.0  # Seconds between safety-net sweeps
+SUPPRESS_SECONDS = 10  # How long watchdog events for paths the gallery changed itself are ignored
+READY_TIMEOUT = 60.0  # Seconds a debounced rescan waits for the initial snapshot before leaving its paths pending
+
+MONITOR_MODE = os.environ.get("COMFYUI_GALLERY_MONITOR_MODE", "auto")  # auto, watchdog or poll
+POLL_MIN_INTERVAL = float(os.environ.get("COMFYUI_GALLERY_POLL_MIN_INTERVAL", "1"))  # Seconds between polls while files arrive
+POLL_MAX_INTERVAL = float(os.environ.get("COMFYUI_GALLERY_POLL_MAX_INTERVAL", "30"))  # Longest back-off while idle
+POLL_MIN_BUDGET = 0.001  # Lower bound of POLL_BUDGET, which the poll back-off divides by
+# Share of the time polling may keep the disk busy
+POLL_BUDGET = min(1.0, max(POLL_MIN_BUDGET, float(os.environ.get("COMFYUI_GALLERY_POLL_BUDGET", "0.05"))))
+# File systems where inotify (and friends) don't report changes made by other hosts
+NETWORK_FS_TYPES = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph", "glusterfs", "lustre", "gpfs",
+    "davfs", "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "fuse.glusterfs", "fuse.cephfs", "fuse.davfs2",
+}
+
+
+def is_gallery_file(path):
+    """True for supported media files that are not temporary saves."""
+    return not path.endswith(TEMP_FILE_SUFFIXES) and path.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def fingerprint(stat_result):
+    """Compact change signature of a file: (mtime_ns, size, inode)."""
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+
+def is_network_mount(path):
+    """True if path lies on a network file system (Linux mount table, Windows remote drives and UNC paths)."""
+    path = os.path.realpath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        try:
+            import ctypes
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == 4  # DRIVE_REMOTE
+        except Exception:
+            return False
+    try:
+        with open("/proc/self/mounts") as mounts:
+            table = [line.split()[1:3] for line in mounts]
+    except OSError:
+        return False  # No mount table to look at (macOS, BSD): set COMFYUI_GALLERY_MONITOR_MODE=poll
+    best, fs_type = "", None
+    for mount_point, mount_type in table:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) >= len(best):
+            best, fs_type = mount_point, mount_type
+    return fs_type in NETWORK_FS_TYPES
+
+
+def monitor_mode(path):
+    """Returns how path is watched: "watchdog", or "poll" when forced or (in auto mode) on a network mount."""
+    if MONITOR_MODE in ("watchdog", "poll"):
+        return MONITOR_MODE
+    return "poll" if is_network_mount(path) else "watchdog"
+
+
+def folder_totals(files):
+    """Aggregates fingerprints {name: (mtime_ns, size, inode)} into the file count, bytes, files per type and newest mtime."""
+    types = {}
+    total_size = newest = 0
+    for name, (mtime_ns, size, _) in files.items():
+        file_type = get_file_type(name)
+        types[file_type] = types.get(file_type, 0) + 1
+        total_size += size
+        newest = max(newest, mtime_ns)
+    return {"files": len(files), "bytes": total_size, "types": types, "newest": newest / 1e9 if files else None}
+
+
+class FolderState:
+    """What the monitor remembers about one directory: its mtime, file fingerprints and subfolder names."""
+
+    __slots__ = ("dir_mtime_ns", "files", "subdirs", "_totals")
+
+    def __init__(self, dir_mtime_ns, files, subdirs):
+        self.dir_mtime_ns = dir_mtime_ns  # None forces the next sweep to list the directory again
+        self.files = files  # name -> fingerprint() of each supported media file
+        self.subdirs = subdirs  # Names of the non-hidden subfolders
+        self._totals = None
+
+    @property
+    def totals(self):
+        """folder_totals() of the files, kept until a file of this folder changes."""
+        if self._totals is None:
+            self._totals = folder_totals(self.files)
+        return self._totals
+
+    def set_file(self, name, signature):
+        self.files[name] = signature
+        self._totals = None
+
+    def remove_file(self, name):
+        self.files.pop(name, None)
+        self._totals = None
+
+
+def snapshot_dir(base_path, relative_dir):
+    """Lists one directory below base_path into a FolderState, or returns None if it can't be read."""
+    dir_path = os.path.join(base_path, relative_dir)
+    files = {}
+    subdirs = []
+    try:
+        # Taken before listing: anything changing during the listing makes the next sweep look again
+        dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.name.startswith("."):
+                            subdirs.append(entry.name)
+                    elif entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        stat_result = entry.stat()  # Cached by scandir, but without st_ino on Windows
+                        files[entry.name] = (stat_result.st_mtime_ns, stat_result.st_size, entry.inode())
+                except OSError:
+                    continue  # Entry vanished or is unreadable
+    except OSError as e:
+        print(f"FileSystemMonitor: Error listing directory {dir_path}: {e}")
+        return None
+    if time.time_ns() - dir_mtime_ns < RACY_MTIME_NS:
+        dir_mtime_ns = None  # A change later in the same mtime tick would go unnoticed
+    return FolderState(dir_mtime_ns, files, subdirs)
+
+
+def snapshot_tree(base_path, subfolder="", cancel_event=None):
+    """
+    Returns {relative_dir: FolderState} for subfolder and every folder below it, from directory
+    listings and stat results only. Raises ScanCancelled as soon as cancel_event is set.
+    """
+    snapshot = {}
+    stack = [subfolder]
+    while stack:
+        if cancel_event is not None and cancel_event.is_set():
+            raise ScanCancelled()
+        relative_dir = stack.pop()
+        state = snapshot_dir(base_path, relative_dir)
+        if state is None:
+            continue
+        snapshot[relative_dir] = state
+        stack.extend(os.path.join(relative_dir, name) for name in state.subdirs)
+    return snapshot
+
 
 class GalleryEventHandler(PatternMatchingEventHandler):
-    """Handles file system events for the gallery with improved debouncing and support for multiple file types."""
+    """Handles file system events for the gallery, applying only the paths named in events to per-file fingerprints."""
 
-    def __init__(self, base_path, patterns=None, ignore_patterns=None, ignore_directories=False, case_sensitive=True, debounce_interval=0.5):
+    def __init__(self, base_path, patterns=None, ignore_patterns=None, ignore_directories=False, case_sensitive=True, debounce_interval=0.5, root="output"):
         super().__init__(patterns=patterns, ignore_patterns=ignore_patterns, ignore_directories=ignore_directories, case_sensitive=case_sensitive)
         self.base_path = base_path
+        self.root = root  # Gallery root the folder keys, URLs and change journal belong to
         self.debounce_timer = None
         self.debounce_interval = debounce_interval
-        self.last_known_folders = {}
-        self.pending_changes = set()  # Track paths with pending changes for smarter rescanning
+        self.known_folders = {}  # relative_dir ("" for the root) -> FolderState
+        self.pending_changes = set()  # File paths named in events since the last debounce
+        self.pending_directories = set()  # Directory paths created, deleted or moved since the last debounce
+        self.ready = threading.Event()  # Set once known_folders holds the initial snapshot
+        self._lock = threading.RLock()  # Guards known_folders and the pending sets
+        self._verify_queue = deque()  # Folders still to be re-listed by the rolling poll verification
+        self._suppressed = {}  # path -> monotonic deadline, paths of bulk operations applied directly
 
     def on_any_event(self, event):
-        """Catch-all event handler with improved debouncing."""
-        if event.is_directory:
-            # Directory events are important too - they might contain new files
-            self.pending_changes.add(os.path.dirname(event.src_path))
-            self.debounce_event()
-            return
-
-        # Ignore events for temporary files (e.g., swap files, temporary saves)
-        if event.src_path.endswith(('.swp', '.tmp', '~', '.part')):
+        """Catch-all event handler: records the affected paths and debounces."""
+        stats = get_gallery_stats()
+        if event.event_type not in ('created', 'deleted', 'modified', 'moved'):
+            stats.count("watchdog_events_ignored")
             return None
 
-        # Check if the file has a supported extension
-        file_ext = os.path.splitext(event.src_path)[1].lower()
-        if file_ext not in SUPPORTED_EXTENSIONS:
+        paths = [event.src_path]
+        if event.event_type == 'moved' and getattr(event, 'dest_path', None):
+            paths.append(event.dest_path)  # e.g. "image.png.tmp" renamed to "image.png"
+        paths = self._unsuppressed(paths)
+        if not paths:
+            stats.count("watchdog_events_ignored")
             return None
 
-        if event.event_type in ('created', 'deleted', 'modified', 'moved'):
+        if event.is_directory:
+            if event.event_type == 'modified':
+                stats.count("watchdog_events_ignored")
+                return None  # Directory mtime updates accompany the file events we already get
+            with self._lock:
+                self.pending_directories.update(paths)
+        else:
+            # Ignore temporary files and unsupported extensions
+            relevant = [path for path in paths if is_gallery_file(path)]
+            if not relevant:
+                stats.count("watchdog_events_ignored")
+                return None
             print(f"Watchdog detected {event.event_type}: {event.src_path}")
-            self.pending_changes.add(os.path.dirname(event.src_path))
-            self.debounce_event()
+            with self._lock:
+                self.pending_changes.update(relevant)
+        stats.count("watchdog_events")
+        self.debounce_event()
 
     def debounce_event(self):
         """Debounces the file system event using a timer with improved handling."""
@@ -48,50 +217,347 @@ class GalleryEventHandler(PatternMatchingEventHandler):
         self.debounce_timer.start()
 
     def rescan_and_send_changes(self):
-        """Rescans, detects changes, and sends updates with improved change detection."""
-        from server import PromptServer
-
-        # Scan directories and get updated data
-        new_folders_data, _ = _scan_for_images(
-            self.base_path, "output", True
-        )
-        old_folders_data = self.last_known_folders
-
-        # Detect changes between old and new data
-        changes = detect_folder_changes(old_folders_data, new_folders_data)
+        """Applies the pending event paths to the in-memory index and sends the resulting delta."""
+        # Events seen during the initial scan are applied on top of it; the monitor thread rescans
+        # whatever is still pending once it is done, so a snapshot that never finishes holds no timer forever
+        if not self.ready.wait(READY_TIMEOUT):
+            return
+        stats = get_gallery_stats()
+        stats.count("rescans")
+        with self._lock, stats.timer("apply_changes"):
+            files, directories = self.pending_changes, self.pending_directories
+            self.pending_changes, self.pending_directories = set(), set()
+            changes = self.apply_changes(files, directories)
 
-        if changes and changes["folders"]:
+        if changes["folders"]:
             print(f"FileSystemMonitor: {len(changes['folders'])} folders with changes detected")
-            PromptServer.instance.send_sync("Gallery.file_change", changes)
+            self.send_changes(changes)
         else:
             print("FileSystemMonitor: No relevant gallery changes after debounce.")
 
-        # Update last known folders data for next comparison
-        self.last_known_folders = new_folders_data
-        self.pending_changes.clear()
-        self.debounce_timer = None
+    def suppress(self, paths, seconds=SUPPRESS_SECONDS):
+        """Ignores events for paths for a while, for changes the gallery makes and applies itself (see apply_paths)."""
+        deadline = time.monotonic() + seconds
+        with self._lock:
+            for path in paths:
+                self._suppressed[path] = deadline
+
+    def _unsuppressed(self, paths):
+        if not self._suppressed:
+            return paths
+        now = time.monotonic()
+        with self._lock:
+            for path in [path for path, deadline in self._suppressed.items() if deadline < now]:
+                del self._suppressed[path]
+            return [path for path in paths if path not in self._suppressed]
+
+    def apply_paths(self, paths):
+        """Applies files changed by a bulk operation as one delta, instead of a debounced rescan per batch of events."""
+        if not self.ready.is_set():
+            return  # The initial snapshot will pick them up
+        with self._lock:
+            changes = self.apply_changes(set(paths), ())
+        if changes["folders"]:
+            self.send_changes(changes)
+
+    def ingest(self, path):
+        """
+        Applies one file ComfyUI reported writing right away, without waiting for the debounce. The
+        watchdog event for it then finds the fingerprint unchanged and sends nothing twice.
+        """
+        if not self.ready.is_set():
+            return  # The initial snapshot will pick it up
+        with self._lock:
+            changes = self.apply_changes({path}, ())
+        if changes["folders"]:
+            self.send_changes(changes)
+
+    def send_changes(self, changes):
+        """Hands the delta to the change journal, which numbers, coalesces and emits it."""
+        get_gallery_stats().count("changes_sent", sum(len(files) for files in changes["folders"].values()))
+        # In-place rewrites keep the directory mtime, so cached listings of these folders are dropped here
+        listing_cache = get_listing_cache()
+        for folder_key in changes["folders"]:
+            relative_dir = "" if folder_key == self.root else folder_key[len(self.root) + 1:]
+            listing_cache.invalidate(os.path.join(self.base_path, relative_dir))
+        get_change_journal(self.root, self.base_path).record(changes)
+
+    def _folder_key(self, relative_dir):
+        return os.path.join(self.root, relative_dir) if relative_dir not in ("", ".") else self.root
+
+    def _relative(self, path):
+        """Returns path relative to the monitored root, or None if it lies outside."""
+        relative = os.path.relpath(path, self.base_path)
+        return None if relative == ".." or relative.startswith(".." + os.sep) else relative
+
+    def apply_changes(self, files, directories):
+        """
+        Brings the fingerprints up to date for the given paths only and returns the delta in the
+        Gallery.file_change format: {"folders": {folder: {file: {"action": ..., **data}}}}.
+        The current state on disk decides the action, so coalesced events resolve correctly.
+        """
+        changes = {"folders": {}}
+        with self._lock:
+            for dir_path in directories:
+                self._apply_directory(dir_path, changes)
+            for path in files:
+                self._apply_file(path, changes)
+
+        index = get_metadata_index()
+        if index is not None:
+            index.flush()
+        return changes
+
+    def _apply_file(self, path, changes):
+        relative = self._relative(path)
+        if relative is None:
+            return
+        relative_dir, name = os.path.split(relative)
+        state = self.known_folders.get(relative_dir)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            stat_result = None
+
+        if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+            signature = fingerprint(stat_result)
+            if state is not None and state.files.get(name) == signature:
+                return  # Touched but unchanged
+            if state is None:
+                # Folder not seen yet; its parent's mtime changed too, so the next sweep lists it
+                state = FolderState(None, {}, [])
+                self._add_folder(relative_dir, state)
+            file_info = process_file(path, name, self.base_path, stat_result, self.root)
+            if file_info is None:
+                return
+            action = "update" if name in state.files else "create"
+            state.set_file(name, signature)
+            changes["folders"].setdefault(self._folder_key(relative_dir), {})[name] = {"action": action, **file_info}
+        elif state is not None and name in state.files:
+            state.remove_file(name)
+            index = get_metadata_index()
+            if index is not None:
+                index.remove(path)
+            changes["folders"].setdefault(self._folder_key(relative_dir), {})[name] = {"action": "remove"}
+
+    def _apply_directory(self, dir_path, changes):
+        """Re-fingerprints one directory subtree (or drops it, if it is gone) and emits the differences."""
+        relative = self._relative(dir_path)
+        if relative is None:
+            return
+        subfolder = "" if relative == "." else relative
+        known = [
+            relative_dir for relative_dir in self.known_folders
+            if not subfolder or relative_dir == subfolder or relative_dir.startswith(subfolder + os.sep)
+        ]
+
+        current = {}
+        if os.path.isdir(dir_path):
+            get_gallery_stats().count("directory_rescans")
+            current = self.snapshot_tree(subfolder)
+
+        for relative_dir in set(known) | set(current):
+            self._diff_folder(relative_dir, self.known_folders.get(relative_dir), current.get(relative_dir), changes)
+        for relative_dir in known:
+            del self.known_folders[relative_dir]
+        self.known_folders.update(current)
+        if subfolder in current:
+            self._add_folder(subfolder, current[subfolder])
+        else:
+            self._unlink_folder(subfolder)
+
+    def _add_folder(self, relative_dir, state):
+        """
+        Stores the state of a folder and adds it to its parent's subfolder names, creating placeholder
+        states (listed by the next sweep) for parents not seen yet.
+        """
+        self.known_folders[relative_dir] = state
+        while relative_dir:
+            parent_dir, name = os.path.split(relative_dir)
+            parent = self.known_folders.get(parent_dir)
+            if parent is None:
+                parent = self.known_folders[parent_dir] = FolderState(None, {}, [])
+            elif name in parent.subdirs:
+                return
+            if not name.startswith("."):
+                parent.subdirs.append(name)
+            relative_dir = parent_dir
+
+    def _unlink_folder(self, relative_dir):
+        """Drops a deleted or moved-away folder from its parent's subfolder names."""
+        if not relative_dir:
+            return
+        parent_dir, name = os.path.split(relative_dir)
+        parent = self.known_folders.get(parent_dir)
+        if parent is not None and name in parent.subdirs:
+            parent.subdirs.remove(name)
+
+    def _diff_folder(self, relative_dir, old, new, changes):
+        """
+        Adds the differences between two FolderStates of one directory (either may be None) to changes.
+        Metadata is only read for new or modified files; files that can't be processed are left out of
+        new, so they are retried next time.
+        """
+        old_files = old.files if old is not None else {}
+        new_files = new.files if new is not None else {}
+        folder_key = self._folder_key(relative_dir)
+        for name, signature in list(new_files.items()):
+            if old_files.get(name) == signature:
+                continue
+            file_info = process_file(os.path.join(self.base_path, relative_dir, name), name, self.base_path, root=self.root)
+            if file_info is None:
+                new.remove_file(name)
+                continue
+            action = "update" if name in old_files else "create"
+            changes["folders"].setdefault(folder_key, {})[name] = {"action": action, **file_info}
+
+        removed = old_files.keys() - new_files.keys()
+        if removed:
+            index = get_metadata_index()
+            for name in removed:
+                if index is not None:
+                    index.remove(os.path.join(self.base_path, relative_dir, name))
+                changes["folders"].setdefault(folder_key, {})[name] = {"action": "remove"}
+
+    def _snapshot_dir(self, relative_dir):
+        return snapshot_dir(self.base_path, relative_dir)
+
+    def snapshot_tree(self, subfolder="", cancel_event=None):
+        return snapshot_tree(self.base_path, subfolder, cancel_event)
+
+    def folder_totals(self, subfolder=""):
+        """
+        Returns {relative_dir below subfolder: (totals, subdir names)} from the fingerprints, see
+        FolderState.totals, or None until the initial snapshot is done.
+        """
+        if not self.ready.is_set():
+            return None
+        prefix = subfolder + os.sep if subfolder else ""
+        with self._lock:
+            return {
+                relative_dir[len(prefix):]: (state.totals, list(state.subdirs))
+                for relative_dir, state in self.known_folders.items()
+                if relative_dir == subfolder or relative_dir.startswith(prefix)
+            }
+
+    def sweep(self, verify_until=None):
+        """
+        Diffs the fingerprints against the disk and returns the delta. Directories whose mtime is
+        unchanged kept their entries, so only their subfolders are visited; changed directories are
+        listed again. In-place rewrites that keep a directory's mtime are left to the watchdog events,
+        or, with verify_until (a perf_counter deadline), to the rolling verification of unchanged folders.
+        """
+        changes = {"folders": {}}
+        with self._lock:
+            listed = set()
+            seen = set()
+            stack = [""]
+            while stack:
+                relative_dir = stack.pop()
+                old = self.known_folders.get(relative_dir)
+                try:
+                    dir_mtime_ns = os.stat(os.path.join(self.base_path, relative_dir)).st_mtime_ns
+                except OSError:
+                    continue  # Gone, dropped below with everything else not seen
+                if old is not None and old.dir_mtime_ns == dir_mtime_ns:
+                    state = old
+                else:
+                    state = self._snapshot_dir(relative_dir)
+                    if state is None:
+                        continue
+                    self._diff_folder(relative_dir, old, state, changes)
+                    self.known_folders[relative_dir] = state
+                    listed.add(relative_dir)
+                seen.add(relative_dir)
+                stack.extend(os.path.join(relative_dir, name) for name in state.subdirs)
+
+            for relative_dir in set(self.known_folders) - seen:
+                self._diff_folder(relative_dir, self.known_folders.pop(relative_dir), None, changes)
+
+            if verify_until is not None:
+                self._verify(listed, verify_until, changes)
+
+        index = get_metadata_index()
+        if index is not None:
+            index.flush()
+        return changes
+
+    def _verify(self, listed, deadline, changes):
+        """
+        Lists folders whose mtime looked unchanged, round-robin until deadline, and diffs their stored
+        listing against the new one. Catches in-place rewrites and servers that cache or don't update
+        directory mtimes; every folder is checked once per cycle through the queue.
+        """
+        verified = 0
+        for _ in range(len(self.known_folders)):
+            if time.perf_counter() >= deadline:
+                break
+            if not self._verify_queue:
+                self._verify_queue.extend(self.known_folders)
+            relative_dir = self._verify_queue.popleft()
+            old = self.known_folders.get(relative_dir)
+            if old is None or relative_dir in listed:
+                continue  # Gone, or already listed by this sweep
+            state = self._snapshot_dir(relative_dir)
+            if state is None:
+                continue
+            self._diff_folder(relative_dir, old, state, changes)
+            self.known_folders[relative_dir] = state
+            verified += 1
+        get_gallery_stats().count("poll_verified_directories", verified)
+
+    def poll(self, verify_until):
+        """One polling pass (sweep plus rolling verification), sends the delta. Returns True if anything changed."""
+        stats = get_gallery_stats()
+        stats.count("polls")
+        with stats.timer("poll"):
+            changes = self.sweep(verify_until)
+
+        if changes["folders"]:
+            print(f"FileSystemMonitor: Polling found {len(changes['folders'])} folders with changes")
+            self.send_changes(changes)
+            return True
+        return False
+
+    def reconcile(self):
+        """Safety-net sweep for anything events missed, see sweep()."""
+        stats = get_gallery_stats()
+        stats.count("reconcile_sweeps")
+        with stats.timer("reconcile"):
+            changes = self.sweep()
+
+        if changes["folders"]:
+            print(f"FileSystemMonitor: Reconciliation found {len(changes['folders'])} folders with missed changes")
+            self.send_changes(changes)
 
 
 class FileSystemMonitor:
-    """Monitors the output directory for file system changes with improved robustness."""
+    """
+    Monitors a gallery root (or a folder below it) for file system changes with improved robustness.
+    With a shared observer (see monitor_registry) only this monitor's watch is added and removed;
+    otherwise the monitor runs an observer of its own. In "poll" mode (network mounts, where other
+    hosts' writes raise no events) no observer is used and the folder is polled instead, see _poll().
+    """
 
-    def __init__(self, base_path, interval=1.0):
+    def __init__(self, base_path, interval=1.0, reconcile_interval=RECONCILE_INTERVAL, root="output", observer=None, mode=None):
         self.base_path = base_path
+        self.root = root
         self.interval = interval
-        self.observer = Observer()
-        
-        # Create patterns from supported extensions
-        patterns = ["*" + ext for ext in SUPPORTED_EXTENSIONS]
+        self.reconcile_interval = reconcile_interval
+        self.mode = mode or monitor_mode(base_path)
+        if self.mode == "poll":
+            observer = None
+        self._owns_observer = observer is None
+        self.observer = observer if observer is not None or self.mode == "poll" else Observer()
+        self._watch = None
+        self._stop_event = threading.Event()  # Cancels the initial scan when stopped early
         
-        # Create event handler with patterns
+        # No patterns: directory events are needed too, the handler filters file extensions itself
         self.event_handler = GalleryEventHandler(
             base_path=base_path,
-            patterns=patterns,
-            debounce_interval=0.5
+            debounce_interval=0.5,
+            root=root
         )
-        
-        # Initialize with scan
-        self.event_handler.last_known_folders, _ = _scan_for_images(base_path, "output", True)
         self.thread = None
         self._running = False  # Flag to track monitor state
 
@@ -103,32 +569,84 @@ class FileSystemMonitor:
             
         if self.thread is None or not self.thread.is_alive():
             self._running = True
+            self._stop_event.clear()
             self.thread = threading.Thread(target=self._start_observer_thread, daemon=True)
             self.thread.start()
-            print(f"FileSystemMonitor: Watchdog monitoring started for {self.base_path}")
+            print(f"FileSystemMonitor: {'Polling' if self.mode == 'poll' else 'Watchdog'} monitoring started for {self.base_path}")
         else:
             print("FileSystemMonitor: Watchdog monitoring thread already running.")
 
     def _start_observer_thread(self):
         """Observer thread with improved error handling."""
         try:
-            self.observer.schedule(self.event_handler, self.base_path, recursive=True)
-            self.observer.start()
-            
-            # Keep thread alive until stopped
+            if self.observer is not None:
+                self._watch = self.observer.schedule(self.event_handler, self.base_path, recursive=True)
+                if self._owns_observer:
+                    self.observer.start()
+
+            # Initial snapshot runs here rather than in the request handler, with the observer already
+            # collecting events so nothing written during the snapshot is missed
+            self.event_handler.known_folders = self.event_handler.snapshot_tree(cancel_event=self._stop_event)
+            self.event_handler.ready.set()
+            with self.event_handler._lock:
+                pending = self.event_handler.pending_changes or self.event_handler.pending_directories
+            if pending:
+                self.event_handler.debounce_event()  # Rescans that gave up waiting for the snapshot
+
+            if self.mode == "poll":
+                self._poll()
+                return
+
+            # Keep thread alive until stopped, running the reconciliation sweep now and then
+            next_reconcile = time.monotonic() + self.reconcile_interval
             while self._running:
                 time.sleep(0.1)
+                if time.monotonic() >= next_reconcile:
+                    try:
+                        self.event_handler.reconcile()
+                    except Exception as e:
+                        print(f"FileSystemMonitor: Error during reconciliation sweep: {e}")
+                    next_reconcile = time.monotonic() + self.reconcile_interval
                 
+        except ScanCancelled:
+            print("FileSystemMonitor: Initial snapshot cancelled.")
         except Exception as e:
             print(f"FileSystemMonitor: Error in monitoring thread: {e}")
         finally:
             self.stop_monitoring(from_thread=True)
 
+    def _poll(self):
+        """
+        Polls until stopped. The interval drops to POLL_MIN_INTERVAL whenever a poll finds changes and
+        doubles while idle, up to POLL_MAX_INTERVAL. Each poll may spend POLL_BUDGET of its interval
+        re-listing unchanged folders, and is followed by a sleep long enough that polling as a whole
+        stays within POLL_BUDGET of the time even when the mtime checks alone take longer.
+        """
+        interval = POLL_MIN_INTERVAL
+        while not self._stop_event.wait(interval):
+            start = time.perf_counter()
+            try:
+                changed = self.event_handler.poll(verify_until=start + interval * POLL_BUDGET)
+            except Exception as e:
+                print(f"FileSystemMonitor: Error while polling: {e}")
+                changed = False
+            elapsed = time.perf_counter() - start
+            interval = POLL_MIN_INTERVAL if changed else min(interval * 2, POLL_MAX_INTERVAL)
+            interval = max(interval, elapsed * (1 - POLL_BUDGET) / POLL_BUDGET)
+
     def stop_monitoring(self, from_thread=False):
         """Stops the Watchdog observer with improved cleanup."""
         self._running = False
+        self._stop_event.set()
         
-        if self.observer.is_alive():
+        if not self._owns_observer:
+            watch, self._watch = self._watch, None
+            if watch is not None:
+                try:
+                    self.observer.unschedule(watch)  # The shared observer keeps serving other roots
+                except Exception as e:
+                    print(f"FileSystemMonitor: Error removing watch: {e}")
+        elif self.observer is not None and self.observer.is_alive():
             try:
                 self.observer.stop()
                 self.observer.join(timeout=2.0)  # Wait up to 2 seconds for observer to stop
@@ -137,44 +655,7 @@ class FileSystemMonitor:
         
         if not from_thread:  # Only reset thread if called from outside the thread
             self.thread = None
-            print("FileSystemMonitor: Watchdog monitoring stopped.")
-
-
-# --- Helper function to detect folder changes with improved comparison ---
-def detect_folder_changes(old_folders, new_folders):
-    """Detects changes between two folder data dictionaries with improved comparison logic."""
-    changes = {"folders": {}}
-
-    # Get all folder names from both old and new data
-    all_folders = set(old_folders.keys()) | set(new_folders.keys())
-    
-    for folder_name in all_folders:
-        old_folder = old_folders.get(folder_name, {})
-        new_folder = new_folders.get(folder_name, {})
-        folder_changes = {}
-
-        # Get all file names from both old and new folder data
-        old_files = set(old_folder.keys())
-        new_files = set(new_folder.keys())
-        all_files = old_files | new_files
-
-        for filename in all_files:
-            old_file_data = old_folder.get(filename)
-            new_file_data = new_folder.get(filename)
-
-            if filename not in old_folder:  # New file
-                folder_changes[filename] = {"action": "create", **new_file_data}
-            elif filename not in new_folder:  # Removed file
-                folder_changes[filename] = {"action": "remove"}
-            elif old_file_data != new_file_data:  # Updated file 
-                # For more precise change detection, we could compare specific fields
-                # that are most likely to change, but this works well for most cases
-                folder_changes[filename] = {"action": "update", **new_file_data}
-
-        if folder_changes:
-            changes["folders"][folder_name] = folder_changes
-
-    return changes
+            print(f"FileSystemMonitor: {'Polling' if self.mode == 'poll' else 'Watchdog'} monitoring stopped.")
 
 
 # --- Helper function for initial scan ---
@@ -1,10 +1,19 @@
 import os
 import re
+import sys
+import site
+import time
 from datetime import datetime
 import mimetypes
 from pathlib import Path
+import threading
+import multiprocessing
 import concurrent.futures
-from .metadata_extractor import buildMetadata  # Import metadata extractor
+import importlib.util
+from urllib.parse import quote
+from .metadata_extractor import buildMetadata, buildMediaMetadata, buildSummary  # Import metadata extractor
+from .metadata_index import get_metadata_index, stat_signature
+from .gallery_stats import get_gallery_stats
 
 # Initialize mime types
 mimetypes.init()
@@ -14,6 +23,87 @@ IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff', '.tif')
 VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.avi', '.mkv')
 ANIMATION_EXTENSIONS = ('.gif', '.apng')
 SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS + ANIMATION_EXTENSIONS
+FILE_TYPES = ("image", "video", "animation", "unknown")
+# Directories modified this recently may still change within the same mtime tick (coarse mtime clocks)
+RACY_MTIME_NS = 2_000_000_000
+
+# One worker pool shared by every scan, so parallelism spans folders and pools aren't rebuilt per directory
+SCAN_WORKERS = int(os.environ.get("COMFYUI_GALLERY_SCAN_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+MAX_PENDING_PER_WORKER = 4  # Bounds the files a walk may queue ahead of the workers
+# When > 0, uncached metadata is parsed in this many worker processes (CPU-bound JSON parsing escapes the GIL)
+SCAN_PROCESSES = int(os.environ.get("COMFYUI_GALLERY_SCAN_PROCESSES", "0"))
+PARSE_TIMEOUT = float(os.environ.get("COMFYUI_GALLERY_PARSE_TIMEOUT", "30"))  # Seconds before a file is parsed in-process instead
+PARSE_WORKER = "gallery_parse_worker"
+
+_scan_pool = None
+_parse_pool = None
+_pool_lock = threading.Lock()
+
+class ScanCancelled(Exception):
+    """Raised inside a scan when its cancel event is set (e.g. the requesting client disconnected)."""
+
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise ScanCancelled()
+
+def _get_scan_pool():
+    """Returns the shared scan worker pool, creating it on first use."""
+    global _scan_pool
+    if _scan_pool is None:
+        with _pool_lock:
+            if _scan_pool is None:
+                _scan_pool = concurrent.futures.ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="GalleryScan")
+    return _scan_pool
+
+def _load_parse_worker():
+    """Returns gallery_parse_worker loaded as a top-level module, so workers can import it by that name."""
+    worker = sys.modules.get(PARSE_WORKER)
+    if worker is None:
+        spec = importlib.util.spec_from_file_location(PARSE_WORKER, os.path.join(os.path.dirname(__file__), PARSE_WORKER + ".py"))
+        worker = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(worker)
+        sys.modules[PARSE_WORKER] = worker
+    return worker
+
+def _get_parse_pool():
+    """Returns the metadata parsing process pool, or None when process mode is off or unavailable."""
+    global _parse_pool
+    if _parse_pool is None:
+        with _pool_lock:
+            if _parse_pool is None:
+                _parse_pool = False
+                if SCAN_PROCESSES > 0:
+                    # Fresh interpreters rather than forks, which could inherit locks held by other threads;
+                    # workers only get the extension folder on their path to import the parse worker
+                    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                    _parse_pool = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=SCAN_PROCESSES, mp_context=multiprocessing.get_context(start_method),
+                        initializer=site.addsitedir, initargs=(os.path.dirname(os.path.abspath(__file__)),),
+                    )
+    return _parse_pool or None
+
+def _drop_parse_pool(parse_pool):
+    """Stops using a process pool whose workers died; parsing continues in-process."""
+    global _parse_pool
+    with _pool_lock:
+        if _parse_pool is parse_pool:
+            _parse_pool = False
+            print("Gallery: Metadata parsing processes failed, parsing in-process from now on.")
+    parse_pool.shutdown(wait=False, cancel_futures=True)
+
+def _parse_in_pool(parse_pool, full_path):
+    """Parses a file in the process pool, falling back to this process if that takes over PARSE_TIMEOUT or the pool broke."""
+    try:
+        future = parse_pool.submit(_load_parse_worker().build_metadata, full_path)
+        return future.result(timeout=PARSE_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        print(f"Gallery: Parsing {full_path} took over {PARSE_TIMEOUT}s in a worker process, parsing in-process.")
+    except concurrent.futures.process.BrokenProcessPool:
+        _drop_parse_pool(parse_pool)
+    get_gallery_stats().count("metadata_parse_fallbacks")
+    return _build_metadata(full_path)
 
 def get_file_type(file_path):
     """Determine file type based on extension."""
@@ -26,107 +116,234 @@ def get_file_type(file_path):
         return "animation"
     return "unknown"
 
-def process_file(full_path, entry, full_base_path):
-    """Process a single file and return its metadata."""
+def _build_metadata(full_path):
+    """Parses a file's metadata and its listing summary (also run by the parse worker processes)."""
+    if get_file_type(full_path) == "image":
+        _, _, metadata = buildMetadata(full_path)
+    else:
+        _, metadata = buildMediaMetadata(full_path)
+    return metadata, buildSummary(metadata)
+
+def extract_metadata(full_path, stat_result, index=None, field="metadata"):
+    """
+    Returns the full metadata (field="metadata") or the listing summary (field="summary") of an
+    image, video or animation, served from the persistent index when the file is unchanged.
+    """
+    stats = get_gallery_stats()
+    mtime_ns, size = stat_signature(stat_result)
+    if index is not None:
+        cached = index.lookup(full_path, mtime_ns, size, field)
+        if cached is not None:
+            stats.count("metadata_cache_hits")
+            return cached
+
+    stats.count("metadata_cache_misses")
+    try:
+        with stats.timer("extract_metadata"):
+            parse_pool = _get_parse_pool()
+            if parse_pool is not None:
+                metadata, summary = _parse_in_pool(parse_pool, full_path)
+            else:
+                metadata, summary = _build_metadata(full_path)
+    except Exception as e:
+        print(f"Gallery: Error building metadata for {full_path}: {e}")
+        stats.count("metadata_errors")
+        return {}  # Not cached, so a transient failure is retried on the next scan
+
+    if index is not None:
+        index.store(full_path, mtime_ns, size, metadata, summary)
+    return metadata if field == "metadata" else summary
+
+def scan_file(full_path, stat_result):
+    """Returns (file type, listing summary) of a file; full metadata is served by /Gallery/metadata."""
+    file_type = get_file_type(full_path)
+    if file_type == "unknown":
+        return file_type, {}
+    return file_type, extract_metadata(full_path, stat_result, get_metadata_index(), "summary")
+
+def root_relative_path(root, full_path):
+    """Returns full_path relative to the directory of root, "/"-separated ("" for that directory): a relative_path request parameter."""
+    from .monitor_registry import resolve_root  # monitor_registry imports this module
+    relative = os.path.relpath(full_path, resolve_root(root))
+    return "" if relative == "." else relative.replace(os.sep, "/")
+
+def format_entry(name, subfolder, root, timestamp, mtime_ns, file_size, file_type, summary, relative_path=""):
+    """
+    Builds the listing entry of a file from its stored fields; the URLs, date and size text are derived here.
+    root names the ComfyUI directory (output, input or temp) the file lies in, for the URLs, and
+    relative_path (see root_relative_path) the folder below it that subfolder is relative to.
+    """
+    date_str = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    url_path = f"/view?filename={name}&subfolder={subfolder}"
+    url_path = url_path.replace("\\", "/")
+    root_query = ""
+    if root != "output":
+        url_path += f"&type={root}"
+        root_query = f"&root={quote(root)}"
+    if relative_path:
+        root_query += f"&relative_path={quote(relative_path)}"  # /Gallery/thumbnail resolves subfolder below it
+
+    size_str = f"{file_size / 1024:.1f} KB" if file_size < 1024 * 1024 else f"{file_size / (1024 * 1024):.2f} MB"
+
+    thumbnail_url = None
+    if file_type != "unknown":
+        # Videos get a poster frame. The version parameter changes with the file,
+        # so the thumbnail URL can be cached forever
+        thumbnail_url = (
+            f"/Gallery/thumbnail?filename={quote(name)}"
+            f"&subfolder={quote(subfolder.replace(os.sep, '/'))}&v={mtime_ns}{root_query}"
+        )
+
+    summary = dict(summary)
+    return {
+        "name": name,
+        "url": url_path,
+        "timestamp": timestamp,
+        "date": date_str,
+        "type": file_type,
+        "size": size_str,
+        "size_bytes": file_size,
+        "resolution": summary.pop("resolution", None),
+        "summary": summary,
+        "thumbnail_url": thumbnail_url
+    }
+
+def process_file(full_path, entry, full_base_path, stat_result=None, root="output"):
+    """
+    Process a single file and return its listing entry (summary fields only, see extract_metadata for the rest).
+    root names the ComfyUI directory (output, input or temp) full_base_path lies in, for the URLs.
+    """
     try:
-        timestamp = os.path.getmtime(full_path)
-        date_str = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-        dir_path = os.path.dirname(full_path)
-        rel_path = os.path.relpath(dir_path, full_base_path)
-        filename = entry
+        if stat_result is None:
+            stat_result = os.stat(full_path)
+        rel_path = os.path.relpath(os.path.dirname(full_path), full_base_path)
         subfolder = rel_path if rel_path != "." else ""
-        url_path = f"/view?filename={filename}&subfolder={subfolder}"
-        url_path = url_path.replace("\\", "/")
-        
-        file_type = get_file_type(full_path)
-        file_size = os.path.getsize(full_path)
-        size_str = f"{file_size / 1024:.1f} KB" if file_size < 1024 * 1024 else f"{file_size / (1024 * 1024):.2f} MB"
-        
-        metadata = {}
-        thumbnail_url = None
-        
-        # Extract metadata for images
-        if file_type == "image":
-            try:
-                _, _, metadata = buildMetadata(full_path)
-            except Exception as e:
-                print(f"Gallery: Error building metadata for {full_path}: {e}")
-                metadata = {}
-        
-        return {
-            "name": entry,
-            "url": url_path,
-            "timestamp": timestamp,
-            "date": date_str,
-            "metadata": metadata,
-            "type": file_type,
-            "size": size_str,
-            "size_bytes": file_size,
-            "thumbnail_url": thumbnail_url
-        }
+        file_type, summary = scan_file(full_path, stat_result)
+        return format_entry(
+            entry, subfolder, root, stat_result.st_mtime, stat_result.st_mtime_ns, stat_result.st_size, file_type, summary,
+            root_relative_path(root, full_base_path)
+        )
     except Exception as e:
         print(f"Gallery: Error processing file {full_path}: {e}")
         return None
 
-def _scan_for_images(full_base_path, base_path, include_subfolders):
+def listing_entry(full_path, full_base_path, base_path):
     """
-    Scans directories for media files and their metadata with parallel processing.
-    Returns a nested dictionary structure for efficient access and updates.
+    Returns the listing entry of one file plus its "folder" key, or None if the file is gone.
+    Used for results that come from the index rather than a directory walk (search, duplicates).
     """
-    folders_data = {}
-    current_files = set()
-    changed = False
-    
-    # Function to scan a specific directory for media files
-    def scan_directory(dir_path, relative_path=""):
-        """Recursively scans a directory for supported media files."""
-        nonlocal changed
-        folder_content = {}  # Dictionary to hold files for the current folder
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        return None
+    file_info = process_file(full_path, os.path.basename(full_path), full_base_path, stat_result, base_path)
+    if file_info is not None:
+        relative_dir = os.path.relpath(os.path.dirname(full_path), full_base_path)
+        file_info["folder"] = os.path.join(base_path, relative_dir) if relative_dir != "." else base_path
+    return file_info
+
+def _scan_dir_entry(dir_entry):
+    """Worker task: returns (name, stat result, file type, summary) of one os.DirEntry, reusing its cached stat result."""
+    try:
+        stat_result = dir_entry.stat()
+        with get_gallery_stats().timer("process_file"):
+            file_type, summary = scan_file(dir_entry.path, stat_result)
+    except Exception as e:
+        print(f"Gallery: Error processing file {dir_entry.path}: {e}")
+        return None
+    return dir_entry.name, stat_result, file_type, summary
+
+def walk_media(top, include_subfolders=True, relative_path="", cancel_event=None):
+    """
+    Walks top with os.scandir and yields (relative_dir, [DirEntry, ...]) with the supported files of
+    each directory, depth-first. Hidden subfolders are skipped, unreadable directories are reported.
+    """
+    stats = get_gallery_stats()
+    stack = [(top, relative_path)]
+    while stack:
+        _check_cancelled(cancel_event)
+        dir_path, relative_dir = stack.pop()
+        files = []
+        subdirs = []
+        stats.count("directories_scanned")
         try:
-            entries = os.listdir(dir_path)
-            file_entries = []
-            subfolder_tasks = []
-
-            for entry in entries:
-                full_path = os.path.join(dir_path, entry)
-                if os.path.isdir(full_path):
-                    if include_subfolders and not entry.startswith("."):
-                        next_relative_path = os.path.join(relative_path, entry)
-                        subfolder_tasks.append((full_path, next_relative_path))
-                elif os.path.isfile(full_path):
-                    # Check if the file has a supported extension before processing
-                    if any(entry.lower().endswith(ext) for ext in SUPPORTED_EXTENSIONS):
-                        file_entries.append((full_path, entry))
-                        current_files.add(full_path)
-            
-            # Process subfolder tasks
-            for subfolder_path, subfolder_rel_path in subfolder_tasks:
-                scan_directory(subfolder_path, subfolder_rel_path)
-            
-            # Process files in parallel for better performance
-            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                # Submit all file processing tasks
-                future_to_file = {
-                    executor.submit(process_file, full_path, entry, full_base_path): (full_path, entry)
-                    for full_path, entry in file_entries
-                }
-                
-                # Process results as they complete
-                for future in concurrent.futures.as_completed(future_to_file):
-                    full_path, entry = future_to_file[future]
+            with stats.timer("walk_directory"), os.scandir(dir_path) as entries:
+                for entry in entries:
                     try:
-                        file_info = future.result()
-                        if file_info:
-                            folder_content[entry] = file_info
-                    except Exception as e:
-                        print(f"Gallery: Error in processing thread for {full_path}: {e}")
+                        if entry.is_dir():
+                            if include_subfolders and not entry.name.startswith("."):
+                                subdirs.append((entry.path, os.path.join(relative_dir, entry.name)))
+                        elif entry.is_file() and entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                            files.append(entry)
+                    except OSError:
+                        continue  # Entry vanished or is unreadable
+        except OSError as e:
+            print(f"Gallery: Error scanning directory {dir_path}: {e}")
+            continue
+        stack.extend(reversed(subdirs))
+        yield relative_dir, files
 
-            folder_key = os.path.join(base_path, relative_path) if relative_path else base_path
-            if folder_content:  # Only add folder if it has content
-                folders_data[folder_key] = folder_content
+def iter_scan_records(full_base_path, include_subfolders=True, subfolder="", cancel_event=None):
+    """
+    Streams (relative_dir, (name, stat_result, file_type, summary)) records in completion order. The
+    directory walk feeds the shared scan pool while earlier files are still being processed, so
+    parallelism spans folders; at most SCAN_WORKERS * MAX_PENDING_PER_WORKER files are in flight at once.
+    Raises ScanCancelled as soon as cancel_event is set.
+    """
+    pool = _get_scan_pool()
+    max_pending = SCAN_WORKERS * MAX_PENDING_PER_WORKER
+    pending = {}  # Future -> (relative_dir, full_path)
+    stats = get_gallery_stats()
+    stats.count("scans")
+    started = time.perf_counter()
 
-        except Exception as e:
-            print(f"Gallery: Error scanning directory {dir_path}: {e}")
+    def harvest(timeout=None):
+        done, _ = concurrent.futures.wait(pending, timeout, concurrent.futures.FIRST_COMPLETED)
+        stats.count("files_scanned", len(done))
+        for future in done:
+            relative_dir, full_path = pending.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"Gallery: Error in processing thread for {full_path}: {e}")
+                continue
+            if record:
+                yield relative_dir, record
+        _check_cancelled(cancel_event)
+
+    top = os.path.join(full_base_path, subfolder) if subfolder else full_base_path
+    try:
+        for relative_dir, files in walk_media(top, include_subfolders, subfolder, cancel_event):
+            for dir_entry in files:
+                if len(pending) >= max_pending:
+                    yield from harvest()
+                future = pool.submit(_scan_dir_entry, dir_entry)
+                pending[future] = (relative_dir, dir_entry.path)
+            yield from harvest(timeout=0)  # Hand back whatever has finished while walking
+        while pending:
+            yield from harvest()
+    except ScanCancelled:
+        stats.count("scans_cancelled")
+        raise
+    finally:
+        for future in pending:
+            future.cancel()  # Abandoned or cancelled scan, don't leave queued work behind
+        stats.observe("scan", time.perf_counter() - started)
+
+        index = get_metadata_index()
+        if index is not None:
+            index.flush()
+
+def rebuild_index(full_base_path, include_subfolders=True):
+    """Drops all cached metadata below full_base_path and re-extracts it from scratch, returns the number of files."""
+    index = get_metadata_index()
+    if index is not None:
+        index.clear(full_base_path)
+    return sum(1 for _ in iter_scan_records(full_base_path, include_subfolders))
 
-    scan_directory(full_base_path, "")
-    return folders_data, changed
\ No newline at end of file
+def verify_index(full_base_path):
+    """Purges index entries below full_base_path whose files were removed or modified."""
+    index = get_metadata_index()
+    if index is None:
+        return {"checked": 0, "missing": 0, "stale": 0}
+    return index.verify(full_base_path)
\ No newline at end of file
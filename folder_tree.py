@@ -0,0 +1,53 @@
+import os
+from .folder_monitor import snapshot_tree
+from .monitor_registry import get_monitor_registry
+from .gallery_stats import get_gallery_stats
+
+
+def _folder_key(root, relative_dir):
+    return os.path.join(root, relative_dir) if relative_dir else root
+
+
+def folder_tree(root, full_path, cancel_event=None):
+    """
+    Returns {folder_key: node} for full_path and every folder below it. A node holds the folder's own
+    "files", "bytes", "types" (files per type) and "newest" (mtime), the same over its whole subtree as
+    "total_files", "total_bytes" and "total_newest", and its "parent" and "children" folder keys.
+    Built from the fingerprints of a monitor watching full_path when there is one, so no file is
+    touched, else from a stat-only walk. Raises ScanCancelled as soon as cancel_event is set.
+    """
+    folders = get_monitor_registry().folder_totals(root, full_path)
+    if folders is None:
+        get_gallery_stats().count("folder_tree_scans")
+        folders = {
+            relative_dir: (state.totals, state.subdirs)
+            for relative_dir, state in snapshot_tree(full_path, cancel_event=cancel_event).items()
+        }
+
+    tree = {}
+    for relative_dir, (totals, subdirs) in folders.items():
+        tree[_folder_key(root, relative_dir)] = {
+            **totals,
+            "parent": _folder_key(root, os.path.dirname(relative_dir)) if relative_dir else None,
+            "children": sorted(
+                _folder_key(root, os.path.join(relative_dir, name)) for name in subdirs
+                if os.path.join(relative_dir, name) in folders
+            ),
+            "total_files": totals["files"],
+            "total_bytes": totals["bytes"],
+            "total_newest": totals["newest"],
+        }
+
+    # Deepest folders first, so every subtree is complete before it is added to its parent
+    for relative_dir in sorted(folders, key=lambda relative_dir: relative_dir.count(os.sep), reverse=True):
+        if not relative_dir:
+            continue
+        node = tree[_folder_key(root, relative_dir)]
+        parent = tree.get(node["parent"])
+        if parent is None:
+            continue
+        parent["total_files"] += node["total_files"]
+        parent["total_bytes"] += node["total_bytes"]
+        if node["total_newest"] is not None and (parent["total_newest"] is None or node["total_newest"] > parent["total_newest"]):
+            parent["total_newest"] = node["total_newest"]
+    return tree
@@ -0,0 +1,189 @@
+import os
+import threading
+from array import array
+from itertools import islice
+from .folder_scanner import FILE_TYPES, format_entry, iter_scan_records, root_relative_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_TYPE_IDS = {file_type: type_id for type_id, file_type in enumerate(FILE_TYPES)}
+
+
+class Catalog:
+    """
+    Column-oriented listing of scanned files. Instead of a dict per file it keeps one compact array
+    or list per field, an interned folder table, and summaries as value tuples against shared key
+    tuples with their strings interned (models, samplers and prompts repeat across a batch).
+    Listing entries (URLs, date and size text) are only built when a row is serialized, and sorting
+    and filtering work on whole columns, with NumPy when it is installed.
+    """
+
+    def __init__(self, root="output", base_path=None, relative_path=""):
+        self.root = root  # ComfyUI directory the files lie in, for the URLs
+        self.base_path = root if base_path is None else base_path  # Prefix of the folder keys
+        self.relative_path = relative_path  # Scanned folder below the root directory, for the URLs
+        self.folders = []  # Folder id -> relative_dir ("" for the top)
+        self.folder_ids = array("I")
+        self.names = []
+        self.timestamps = array("d")  # st_mtime, also the cursor value of the timestamp sort
+        self.mtime_ns = array("q")
+        self.sizes = array("q")
+        self.types = array("B")  # Index into FILE_TYPES
+        self.summary_keys = array("I")  # Index into _key_tuples
+        self.summary_values = []
+        self._folder_index = {}
+        self._key_tuples = []
+        self._key_index = {}
+        self._strings = {}
+        self._orderings = {}
+        self._search_texts = None  # (lowercased names, lowercased prompts), built by the first filter
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _intern(self, value):
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+        if isinstance(value, list):
+            return [self._intern(item) for item in value]
+        if isinstance(value, dict):
+            return {self._intern(key): self._intern(item) for key, item in value.items()}
+        return value
+
+    def add(self, relative_dir, name, stat_result, file_type, summary):
+        """Appends one file (a record from iter_scan_records) and returns its row."""
+        folder_id = self._folder_index.get(relative_dir)
+        if folder_id is None:
+            folder_id = self._folder_index[relative_dir] = len(self.folders)
+            self.folders.append(relative_dir)
+        keys = tuple(summary)
+        key_id = self._key_index.get(keys)
+        if key_id is None:
+            key_id = self._key_index[keys] = len(self._key_tuples)
+            self._key_tuples.append(keys)
+
+        self.folder_ids.append(folder_id)
+        self.names.append(name)
+        self.timestamps.append(stat_result.st_mtime)
+        self.mtime_ns.append(stat_result.st_mtime_ns)
+        self.sizes.append(stat_result.st_size)
+        self.types.append(_TYPE_IDS.get(file_type, _TYPE_IDS["unknown"]))
+        self.summary_keys.append(key_id)
+        self.summary_values.append(tuple(self._intern(value) for value in summary.values()))
+        self._orderings = {}
+        self._search_texts = None
+        return len(self.names) - 1
+
+    def summary(self, row):
+        """Returns the listing summary of a row as a new dict."""
+        return dict(zip(self._key_tuples[self.summary_keys[row]], self.summary_values[row]))
+
+    def folder_key(self, folder_id):
+        relative_dir = self.folders[folder_id]
+        return os.path.join(self.base_path, relative_dir) if relative_dir else self.base_path
+
+    def entry(self, row):
+        """Builds the listing entry of a row, see format_entry."""
+        return format_entry(
+            self.names[row], self.folders[self.folder_ids[row]], self.root, self.timestamps[row],
+            self.mtime_ns[row], self.sizes[row], FILE_TYPES[self.types[row]], self.summary(row), self.relative_path
+        )
+
+    def iter_folders(self):
+        """Yields (folder_key, rows) per folder, in scan order."""
+        rows_by_folder = {}
+        for row, folder_id in enumerate(self.folder_ids):
+            rows_by_folder.setdefault(folder_id, []).append(row)
+        for folder_id, rows in rows_by_folder.items():
+            yield self.folder_key(folder_id), rows
+
+    def sort_key(self, sort_key, row):
+        """Returns the (sort value, name) position of a row in the ordering for sort_key."""
+        if sort_key == "timestamp":
+            return self.timestamps[row], self.names[row]
+        elif sort_key == "size":
+            return self.sizes[row], self.names[row]
+        return self.names[row].lower(), self.names[row]
+
+    def ordering(self, sort_key):
+        """Returns the rows ascending by (sort value, name) as an array, computed once per sort key."""
+        rows = self._orderings.get(sort_key)
+        if rows is None:
+            with self._lock:
+                rows = self._orderings.get(sort_key)
+                if rows is None:
+                    rows = self._orderings[sort_key] = self._sort(sort_key)
+        return rows
+
+    def _sort(self, sort_key):
+        if np is None or not self.names:
+            return array("I", sorted(range(len(self.names)), key=lambda row: self.sort_key(sort_key, row)))
+        names = np.array(self.names)
+        if sort_key == "timestamp":
+            values = np.frombuffer(self.timestamps, dtype=np.float64)
+        elif sort_key == "size":
+            values = np.frombuffer(self.sizes, dtype=np.int64)
+        else:
+            values = np.char.lower(names)
+        return array("I", np.lexsort((names, values)).astype(np.uint32).tobytes())  # Last key sorts first
+
+    def _texts(self):
+        texts = self._search_texts
+        if texts is None:
+            prompts = []
+            for row in range(len(self.names)):
+                summary = self.summary(row)
+                prompts.append("\n".join(str(summary.get(field) or "") for field in ("positive", "negative")).lower())
+            texts = self._search_texts = ([name.lower() for name in self.names], prompts)
+        return texts
+
+    def match(self, name_filter="", prompt_filter=""):
+        """Returns a per-row mask of the rows containing both lowercased substrings, None without filters."""
+        if not (name_filter or prompt_filter):
+            return None
+        names, prompts = self._texts()
+        if np is not None:
+            mask = np.ones(len(names), dtype=bool)
+            if name_filter:
+                mask &= np.char.find(np.array(names, dtype=str), name_filter) >= 0
+            if prompt_filter:
+                mask &= np.char.find(np.array(prompts, dtype=str), prompt_filter) >= 0
+            return mask
+        return [
+            (not name_filter or name_filter in name) and (not prompt_filter or prompt_filter in prompt)
+            for name, prompt in zip(names, prompts)
+        ]
+
+    def bisect(self, rows, sort_key, position, right=False):
+        """Returns where position ((sort value, name), e.g. from a cursor) falls in an ordering of rows."""
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            key = self.sort_key(sort_key, rows[middle])
+            if key < position or (right and key == position):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def select(self, rows, mask, limit):
+        """Returns up to limit rows of rows (an ordering slice) that pass mask, in order."""
+        if mask is None:
+            return list(rows[:limit])
+        if np is not None:
+            selected = np.frombuffer(rows, dtype=np.uint32) if isinstance(rows, array) else np.asarray(rows, dtype=np.uint32)
+            return selected[mask[selected]][:limit].tolist()
+        return list(islice((row for row in rows if mask[row]), limit))
+
+
+def scan_catalog(full_base_path, base_path, include_subfolders=True, subfolder="", cancel_event=None, root=None):
+    """Scans like iter_scan_records but collects the files into a Catalog. Raises ScanCancelled as soon as cancel_event is set."""
+    root = root or base_path or "output"
+    catalog = Catalog(root, base_path, root_relative_path(root, full_base_path))
+    for relative_dir, record in iter_scan_records(full_base_path, include_subfolders, subfolder, cancel_event):
+        catalog.add(relative_dir, *record)
+    return catalog
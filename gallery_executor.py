@@ -0,0 +1,90 @@
+import os
+import asyncio
+import threading
+import concurrent.futures
+
+MAX_CONCURRENT_JOBS = int(os.environ.get("COMFYUI_GALLERY_MAX_JOBS", "4"))
+MAX_EXPORTS = int(os.environ.get("COMFYUI_GALLERY_MAX_EXPORTS", "2"))
+MAX_STREAMS = int(os.environ.get("COMFYUI_GALLERY_MAX_STREAMS", "4"))  # Concurrent NDJSON listing streams
+DISCONNECT_POLL_INTERVAL = 0.25  # Seconds between client disconnect checks while a job runs
+
+# Scans, metadata extraction and JSON serialization run here, never on the PromptServer loop
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="GalleryJob")
+# Zip exports last as long as the client takes to download them, so they never hold the job workers
+_export_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_EXPORTS, thread_name_prefix="GalleryExport")
+# Streamed listings wait on the client between batches too, likewise
+_stream_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_STREAMS, thread_name_prefix="GalleryStream")
+
+
+class ClientDisconnected(Exception):
+    """Raised while waiting for a job when the requesting client has gone away."""
+
+
+class _Flight:
+    """One running job and the number of requests waiting for its result."""
+
+    def __init__(self, future, cancel_event):
+        self.future = future
+        self.cancel_event = cancel_event
+        self.waiters = 0
+
+
+_flights = {}
+
+
+def _client_gone(request):
+    transport = request.transport
+    return transport is None or transport.is_closing()
+
+
+async def run_in_executor(func, *args):
+    """Runs func(*args) in the gallery executor without deduplication or cancellation."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+async def run_export(func, *args):
+    """Runs func(*args) on the export threads (MAX_EXPORTS at a time) instead of the gallery executor."""
+    return await asyncio.get_running_loop().run_in_executor(_export_executor, func, *args)
+
+
+async def run_stream(func, *args):
+    """Runs func(*args) on the stream threads (MAX_STREAMS at a time) instead of the gallery executor."""
+    return await asyncio.get_running_loop().run_in_executor(_stream_executor, func, *args)
+
+
+async def run_blocking(request, key, func, *args):
+    """
+    Runs func(*args, cancel_event) in the gallery executor and returns its result.
+    Concurrent calls with the same key share a single run (single-flight). When every
+    waiting client has disconnected, cancel_event is set so func can stop early, and
+    ClientDisconnected is raised to the caller.
+    """
+    flight = _flights.get(key)
+    if flight is None or flight.cancel_event.is_set():
+        cancel_event = threading.Event()
+        future = asyncio.get_running_loop().run_in_executor(_executor, func, *args, cancel_event)
+        flight = _Flight(future, cancel_event)
+        _flights[key] = flight
+
+        def finished(done_future):
+            if _flights.get(key) is flight:
+                del _flights[key]
+            if not done_future.cancelled():
+                done_future.exception()  # Mark as retrieved; abandoned jobs may end with ScanCancelled
+        future.add_done_callback(finished)
+
+    flight.waiters += 1
+    try:
+        while True:
+            done, _ = await asyncio.wait({flight.future}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return flight.future.result()
+            if request is not None and _client_gone(request):
+                raise ClientDisconnected()
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.future.done():
+            # Nobody wants the result anymore; let the job stop and don't hand it to new callers
+            flight.cancel_event.set()
+            if _flights.get(key) is flight:
+                del _flights[key]
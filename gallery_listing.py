@@ -0,0 +1,162 @@
+import os
+import time
+import json
+import base64
+import threading
+from collections import OrderedDict
+from .gallery_catalog import scan_catalog
+from .folder_scanner import RACY_MTIME_NS
+from .gallery_stats import get_gallery_stats
+
+# Sort keys accepted by the paged /Gallery/images API
+SORT_KEYS = ("timestamp", "name", "size")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort_key, sort_value, name):
+    """Encodes the position after (sort_value, name) as an opaque URL-safe string."""
+    raw = json.dumps([sort_key, sort_value, name], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, sort_key):
+    """Decodes a cursor produced by encode_cursor; raises ValueError if it is invalid for sort_key."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, sort_value, name = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+    expected_type = str if sort_key == "name" else (int, float)
+    if cursor_sort != sort_key or not isinstance(sort_value, expected_type) or not isinstance(name, str):
+        raise ValueError("Cursor does not match the requested sort")
+    return sort_value, name
+
+
+def resolve_folder(full_base_path, base_path, folder_key):
+    """Maps a folder key ("output/sub/dir") to a path relative to full_base_path, rejecting traversal."""
+    folder_key = folder_key.replace("\\", "/").strip("/")
+    if folder_key == base_path:
+        return ""
+    if not folder_key.startswith(base_path + "/"):
+        raise ValueError(f"Unknown folder: {folder_key}")
+
+    relative_path = os.path.normpath(folder_key[len(base_path) + 1:])
+    full_path = os.path.normpath(os.path.join(full_base_path, relative_path))
+    if os.path.commonpath([full_path, os.path.normpath(full_base_path)]) != os.path.normpath(full_base_path):
+        raise ValueError(f"Folder outside of gallery root: {folder_key}")
+    return relative_path
+
+
+def resolve_file(full_base_path, subfolder, filename):
+    """Maps a /view style (subfolder, filename) pair to a full path inside full_base_path."""
+    if not filename or os.path.basename(filename) != filename:
+        raise ValueError(f"Invalid filename: {filename}")
+    root = os.path.normpath(full_base_path)
+    full_path = os.path.normpath(os.path.join(root, subfolder or "", filename))
+    if os.path.commonpath([full_path, root]) != root:
+        raise ValueError(f"File outside of gallery root: {subfolder}/{filename}")
+    return full_path
+
+
+class ListingCache:
+    """
+    Keeps the most recently viewed folder listings (as Catalogs, with their lazily computed orderings)
+    so paging does not rescan the folder. A listing is valid while the directory mtime is unchanged and
+    the monitor has not reported changes in the folder (in-place rewrites keep the directory mtime).
+    """
+
+    def __init__(self, max_folders=32):
+        self.max_folders = max_folders
+        self._listings = OrderedDict()  # (dir_path, root) -> (dir_mtime_ns, Catalog)
+        self._generation = 0  # Bumped by invalidate(), so a scan running meanwhile isn't kept
+        self._lock = threading.Lock()
+
+    def get(self, full_base_path, relative_path, root="output"):
+        """Returns the Catalog of a folder, rescanning only if its directory mtime changed or it was invalidated."""
+        dir_path = os.path.normpath(os.path.join(full_base_path, relative_path))
+        dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+        key = (dir_path, root)
+
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and cached[0] == dir_mtime_ns:
+                self._listings.move_to_end(key)
+                get_gallery_stats().count("listing_cache_hits")
+                return cached[1]
+            generation = self._generation
+
+        get_gallery_stats().count("listing_cache_misses")
+        relative_path = "" if relative_path in ("", ".") else relative_path
+        listing = scan_catalog(full_base_path, "", False, relative_path, root=root)
+        if time.time_ns() - dir_mtime_ns < RACY_MTIME_NS:
+            return listing  # A change later in the same mtime tick would go unnoticed
+        with self._lock:
+            if generation != self._generation:
+                return listing
+            self._listings[key] = (dir_mtime_ns, listing)
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.max_folders:
+                self._listings.popitem(last=False)
+        return listing
+
+    def invalidate(self, dir_path=None):
+        """Drops cached listings (all of them, or those of the directory dir_path)."""
+        with self._lock:
+            self._generation += 1
+            if dir_path is None:
+                self._listings.clear()
+            else:
+                dir_path = os.path.normpath(dir_path)
+                for key in [key for key in self._listings if key[0] == dir_path]:
+                    del self._listings[key]
+
+
+_listing_cache = None
+_listing_cache_lock = threading.Lock()
+
+
+def get_listing_cache():
+    """Returns the shared listing cache."""
+    global _listing_cache
+    if _listing_cache is None:
+        with _listing_cache_lock:
+            if _listing_cache is None:
+                _listing_cache = ListingCache()
+    return _listing_cache
+
+
+def paginate(listing, sort_key="timestamp", order="desc", name_filter="", prompt_filter="", cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of a folder listing (a Catalog) using keyset pagination over the precomputed ordering.
+    The result holds the page's files, the cursor for the next page (None on the last page)
+    and the total number of files when no filter is applied.
+    """
+    if sort_key not in SORT_KEYS:
+        raise ValueError(f"Invalid sort: {sort_key}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    name_filter = (name_filter or "").lower()
+    prompt_filter = (prompt_filter or "").lower()
+
+    rows = listing.ordering(sort_key)
+    if order == "asc":
+        start = listing.bisect(rows, sort_key, tuple(decode_cursor(cursor, sort_key)), right=True) if cursor else 0
+        candidates = rows[start:]
+    else:
+        end = listing.bisect(rows, sort_key, tuple(decode_cursor(cursor, sort_key))) if cursor else len(rows)
+        candidates = rows[end - 1::-1] if end else rows[:0]
+
+    page = listing.select(candidates, listing.match(name_filter, prompt_filter), limit + 1)
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(sort_key, *listing.sort_key(sort_key, page[-1]))
+
+    return {
+        "files": [listing.entry(row) for row in page],
+        "next_cursor": next_cursor,
+        "total": len(rows) if not (name_filter or prompt_filter) else None,
+    }
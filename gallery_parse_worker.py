@@ -0,0 +1,30 @@
+"""
+Entry point of the metadata parsing processes (see folder_scanner._get_parse_pool). The pool imports this
+file as a top-level module, so its workers never import the extension package, whose __init__ registers
+the server routes.
+"""
+import os
+import sys
+import types
+import importlib
+
+PACKAGE = "_gallery_parse_worker"
+_build_metadata = None
+
+
+def _load():
+    """Imports the parsing modules under a bare package whose __init__ is never run."""
+    global _build_metadata
+    if _build_metadata is None:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules[PACKAGE] = package
+        # Timings and counters are recorded by the parent around each call
+        importlib.import_module(PACKAGE + ".gallery_stats").get_gallery_stats().enabled = False
+        _build_metadata = importlib.import_module(PACKAGE + ".folder_scanner")._build_metadata
+    return _build_metadata
+
+
+def build_metadata(full_path):
+    """Returns (metadata, summary) of a file."""
+    return _load()(full_path)
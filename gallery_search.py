@@ -0,0 +1,102 @@
+import re
+import shlex
+from datetime import datetime, timedelta
+from .folder_scanner import listing_entry
+from .gallery_listing import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Field filters accepted in /Gallery/search queries, e.g. 'castle model:sdxl lora:"detail tweaker" seed:42'
+TEXT_FILTERS = {"model": "model", "lora": "loras", "sampler": "sampler", "positive": "positive", "negative": "negative", "name": "name"}
+SIZE_FILTER = re.compile(r"^(<=|>=|<|>|=)?(\d+)$")
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid date for {field}: {value} (expected YYYY-MM-DD)")
+
+
+def _to_ns(day):
+    return int(day.timestamp()) * 1_000_000_000
+
+
+def parse_query(query):
+    """
+    Splits a search query into index.search() keyword arguments. Bare words (or "quoted phrases")
+    match any text field; model:, lora:, sampler:, positive:, negative: and name: match one field;
+    seed:N, after:/before:/date:YYYY-MM-DD, resolution:WxH and width:/height: with <, <=, >, >=
+    are structured filters. Raises ValueError for malformed filters.
+    """
+    try:
+        tokens = shlex.split(query or "")
+    except ValueError as e:
+        raise ValueError(f"Invalid query: {e}")
+
+    terms, text_filters, size_filters = [], [], []
+    seed = None
+    start = end = None
+    for token in tokens:
+        field, sep, value = token.partition(":")
+        field = field.lower()
+        if not sep or not value:
+            terms.append(token)
+        elif field in TEXT_FILTERS:
+            text_filters.append((TEXT_FILTERS[field], value))
+        elif field == "seed":
+            try:
+                seed = int(value)
+            except ValueError:
+                raise ValueError(f"Invalid seed: {value}")
+        elif field == "after":
+            start = _to_ns(_parse_date(value, field))
+        elif field == "before":
+            end = _to_ns(_parse_date(value, field))
+        elif field == "date":
+            day = _parse_date(value, field)
+            start, end = _to_ns(day), _to_ns(day + timedelta(days=1))
+        elif field == "resolution":
+            width, _, height = value.lower().partition("x")
+            if not (width.isdigit() and height.isdigit()):
+                raise ValueError(f"Invalid resolution: {value} (expected WxH)")
+            size_filters += [("width", "=", int(width)), ("height", "=", int(height))]
+        elif field in ("width", "height"):
+            match = SIZE_FILTER.match(value)
+            if match is None:
+                raise ValueError(f"Invalid {field}: {value}")
+            size_filters.append((field, match.group(1) or "=", int(match.group(2))))
+        else:
+            terms.append(token)  # Not a filter, e.g. a prompt containing "a:b"
+
+    return {
+        "terms": terms,
+        "text_filters": text_filters,
+        "seed": seed,
+        "mtime_range": (start, end),
+        "size_filters": size_filters,
+    }
+
+
+def search_gallery(index, full_base_path, base_path, query, root=None, order="desc", cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of files below root (default full_base_path) matching query, newest first (order="desc") or oldest first.
+    Files are listing entries plus their "folder" key; the page carries next_cursor (None on the last page).
+    """
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Invalid order: {order}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    after = decode_cursor(cursor, "search") if cursor else None
+    rows = index.search(root or full_base_path, order=order, after=after, limit=limit + 1, **parse_query(query))
+
+    files = []
+    for path, _ in rows[:limit]:
+        file_info = listing_entry(path, full_base_path, base_path)
+        if file_info is None:
+            index.remove(path)  # Deleted since it was indexed
+            continue
+        files.append(file_info)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last_path, last_mtime_ns = rows[limit - 1]
+        next_cursor = encode_cursor("search", last_mtime_ns, last_path)
+    return {"files": files, "next_cursor": next_cursor}
@@ -0,0 +1,242 @@
+import os
+import time
+import bisect
+import threading
+
+STATS_ENABLED = os.environ.get("COMFYUI_GALLERY_STATS", "1") != "0"
+# Upper bounds (seconds) of the stage duration histogram buckets, roughly x2.5 apart
+HISTOGRAM_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Counters and what they count, also used as the Prometheus HELP text
+COUNTERS = {
+    "scans": "Directory tree scans started",
+    "scans_cancelled": "Scans cancelled before they finished",
+    "directories_scanned": "Directories listed by scans",
+    "files_scanned": "Files returned by scans",
+    "metadata_cache_hits": "Metadata served from the persistent index",
+    "metadata_cache_misses": "Metadata extracted from the file",
+    "metadata_errors": "Files whose metadata could not be extracted",
+    "metadata_parse_fallbacks": "Files parsed in-process because a parse worker timed out or failed",
+    "thumbnail_cache_hits": "Thumbnails served from the cache",
+    "thumbnail_cache_misses": "Thumbnails that had to be generated",
+    "listing_cache_hits": "Folder listings served from the listing cache",
+    "listing_cache_misses": "Folder listings that had to be scanned",
+    "watchdog_events": "Relevant file system events received from watchdog",
+    "watchdog_events_ignored": "File system events ignored (temporary files, other extensions)",
+    "rescans": "Debounced change passes applied by the monitor",
+    "directory_rescans": "Directory subtrees rescanned by the monitor",
+    "reconcile_sweeps": "Safety-net full sweeps run by the monitor",
+    "polls": "Polling passes over folders on network mounts",
+    "poll_verified_directories": "Folders with unchanged mtime re-listed by polling to compare listings",
+    "changes_sent": "File changes sent to clients",
+    "outputs_ingested": "Files reported by ComfyUI execution events",
+    "outputs_prefilled": "Reported PNGs indexed from the running prompt without parsing the file",
+    "background_indexed": "Files indexed by the background indexer",
+    "background_pauses": "Times the background indexer paused for a busy prompt queue",
+    "bytes_sent": "Response body bytes sent by the gallery routes",
+    "snapshot_hits": "Listings served from a cached serialized snapshot",
+    "snapshot_misses": "Listings that had to be scanned and serialized",
+    "snapshot_not_modified": "Listing requests answered with 304 Not Modified",
+    "folder_tree_scans": "Folder trees built by walking the disk because no monitor watched them",
+    "bulk_exported": "Files written to zip exports",
+    "bulk_deleted": "Files deleted by bulk operations",
+    "bulk_moved": "Files moved by bulk operations",
+}
+
+# Stages timed by the histograms
+STAGES = {
+    "scan": "Full scan of a tree or folder",
+    "walk_directory": "Listing one directory",
+    "process_file": "Building one listing entry (stat, index lookup or extraction)",
+    "extract_metadata": "Extracting metadata and summary of one file",
+    "png_read": "Reading PNG header and text chunks",
+    "pil_open": "Opening a non-PNG image with PIL",
+    "media_probe": "Reading video and animation container headers",
+    "json_parse": "Parsing embedded prompt and workflow JSON",
+    "summarize": "Walking the prompt graph for the listing summary",
+    "index_flush": "Committing pending metadata index writes",
+    "apply_changes": "Applying watchdog changes to the monitor state",
+    "reconcile": "Monitor safety-net sweep",
+    "poll": "Polling pass over a folder on a network mount",
+    "sanitize": "Sanitizing response data for JSON",
+    "serialize": "Serializing responses to JSON",
+}
+
+
+class _Histogram:
+    """Stage duration histogram: per-bucket counts (not cumulative), count, sum and max."""
+
+    __slots__ = ("buckets", "count", "sum", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q quantile (None if empty or beyond the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class _Timer:
+    """Context manager adding the duration of its block to a stage histogram."""
+
+    __slots__ = ("stats", "stage", "start")
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    """Shared do-nothing timer handed out while stats are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class GalleryStats:
+    """
+    Process-wide counters and per-stage duration histograms. Cheap enough for per-file use;
+    when disabled every method returns immediately and timer() hands out a shared no-op.
+    Work done in scan worker processes (COMFYUI_GALLERY_SCAN_PROCESSES) is only counted as a whole.
+    """
+
+    def __init__(self, enabled=STATS_ENABLED):
+        self.enabled = enabled
+        self.started = time.time()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        """Adds amount to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, stage, seconds):
+        """Records one duration of a stage."""
+        if not self.enabled:
+            return
+        slot = bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.buckets[slot] += 1
+            histogram.count += 1
+            histogram.sum += seconds
+            if seconds > histogram.max:
+                histogram.max = seconds
+
+    def timer(self, stage):
+        """Returns a context manager timing its block as one observation of stage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def reset(self):
+        """Zeroes every counter and histogram."""
+        with self._lock:
+            self._counters = dict.fromkeys(COUNTERS, 0)
+            self._histograms = {}
+            self.started = time.time()
+
+    def _copy(self):
+        with self._lock:
+            histograms = {}
+            for stage, histogram in self._histograms.items():
+                copy = histograms[stage] = _Histogram()
+                copy.buckets = list(histogram.buckets)
+                copy.count, copy.sum, copy.max = histogram.count, histogram.sum, histogram.max
+            return dict(self._counters), histograms
+
+    def snapshot(self):
+        """Returns the counters and stage histograms (cumulative buckets keyed by upper bound) as a dict."""
+        counters, histograms = self._copy()
+        stages = {}
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), histogram.buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            stages[stage] = {
+                "description": STAGES.get(stage, ""),
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "mean": histogram.sum / histogram.count,
+                "max": histogram.max,
+                "p50": histogram.quantile(0.5),
+                "p95": histogram.quantile(0.95),
+                "buckets": buckets,
+            }
+        return {
+            "enabled": self.enabled,
+            "uptime_seconds": time.time() - self.started,
+            "counters": counters,
+            "stages": stages,
+        }
+
+    def prometheus(self):
+        """Returns the counters and histograms in the Prometheus text exposition format."""
+        counters, histograms = self._copy()
+        lines = []
+        for name, value in sorted(counters.items()):
+            metric = f"comfyui_gallery_{name}_total"
+            lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+
+        metric = "comfyui_gallery_stage_seconds"
+        lines.append(f"# HELP {metric} Time spent per gallery stage")
+        lines.append(f"# TYPE {metric} histogram")
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), histogram.buckets):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_gallery_stats():
+    """Returns the shared stats collector."""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = GalleryStats()
+    return _stats
@@ -0,0 +1,480 @@
+import os
+import io
+import json
+import struct
+import shutil
+import subprocess
+import time
+from .png_reader import read_png_info, PNG_SIGNATURE
+
+PROBE_TIME_BUDGET = 0.5  # Seconds a header probe may spend on one file
+POSTER_TIME_BUDGET = 5.0  # Seconds ffmpeg may spend extracting one poster frame
+MAX_TAG_SIZE = 16 * 1024 * 1024
+READ_BUFFER_SIZE = 64 * 1024
+
+
+class ProbeTimeout(Exception):
+    """Raised when a probe runs out of its time budget; whatever was found so far is kept."""
+
+
+def _check_deadline(deadline):
+    if time.perf_counter() > deadline:
+        raise ProbeTimeout()
+
+
+# --- ISO base media (mp4 / mov) ---
+
+MP4_TAG_NAMES = {b"\xa9cmt": "comment", b"\xa9nam": "title", b"\xa9des": "description", b"desc": "description"}
+
+
+def _iter_boxes(f, start, end):
+    """Yields (type, data_start, data_end) for each box between start and end, reading only headers."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos  # Box extends to the end of its parent
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _read_box(f, start, end, limit=MAX_TAG_SIZE):
+    f.seek(start)
+    return f.read(min(end - start, limit))
+
+
+def _parse_mp4_meta(f, start, end, tags):
+    """Reads ilst items (both classic FourCC items and ffmpeg's mdta keys) into tags."""
+    # ISO meta is a full box (4 bytes version/flags), QuickTime meta is not
+    f.seek(start)
+    if f.read(8)[4:8] != b"hdlr":
+        start += 4
+
+    keys = []
+    for box_type, data_start, data_end in _iter_boxes(f, start, end):
+        if box_type == b"keys":
+            data = _read_box(f, data_start, data_end)
+            count = struct.unpack(">I", data[4:8])[0]
+            offset = 8
+            for _ in range(count):
+                if offset + 8 > len(data):
+                    break
+                key_size = struct.unpack(">I", data[offset:offset + 4])[0]
+                keys.append(data[offset + 8:offset + key_size].decode("utf-8", "replace"))
+                offset += max(key_size, 8)
+        elif box_type == b"ilst":
+            for item_type, item_start, item_end in _iter_boxes(f, data_start, data_end):
+                if item_type in MP4_TAG_NAMES:
+                    name = MP4_TAG_NAMES[item_type]
+                else:
+                    index = struct.unpack(">I", item_type)[0]
+                    if not 1 <= index <= len(keys):
+                        continue
+                    name = keys[index - 1]
+                for value_type, value_start, value_end in _iter_boxes(f, item_start, item_end):
+                    if value_type == b"data":
+                        # 4 bytes type indicator + 4 bytes locale precede the value
+                        tags[name] = _read_box(f, value_start + 8, value_end).decode("utf-8", "replace")
+                        break
+
+
+def _parse_mp4_udta(f, start, end, tags):
+    for box_type, data_start, data_end in _iter_boxes(f, start, end):
+        if box_type == b"meta":
+            _parse_mp4_meta(f, data_start, data_end, tags)
+        elif box_type in MP4_TAG_NAMES:
+            # QuickTime user data text: 2 bytes length, 2 bytes language, text
+            data = _read_box(f, data_start, data_end)
+            length = struct.unpack(">H", data[:2])[0] if len(data) >= 4 else 0
+            tags[MP4_TAG_NAMES[box_type]] = data[4:4 + length].decode("utf-8", "replace")
+
+
+def _parse_mp4_trak(f, start, end):
+    """Returns a dict with handler, width, height, timescale, duration and sample count of a track."""
+    track = {}
+    for box_type, data_start, data_end in _iter_boxes(f, start, end):
+        if box_type == b"tkhd":
+            data = _read_box(f, data_start, data_end)
+            # Width and height are the last two 16.16 fixed point fields
+            width, height = struct.unpack(">II", data[-8:])
+            track["width"], track["height"] = width >> 16, height >> 16
+        elif box_type == b"mdia":
+            for mdia_type, mdia_start, mdia_end in _iter_boxes(f, data_start, data_end):
+                if mdia_type == b"hdlr":
+                    track["handler"] = _read_box(f, mdia_start, mdia_end)[8:12]
+                elif mdia_type == b"mdhd":
+                    data = _read_box(f, mdia_start, mdia_end)
+                    if data[0] == 1:
+                        track["timescale"], track["duration"] = struct.unpack(">IQ", data[20:32])
+                    else:
+                        track["timescale"], track["duration"] = struct.unpack(">II", data[12:20])
+                elif mdia_type == b"minf":
+                    for minf_type, minf_start, minf_end in _iter_boxes(f, mdia_start, mdia_end):
+                        if minf_type != b"stbl":
+                            continue
+                        for stbl_type, stbl_start, stbl_end in _iter_boxes(f, minf_start, minf_end):
+                            if stbl_type == b"stsz":
+                                track["samples"] = struct.unpack(">I", _read_box(f, stbl_start, stbl_end)[8:12])[0]
+    return track
+
+
+def _probe_mp4(f, file_size, deadline):
+    info, tags = {}, {}
+    for box_type, data_start, data_end in _iter_boxes(f, 0, file_size):
+        _check_deadline(deadline)
+        if box_type != b"moov":
+            continue  # mdat and friends are skipped with a single seek
+
+        for moov_type, moov_start, moov_end in _iter_boxes(f, data_start, data_end):
+            _check_deadline(deadline)
+            if moov_type == b"mvhd":
+                data = _read_box(f, moov_start, moov_end)
+                if data[0] == 1:
+                    timescale, duration = struct.unpack(">IQ", data[20:32])
+                else:
+                    timescale, duration = struct.unpack(">II", data[12:20])
+                if timescale:
+                    info["duration"] = duration / timescale
+            elif moov_type == b"trak":
+                track = _parse_mp4_trak(f, moov_start, moov_end)
+                if track.get("handler") == b"vide" and "width" not in info:
+                    info["width"], info["height"] = track.get("width"), track.get("height")
+                    if "samples" in track:
+                        info["frame_count"] = track["samples"]
+                        if track.get("duration") and track.get("timescale"):
+                            info["fps"] = round(track["samples"] * track["timescale"] / track["duration"], 3)
+            elif moov_type == b"udta":
+                _parse_mp4_udta(f, moov_start, moov_end, tags)
+            elif moov_type == b"meta":
+                _parse_mp4_meta(f, moov_start, moov_end, tags)
+        break
+    return info, tags
+
+
+# --- Matroska / WebM ---
+
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_SEEKHEAD, MKV_SEEK, MKV_SEEK_ID, MKV_SEEK_POSITION = 0x114D9B74, 0x4DBB, 0x53AB, 0x53AC
+MKV_INFO, MKV_TIMECODE_SCALE, MKV_DURATION = 0x1549A966, 0x2AD7B1, 0x4489
+MKV_TRACKS, MKV_TRACK_ENTRY, MKV_TRACK_TYPE, MKV_DEFAULT_DURATION = 0x1654AE6B, 0xAE, 0x83, 0x23E383
+MKV_VIDEO, MKV_PIXEL_WIDTH, MKV_PIXEL_HEIGHT = 0xE0, 0xB0, 0xBA
+MKV_TAGS, MKV_TAG, MKV_SIMPLE_TAG, MKV_TAG_NAME, MKV_TAG_STRING = 0x1254C367, 0x7373, 0x67C8, 0x45A3, 0x4487
+MKV_CLUSTER = 0x1F43B675
+
+
+def _read_vint(f, keep_marker):
+    """Reads an EBML variable length integer; returns (value, unknown_size)."""
+    first = f.read(1)
+    if not first:
+        raise EOFError()
+    byte = first[0]
+    length, mask = 1, 0x80
+    while length <= 8 and not byte & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML vint")
+    value = byte if keep_marker else byte & (mask - 1)
+    for b in f.read(length - 1):
+        value = (value << 8) | b
+    return value, not keep_marker and value == (1 << (7 * length)) - 1
+
+
+def _iter_elements(f, start, end):
+    """Yields (id, data_start, size) for each EBML element between start and end."""
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        try:
+            element_id, _ = _read_vint(f, True)
+            size, unknown = _read_vint(f, False)
+        except EOFError:
+            return
+        data_start = f.tell()
+        yield element_id, data_start, (end - data_start if unknown else size)
+        if unknown:
+            return
+        pos = data_start + size
+
+
+def _read_uint(f, start, size):
+    f.seek(start)
+    return int.from_bytes(f.read(size), "big")
+
+
+def _read_float(f, start, size):
+    f.seek(start)
+    data = f.read(size)
+    return struct.unpack(">f" if size == 4 else ">d", data)[0]
+
+
+def _probe_matroska(f, file_size, deadline):
+    info, tags = {}, {}
+    elements = _iter_elements(f, 0, file_size)
+    first = next(elements, None)
+    if first is None or first[0] != EBML_HEADER:
+        raise ValueError("Not a Matroska file")
+    segment = next(elements, None)
+    if segment is None or segment[0] != MKV_SEGMENT:
+        return info, tags
+    segment_start = segment[1]
+    segment_end = min(segment_start + segment[2], file_size)
+
+    timecode_scale = 1000000
+    raw_duration = None
+    seeks = {}
+    seen = set()
+
+    def parse(element_id, data_start, size):
+        nonlocal timecode_scale, raw_duration
+        data_end = data_start + size
+        seen.add(element_id)
+        if element_id == MKV_SEEKHEAD:
+            for seek_id, seek_start, seek_size in _iter_elements(f, data_start, data_end):
+                if seek_id != MKV_SEEK:
+                    continue
+                target, position = None, None
+                for child_id, child_start, child_size in _iter_elements(f, seek_start, seek_start + seek_size):
+                    if child_id == MKV_SEEK_ID:
+                        target = _read_uint(f, child_start, child_size)
+                    elif child_id == MKV_SEEK_POSITION:
+                        position = _read_uint(f, child_start, child_size)
+                if target is not None and position is not None:
+                    seeks.setdefault(target, segment_start + position)
+        elif element_id == MKV_INFO:
+            for child_id, child_start, child_size in _iter_elements(f, data_start, data_end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    timecode_scale = _read_uint(f, child_start, child_size)
+                elif child_id == MKV_DURATION:
+                    raw_duration = _read_float(f, child_start, child_size)
+        elif element_id == MKV_TRACKS:
+            for entry_id, entry_start, entry_size in _iter_elements(f, data_start, data_end):
+                if entry_id != MKV_TRACK_ENTRY or "width" in info:
+                    continue
+                track = {}
+                for child_id, child_start, child_size in _iter_elements(f, entry_start, entry_start + entry_size):
+                    if child_id == MKV_TRACK_TYPE:
+                        track["type"] = _read_uint(f, child_start, child_size)
+                    elif child_id == MKV_DEFAULT_DURATION:
+                        track["frame_ns"] = _read_uint(f, child_start, child_size)
+                    elif child_id == MKV_VIDEO:
+                        for video_id, video_start, video_size in _iter_elements(f, child_start, child_start + child_size):
+                            if video_id == MKV_PIXEL_WIDTH:
+                                track["width"] = _read_uint(f, video_start, video_size)
+                            elif video_id == MKV_PIXEL_HEIGHT:
+                                track["height"] = _read_uint(f, video_start, video_size)
+                if track.get("type") == 1:  # Video track
+                    info["width"], info["height"] = track.get("width"), track.get("height")
+                    if track.get("frame_ns"):
+                        info["fps"] = round(1e9 / track["frame_ns"], 3)
+        elif element_id == MKV_TAGS:
+            for tag_id, tag_start, tag_size in _iter_elements(f, data_start, data_end):
+                if tag_id != MKV_TAG:
+                    continue
+                for simple_id, simple_start, simple_size in _iter_elements(f, tag_start, tag_start + tag_size):
+                    if simple_id != MKV_SIMPLE_TAG:
+                        continue
+                    name = value = None
+                    for child_id, child_start, child_size in _iter_elements(f, simple_start, simple_start + simple_size):
+                        if child_id in (MKV_TAG_NAME, MKV_TAG_STRING) and child_size <= MAX_TAG_SIZE:
+                            f.seek(child_start)
+                            text = f.read(child_size).decode("utf-8", "replace").rstrip("\0")
+                            if child_id == MKV_TAG_NAME:
+                                name = text.lower()
+                            else:
+                                value = text
+                    if name and value is not None:
+                        tags[name] = value
+
+    for element_id, data_start, size in _iter_elements(f, segment_start, segment_end):
+        _check_deadline(deadline)
+        if element_id == MKV_CLUSTER:
+            break  # Media data starts here; anything else is reached through the SeekHead
+        parse(element_id, data_start, size)
+
+    # Tags (and sometimes Info) are written after the clusters; follow the SeekHead to them
+    for element_id in (MKV_INFO, MKV_TRACKS, MKV_TAGS):
+        if element_id in seen or element_id not in seeks:
+            continue
+        _check_deadline(deadline)
+        target = next(_iter_elements(f, seeks[element_id], segment_end), None)
+        if target is not None and target[0] == element_id:
+            parse(*target)
+
+    if raw_duration is not None:
+        info["duration"] = raw_duration * timecode_scale / 1e9
+    return info, tags
+
+
+# --- GIF / APNG ---
+
+def _skip_gif_sub_blocks(f):
+    while True:
+        size = f.read(1)
+        if not size or size[0] == 0:
+            return
+        f.seek(size[0], 1)
+
+
+def _probe_gif(f, deadline):
+    header = f.read(13)
+    if len(header) < 13 or header[:3] != b"GIF":
+        raise ValueError("Not a GIF file")
+    width, height, packed = struct.unpack("<HHB", header[6:11])
+    info = {"width": width, "height": height}
+    if packed & 0x80:
+        f.seek(3 * (2 << (packed & 0x07)), 1)  # Global color table
+
+    frames, duration_cs = 0, 0
+    while True:
+        block = f.read(1)
+        if not block or block == b";":
+            break
+        if block == b"!":
+            label = f.read(1)
+            if label == b"\xf9":  # Graphic control extension holds the frame delay
+                data = f.read(1 + 4)
+                if len(data) == 5:
+                    duration_cs += struct.unpack("<H", data[2:4])[0]
+            _skip_gif_sub_blocks(f)
+        elif block == b",":
+            descriptor = f.read(9)
+            if len(descriptor) < 9:
+                break
+            if descriptor[8] & 0x80:
+                f.seek(3 * (2 << (descriptor[8] & 0x07)), 1)  # Local color table
+            f.seek(1, 1)  # LZW minimum code size
+            _skip_gif_sub_blocks(f)
+            frames += 1
+            if frames % 64 == 0:
+                _check_deadline(deadline)
+        else:
+            break
+
+    info["frame_count"] = frames
+    info["duration"] = duration_cs / 100
+    return info, {}
+
+
+def _probe_apng(path, f, deadline):
+    width, height, tags = read_png_info(path)
+    info = {"width": width, "height": height}
+    f.seek(8)
+    duration = 0.0
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IEND":
+            break
+        if chunk_type == b"acTL":
+            info["frame_count"] = struct.unpack(">I", f.read(8)[:4])[0]
+            f.seek(length - 8 + 4, 1)
+        elif chunk_type == b"fcTL":
+            data = f.read(length)
+            delay_num, delay_den = struct.unpack(">HH", data[20:24])
+            duration += delay_num / (delay_den or 100)
+            f.seek(4, 1)
+            _check_deadline(deadline)
+        else:
+            f.seek(length + 4, 1)
+    if "frame_count" in info:
+        info["duration"] = round(duration, 3)
+    return info, tags
+
+
+# --- Public API ---
+
+def _expand_comment(tags):
+    """Video writers (e.g. VideoHelperSuite through ffmpeg) store prompt/workflow as JSON in a comment tag."""
+    comment = tags.get("comment")
+    if not comment or ("prompt" in tags and "workflow" in tags):
+        return
+    try:
+        parsed = json.loads(comment)
+    except ValueError:
+        return
+    if isinstance(parsed, dict) and ("prompt" in parsed or "workflow" in parsed):
+        for key in ("prompt", "workflow"):
+            if key in parsed and key not in tags:
+                value = parsed[key]
+                tags[key] = value if isinstance(value, str) else json.dumps(value)
+        del tags["comment"]  # Fully represented by the expanded keys
+
+
+def probe_media(path, time_budget=PROBE_TIME_BUDGET):
+    """
+    Reads container headers of a video or animation without decoding any frames.
+    Returns (info, tags): info may hold width, height, duration (seconds), frame_count and fps;
+    tags holds text metadata such as an embedded ComfyUI prompt/workflow.
+    If the time budget runs out, whatever was found so far is returned. Containers without a parser
+    (e.g. AVI) give empty info and tags, so their metadata is still indexed instead of re-probed every scan.
+    """
+    deadline = time.perf_counter() + time_budget
+    info, tags = {}, {}
+    with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        magic = f.read(8)
+        f.seek(0)
+        try:
+            if magic[:3] == b"GIF":
+                info, tags = _probe_gif(f, deadline)
+            elif magic == PNG_SIGNATURE:
+                info, tags = _probe_apng(path, f, deadline)
+            elif magic[:4] == b"\x1a\x45\xdf\xa3":
+                info, tags = _probe_matroska(f, file_size, deadline)
+            elif magic[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+                info, tags = _probe_mp4(f, file_size, deadline)
+        except ProbeTimeout:
+            print(f"Gallery: Media probe ran out of time for {path}, metadata is partial")
+        except (struct.error, EOFError, IndexError) as e:
+            print(f"Gallery: Truncated or malformed media header in {path}: {e}")
+    _expand_comment(tags)
+    return {k: v for k, v in info.items() if v is not None}, tags
+
+
+def find_ffmpeg():
+    """Returns an ffmpeg executable (system or imageio-ffmpeg's bundled one), or None."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def extract_poster_frame(path, max_size, time_budget=POSTER_TIME_BUDGET):
+    """Returns the first video frame scaled to fit max_size as a file-like PNG, or None if unavailable."""
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        return None
+    command = [
+        ffmpeg, "-v", "error", "-nostdin",
+        "-i", path,
+        "-frames:v", "1",
+        "-vf", f"scale={max_size}:{max_size}:force_original_aspect_ratio=decrease",
+        "-f", "image2pipe", "-vcodec", "png", "-",
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=time_budget, check=True)
+    except subprocess.TimeoutExpired:
+        print(f"Gallery: Poster frame extraction timed out for {path}")
+        return None
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Gallery: Poster frame extraction failed for {path}: {e}")
+        return None
+    return io.BytesIO(result.stdout) if result.stdout else None
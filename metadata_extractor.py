@@ -7,6 +7,9 @@ from PIL.ExifTags import TAGS, GPSTAGS, IFD
 from PIL.PngImagePlugin import PngImageFile
 from PIL.JpegImagePlugin import JpegImageFile
 import folder_paths
+from .png_reader import read_png_info
+from .media_probe import probe_media
+from .gallery_stats import get_gallery_stats
 
 CONFIG_INDENT = 4  # Assuming a default indent value if CONFIG is not available
 
@@ -20,59 +23,92 @@ def get_size(file_path):
         return f"{file_size_bytes / (1024 * 1024):.2f} MB"
 
 
+def _buildFileinfo(image_path, width, height):
+    return {
+        "filename": Path(image_path).as_posix(),
+        "resolution": f"{width}x{height}" if width and height else None,
+        "date": str(datetime.fromtimestamp(os.path.getmtime(image_path))),
+        "size": str(get_size(image_path)),
+    }
+
+
+def _parsePngInfo(metadataFromImg, metadata):
+    """Fills metadata from PNG text chunks and returns the parsed ComfyUI prompt (or {})."""
+    with get_gallery_stats().timer("json_parse"):
+        return _parseTextChunks(metadataFromImg, metadata)
+
+
+def _parseTextChunks(metadataFromImg, metadata):
+    prompt = {}
+
+    # for all metadataFromImg convert to string (but not for workflow and prompt!)
+    for k, v in metadataFromImg.items():
+        # from ComfyUI
+        if k == "workflow":
+            if isinstance(v, str): # Check if v is a string before attempting json.loads
+                try:
+                    metadata["workflow"] = json.loads(v)
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Error parsing metadataFromImg 'workflow' as JSON, keeping as string: {e}")
+                    metadata["workflow"] = v # Keep as string if parsing fails
+            else:
+                metadata["workflow"] = v # If not a string, keep as is (might already be parsed)
+
+        # from ComfyUI
+        elif k == "prompt":
+            if isinstance(v, str): # Check if v is a string before attempting json.loads
+                try:
+                    metadata["prompt"] = json.loads(v)
+                    prompt = metadata["prompt"] # extract prompt to use on metadata
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Error parsing metadataFromImg 'prompt' as JSON, keeping as string: {e}")
+                    metadata["prompt"] = v # Keep as string if parsing fails
+            else:
+                metadata["prompt"] = v # If not a string, keep as is (might already be parsed)
+
+        else:
+            if isinstance(v, str): # Check if v is a string before attempting json.loads
+                try:
+                    metadata[str(k)] = json.loads(v)
+                except json.JSONDecodeError as e:
+                    print(f"Debug: Error parsing {k} as JSON, trying as string: {e}")
+                    metadata[str(k)] = v # Keep as string if parsing fails
+            else:
+                metadata[str(k)] = v # If not a string, keep as is
+
+    return prompt
+
+
 def buildMetadata(image_path):
+    """
+    Returns (img, prompt, metadata) for an image file.
+    PNGs are read with the header-only chunk reader and img is None for them;
+    other formats (and malformed PNGs) are opened with PIL.
+    """
     if not Path(image_path).is_file():
         raise FileNotFoundError(f"File not found: {image_path}")
 
-    img = Image.open(image_path)
+    if image_path.lower().endswith(".png"):
+        try:
+            with get_gallery_stats().timer("png_read"):
+                width, height, text_chunks = read_png_info(image_path)
+        except ValueError:
+            pass  # Not a well-formed PNG, let PIL try
+        else:
+            metadata = {"fileinfo": _buildFileinfo(image_path, width, height)}
+            prompt = _parsePngInfo(text_chunks, metadata)
+            return None, prompt, metadata
+
+    with get_gallery_stats().timer("pil_open"):
+        img = Image.open(image_path)
     metadata = {}
     prompt = {}
 
-    metadata["fileinfo"] = {
-        "filename": Path(image_path).as_posix(),
-        "resolution": f"{img.width}x{img.height}",
-        "date": str(datetime.fromtimestamp(os.path.getmtime(image_path))),
-        "size": str(get_size(image_path)),
-    }
+    metadata["fileinfo"] = _buildFileinfo(image_path, img.width, img.height)
 
     # only for png files
     if isinstance(img, PngImageFile):
-        metadataFromImg = img.info
-
-        # for all metadataFromImg convert to string (but not for workflow and prompt!)
-        for k, v in metadataFromImg.items():
-            # from ComfyUI
-            if k == "workflow":
-                if isinstance(v, str): # Check if v is a string before attempting json.loads
-                    try:
-                        metadata["workflow"] = json.loads(v)
-                    except json.JSONDecodeError as e:
-                        print(f"Warning: Error parsing metadataFromImg 'workflow' as JSON, keeping as string: {e}")
-                        metadata["workflow"] = v # Keep as string if parsing fails
-                else:
-                    metadata["workflow"] = v # If not a string, keep as is (might already be parsed)
-
-            # from ComfyUI
-            elif k == "prompt":
-                if isinstance(v, str): # Check if v is a string before attempting json.loads
-                    try:
-                        metadata["prompt"] = json.loads(v)
-                        prompt = metadata["prompt"] # extract prompt to use on metadata
-                    except json.JSONDecodeError as e:
-                        print(f"Warning: Error parsing metadataFromImg 'prompt' as JSON, keeping as string: {e}")
-                        metadata["prompt"] = v # Keep as string if parsing fails
-                else:
-                    metadata["prompt"] = v # If not a string, keep as is (might already be parsed)
-
-            else:
-                if isinstance(v, str): # Check if v is a string before attempting json.loads
-                    try:
-                        metadata[str(k)] = json.loads(v)
-                    except json.JSONDecodeError as e:
-                        print(f"Debug: Error parsing {k} as JSON, trying as string: {e}")
-                        metadata[str(k)] = v # Keep as string if parsing fails
-                else:
-                    metadata[str(k)] = v # If not a string, keep as is
+        prompt = _parsePngInfo(img.info, metadata)
 
     if isinstance(img, JpegImageFile):
         exif = img.getexif()
@@ -113,6 +149,287 @@ def buildMetadata(image_path):
     return img, prompt, metadata
 
 
+def buildExecutionMetadata(image_path, prompt, extra_pnginfo):
+    """
+    Returns the metadata of a PNG that ComfyUI just saved, from the prompt and extra_pnginfo it was saved
+    with instead of parsing them back out of the file. Matches what buildMetadata would read:
+    SaveImage writes "prompt" and then every extra_pnginfo key (e.g. "workflow") as text chunks.
+    Raises ValueError unless the file's text chunks are exactly those (other save nodes may embed
+    nothing, or something else), so the caller extracts it from the file instead.
+    """
+    width, height, text_chunks = read_png_info(image_path)
+    expected = {"prompt": prompt, **{str(key): value for key, value in (extra_pnginfo or {}).items()}}
+    if text_chunks.keys() != expected.keys():
+        raise ValueError(f"Text chunks of {image_path} don't match the running prompt")
+    for key, value in expected.items():
+        # Serializing is cheaper than parsing, and SaveImage wrote json.dumps() of the same objects
+        if text_chunks[key] != json.dumps(value):
+            raise ValueError(f"Text chunk {key} of {image_path} doesn't match the running prompt")
+    metadata = {"fileinfo": _buildFileinfo(image_path, width, height)}
+    metadata.update(expected)
+    return metadata
+
+
+def buildMediaMetadata(media_path):
+    """
+    Returns (prompt, metadata) for a video or animation, read from container headers only.
+    Duration, frame count and fps go to metadata["media"]; an embedded prompt/workflow is parsed like PNG text.
+    """
+    if not Path(media_path).is_file():
+        raise FileNotFoundError(f"File not found: {media_path}")
+
+    with get_gallery_stats().timer("media_probe"):
+        info, tags = probe_media(media_path)
+    metadata = {"fileinfo": _buildFileinfo(media_path, info.get("width"), info.get("height"))}
+    media = {k: info[k] for k in ("duration", "frame_count", "fps") if k in info}
+    if media:
+        metadata["media"] = media
+    prompt = _parsePngInfo(tags, metadata)
+    return prompt, metadata
+
+
+# Prompt graph node types and input names the summarizer knows about
+SAMPLER_CLASSES = ("KSampler", "KSamplerAdvanced", "SamplerCustom", "SamplerCustomAdvanced")
+SAMPLER_PARTS = ("guider", "sampler", "sigmas", "noise")  # Inputs of SamplerCustom(Advanced) holding its settings
+MODEL_NAME_INPUTS = ("ckpt_name", "unet_name", "gguf_name")
+TEXT_INPUTS = ("text", "text_g", "text_l", "prompt", "positive_prompt", "wildcard_text", "populated_text")
+VALUE_INPUTS = ("value", "string", "int", "float", "number")  # Literals of primitive/helper nodes
+EMPTY_CONDITIONING_CLASSES = ("ConditioningZeroOut",)  # Outputs conditioning without any prompt text (Flux negative)
+# Followed through their generic conditioning inputs when looking for a negative prompt
+CONDITIONING_PASSTHROUGH_CLASSES = (
+    "ConditioningCombine", "ConditioningConcat", "ConditioningAverage", "ConditioningSetArea",
+    "ConditioningSetAreaPercentage", "ConditioningSetAreaStrength", "ConditioningSetMask",
+    "ConditioningSetTimestepRange", "FluxGuidance",
+)
+MAX_WALK = 1024  # Nodes visited per traversal, guards against malformed graphs
+
+
+def _is_link(value):
+    """ComfyUI encodes an input wired to another node as [node_id, output_slot]."""
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], (str, int)) and isinstance(value[1], int)
+
+
+def _node(prompt, link):
+    node = prompt.get(str(link[0])) if _is_link(link) else None
+    return node if isinstance(node, dict) and isinstance(node.get("inputs", {}), dict) else None
+
+
+def _inputs(node):
+    return node.get("inputs") or {}
+
+
+def _node_order(node_id):
+    return (0, int(node_id), "") if node_id.isdigit() else (1, 0, node_id)
+
+
+def _resolve_value(prompt, value, keys):
+    """Follows links until a node provides a literal for one of keys (e.g. a seed from a seed node)."""
+    for _ in range(MAX_WALK):
+        if not _is_link(value):
+            return value
+        node = _node(prompt, value)
+        if node is None:
+            return None
+        inputs = _inputs(node)
+        value = next((inputs[key] for key in keys + VALUE_INPUTS if key in inputs), None)
+    return None
+
+
+def _upstream(prompt, node_id):
+    """Returns the ids of every node the given node depends on."""
+    seen = set()
+    stack = [node_id]
+    while stack and len(seen) < MAX_WALK:
+        node = prompt.get(stack.pop())
+        if not isinstance(node, dict):
+            continue
+        for value in _inputs(node).values():
+            if _is_link(value) and str(value[0]) not in seen:
+                seen.add(str(value[0]))
+                stack.append(str(value[0]))
+    return seen
+
+
+def _primary_sampler(prompt):
+    """
+    Returns the id of the sampler that generated the image: one no other sampler feeds into
+    (the first pass of a hires-fix or refiner chain), lowest node id first. None without samplers.
+    """
+    samplers = [node_id for node_id, node in prompt.items() if node.get("class_type") in SAMPLER_CLASSES]
+    if not samplers:
+        return None
+    upstream = {node_id: _upstream(prompt, node_id) for node_id in samplers}
+    roots = [node_id for node_id in samplers if not any(other in upstream[node_id] for other in samplers if other != node_id)]
+    return min(roots or samplers, key=_node_order)
+
+
+def _first_value(prompt, nodes, keys, kind):
+    """Returns the first literal of type kind found for keys on nodes (following links)."""
+    for node in nodes:
+        inputs = _inputs(node)
+        for key in keys:
+            if key in inputs:
+                value = _resolve_value(prompt, inputs[key], keys)
+                if isinstance(value, kind) and not isinstance(value, bool):
+                    return value
+    return None
+
+
+def _first_link(nodes, keys):
+    for node in nodes:
+        inputs = _inputs(node)
+        for key in keys:
+            if _is_link(inputs.get(key)):
+                return inputs[key]
+    return None
+
+
+def _conditioning_texts(prompt, link, polarity):
+    """
+    Collects the prompt texts of the text encoders a conditioning link leads to, passing through
+    combine, area, ControlNet and guidance nodes (the input of the same polarity is preferred).
+    Zero-out nodes end the walk; for the negative polarity only CONDITIONING_PASSTHROUGH_CLASSES are
+    followed through generic conditioning inputs, which could otherwise lead back to the positive prompt.
+    """
+    texts = []
+    seen = set()
+    stack = [link]
+    while stack and len(seen) < MAX_WALK:
+        link = stack.pop()
+        node_id = str(link[0])
+        node = _node(prompt, link)
+        if node is None or node_id in seen:
+            continue
+        seen.add(node_id)
+        if node.get("class_type") in EMPTY_CONDITIONING_CLASSES:
+            continue
+        inputs = _inputs(node)
+
+        encoder_keys = [key for key in TEXT_INPUTS if key in inputs]
+        if encoder_keys:
+            for key in encoder_keys:
+                text = _resolve_value(prompt, inputs[key], TEXT_INPUTS)
+                if isinstance(text, str) and text.strip() and text not in texts:
+                    texts.append(text)
+            continue
+
+        if _is_link(inputs.get(polarity)):
+            upstream = [inputs[polarity]]
+        elif polarity == "positive" or node.get("class_type") in CONDITIONING_PASSTHROUGH_CLASSES:
+            upstream = [value for key, value in inputs.items() if "conditioning" in key and _is_link(value)]
+        else:
+            upstream = []
+        stack.extend(reversed(upstream))  # Keeps conditioning_1 before conditioning_2
+    return texts
+
+
+def _node_loras(node):
+    """Returns [{"name", "strength"}] for the LoRAs a loader node applies."""
+    inputs = _inputs(node)
+    loras = []
+    if isinstance(inputs.get("lora_name"), str):
+        strength = inputs.get("strength_model", inputs.get("strength"))
+        loras.append({"name": inputs["lora_name"], "strength": strength if isinstance(strength, (int, float)) else None})
+    for key, value in inputs.items():
+        # rgthree Power Lora Loader: lora_1 = {"on": true, "lora": "name.safetensors", "strength": 1.0}
+        if key.startswith("lora_") and isinstance(value, dict) and value.get("on") and isinstance(value.get("lora"), str):
+            strength = value.get("strength")
+            loras.append({"name": value["lora"], "strength": strength if isinstance(strength, (int, float)) else None})
+    return loras
+
+
+def _model_chain(prompt, link):
+    """Walks a model link upstream; returns (checkpoint name, LoRAs in the order they are applied)."""
+    applied = []
+    seen = set()
+    while _is_link(link) and len(seen) < MAX_WALK:
+        node = _node(prompt, link)
+        if node is None or str(link[0]) in seen:
+            break
+        seen.add(str(link[0]))
+        inputs = _inputs(node)
+        name = next((inputs[key] for key in MODEL_NAME_INPUTS if isinstance(inputs.get(key), str)), None)
+        if name is not None:
+            return name, applied
+        applied[:0] = _node_loras(node)
+        link = inputs.get("model")
+        if not _is_link(link):
+            link = next((value for key, value in inputs.items() if "model" in key and _is_link(value)), None)
+    return None, applied
+
+
+def summarizePrompt(prompt):
+    """
+    Walks an API-format prompt graph ({node_id: {"class_type", "inputs"}}) once and returns the generation
+    settings of its primary sampler: model, loras, sampler, scheduler, steps, cfg, seed, denoise,
+    positive and negative. Node ids are never assumed; everything is found by class_type and links.
+    """
+    prompt = {str(node_id): node for node_id, node in prompt.items() if isinstance(node, dict)}
+    summary = {}
+    sampler_id = _primary_sampler(prompt)
+    if sampler_id is None:
+        # No sampler (e.g. an upscale-only workflow): report whatever loaders are present
+        loras = []
+        for node_id in sorted(prompt, key=_node_order):
+            inputs = _inputs(prompt[node_id])
+            if "model" not in summary:
+                name = next((inputs[key] for key in MODEL_NAME_INPUTS if isinstance(inputs.get(key), str)), None)
+                if name is not None:
+                    summary["model"] = name
+            loras.extend(_node_loras(prompt[node_id]))
+        if loras:
+            summary["loras"] = loras
+        return summary
+
+    # SamplerCustomAdvanced keeps its settings on the guider, sampler, sigmas and noise nodes
+    sampler = prompt[sampler_id]
+    nodes = [sampler] + [node for node in (_node(prompt, _inputs(sampler).get(part)) for part in SAMPLER_PARTS) if node]
+
+    fields = (
+        ("sampler", ("sampler_name",), str),
+        ("scheduler", ("scheduler",), str),
+        ("steps", ("steps",), int),
+        ("cfg", ("cfg",), (int, float)),
+        ("seed", ("seed", "noise_seed"), int),
+        ("denoise", ("denoise",), (int, float)),
+    )
+    for field, keys, kind in fields:
+        value = _first_value(prompt, nodes, keys, kind)
+        if value is not None:
+            summary[field] = value
+
+    model, loras = _model_chain(prompt, _first_link(nodes, ("model",)))
+    if model is not None:
+        summary["model"] = model
+    if loras:
+        summary["loras"] = loras
+
+    for polarity, keys in (("positive", ("positive", "conditioning")), ("negative", ("negative",))):
+        link = _first_link(nodes, keys)
+        texts = _conditioning_texts(prompt, link, polarity) if link is not None else []
+        if texts:
+            summary[polarity] = "\n".join(texts)
+    return summary
+
+
+def buildSummary(metadata):
+    """
+    Extracts the fields shown in the gallery listing and info panel from full metadata:
+    resolution, media fields and the summarizePrompt() record. Fields that cannot be found are left out.
+    """
+    summary = {}
+    resolution = metadata.get("fileinfo", {}).get("resolution")
+    if resolution:
+        summary["resolution"] = resolution
+    summary.update(metadata.get("media", {}))
+
+    prompt = metadata.get("prompt")
+    if isinstance(prompt, dict):
+        with get_gallery_stats().timer("summarize"):
+            summary.update(summarizePrompt(prompt))
+    return summary
+
+
 def buildPreviewText(metadata):
     text = f"File: {metadata['fileinfo']['filename']}\n"
     text += f"Resolution: {metadata['fileinfo']['resolution']}\n"
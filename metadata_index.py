@@ -0,0 +1,445 @@
+import os
+import json
+import sqlite3
+import threading
+from .gallery_stats import get_gallery_stats
+
+# Persistent metadata index, stored next to the extension so it survives restarts
+INDEX_PATH = os.environ.get(
+    "COMFYUI_GALLERY_INDEX",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "gallery_index.db")
+)
+SCHEMA_VERSION = 7  # Bumped when the layout or the summary format changes
+FLUSH_THRESHOLD = 256  # Pending writes buffered before a batch commit
+SEARCH_TEXT_FIELDS = ("name", "positive", "negative", "model", "loras", "sampler")  # Full-text columns
+
+
+def normalize_path(path):
+    """Returns the canonical key used for a file in the index (case-folded on Windows, so only for lookups)."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def stat_signature(stat_result):
+    """Returns the (mtime_ns, size) pair that decides whether cached metadata is still valid."""
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def _search_fields(path, summary):
+    """
+    Returns the searchable columns of a file derived from its listing summary:
+    {"model", "sampler", "seed", "width", "height"} for filters plus the SEARCH_TEXT_FIELDS texts.
+    """
+    fields = {"name": os.path.basename(path)}
+    for key in ("model", "sampler", "positive", "negative"):
+        value = summary.get(key)
+        fields[key] = value if isinstance(value, str) else None
+
+    loras = summary.get("loras") or []
+    names = [lora.get("name") if isinstance(lora, dict) else lora for lora in loras]
+    fields["loras"] = "\n".join(name for name in names if isinstance(name, str)) or None
+
+    seed = summary.get("seed")
+    fields["seed"] = seed if isinstance(seed, int) and not isinstance(seed, bool) and abs(seed) < 2 ** 63 else None
+
+    width = height = None
+    resolution = summary.get("resolution")
+    if isinstance(resolution, str) and "x" in resolution:
+        w, _, h = resolution.partition("x")
+        if w.strip().isdigit() and h.strip().isdigit():
+            width, height = int(w), int(h)
+    fields["width"], fields["height"] = width, height
+    return fields
+
+
+def _has_token(text):
+    return any(ch.isalnum() for ch in text)
+
+
+def _fts_phrase(text):
+    """Quotes text as an FTS5 prefix phrase, so user input can't inject query syntax."""
+    return '"' + text.replace('"', '""') + '"*'
+
+
+def _like_pattern(text):
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class MetadataIndex:
+    """
+    SQLite-backed cache of extracted metadata keyed by path + mtime + size, with
+    structured columns and an FTS5 table (when available) for /Gallery/search.
+    """
+
+    def __init__(self, db_path=INDEX_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}  # path key -> (mtime_ns, size, metadata_json, summary_json, search_fields, file_path) waiting for a batch commit
+        self.has_fts = False
+        self._init_db()
+
+    def _connect(self):
+        """Returns the connection for the calling thread (sqlite connections are not shared)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Cache only - an outdated layout is simply dropped and refilled on demand
+            conn.execute("DROP TABLE IF EXISTS files_fts")
+            conn.execute("DROP TABLE IF EXISTS files")
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                metadata TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                model TEXT,
+                sampler TEXT,
+                seed INTEGER,
+                width INTEGER,
+                height INTEGER,
+                content_hash TEXT,
+                phash INTEGER
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime_ns)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_seed ON files (seed)")
+        conn.execute("CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash)")
+        # Folders waiting for the background indexer, so its work resumes after a restart
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS index_queue (
+                path TEXT PRIMARY KEY,
+                root TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                recursive INTEGER NOT NULL
+            )"""
+        )
+        try:
+            # rowid follows files.rowid; search falls back to LIKE scans if FTS5 isn't compiled in
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5({', '.join(SEARCH_TEXT_FIELDS)}, prefix='2 3')"
+            )
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            print(f"Gallery: SQLite FTS5 unavailable, search uses slower substring matching: {e}")
+        conn.commit()
+
+    def lookup(self, path, mtime_ns, size, field="metadata"):
+        """
+        Returns the cached "metadata" or "summary" of a file if the stored stat signature
+        matches, otherwise None. Only the requested column is read and decoded.
+        """
+        column = {"metadata": 2, "summary": 3}[field]
+        key = normalize_path(path)
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            row = pending[:2] + (pending[column],)
+        else:
+            row = self._connect().execute(
+                f"SELECT mtime_ns, size, {field} FROM files WHERE path = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] != mtime_ns or row[1] != size:
+            return None
+        try:
+            return json.loads(row[2])
+        except ValueError:
+            return None
+
+    def store(self, path, mtime_ns, size, metadata, summary):
+        """Queues metadata and its listing summary for a file; rows are committed in batches."""
+        row = (mtime_ns, size, json.dumps(metadata, default=str), json.dumps(summary, default=str), _search_fields(path, summary), os.path.abspath(path))
+        with self._lock:
+            self._pending[normalize_path(path)] = row
+            should_flush = len(self._pending) >= FLUSH_THRESHOLD
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Commits all pending rows in a single transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            conn = self._connect()
+            with get_gallery_stats().timer("index_flush"), conn:
+                # Upsert keeps the rowid stable, which the FTS rows are keyed by
+                conn.executemany(
+                    """INSERT INTO files (path, file_path, mtime_ns, size, metadata, summary, model, sampler, seed, width, height)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (path) DO UPDATE SET file_path = excluded.file_path, mtime_ns = excluded.mtime_ns, size = excluded.size,
+                        metadata = excluded.metadata, summary = excluded.summary, model = excluded.model,
+                        sampler = excluded.sampler, seed = excluded.seed, width = excluded.width, height = excluded.height,
+                        content_hash = CASE WHEN files.mtime_ns = excluded.mtime_ns AND files.size = excluded.size THEN files.content_hash END,
+                        phash = CASE WHEN files.mtime_ns = excluded.mtime_ns AND files.size = excluded.size THEN files.phash END""",
+                    [
+                        (path, file_path, mtime_ns, size, metadata, summary, fields["model"], fields["sampler"], fields["seed"], fields["width"], fields["height"])
+                        for path, (mtime_ns, size, metadata, summary, fields, file_path) in pending.items()
+                    ]
+                )
+                if self.has_fts:
+                    fts_rows = []
+                    for path, row in pending.items():
+                        rowid = conn.execute("SELECT rowid FROM files WHERE path = ?", (path,)).fetchone()[0]
+                        fts_rows.append((rowid, *(row[4][field] for field in SEARCH_TEXT_FIELDS)))
+                    conn.executemany("DELETE FROM files_fts WHERE rowid = ?", [(row[0],) for row in fts_rows])
+                    conn.executemany(
+                        f"INSERT INTO files_fts (rowid, {', '.join(SEARCH_TEXT_FIELDS)}) VALUES (?{', ?' * len(SEARCH_TEXT_FIELDS)})",
+                        fts_rows
+                    )
+
+    def remove(self, path):
+        """Drops a single file from the index."""
+        self.remove_paths([path])
+
+    def remove_paths(self, paths):
+        """Drops many files from the index in one transaction."""
+        keys = [normalize_path(path) for path in paths]
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._pending.pop(key, None)
+            conn = self._connect()
+            with conn:
+                self._delete_paths(conn, [(key,) for key in keys])
+
+    def move_paths(self, pairs):
+        """
+        Re-keys the entries of moved files, [(old path, new path)], in one transaction. A move keeps
+        mtime and size, so the stored metadata and hashes stay valid; the full-text row follows the rowid.
+        """
+        if not pairs:
+            return
+        self.flush()
+        keys = [(normalize_path(old), normalize_path(new), os.path.abspath(new)) for old, new in pairs]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._delete_paths(conn, [(new,) for _, new, _ in keys])  # Stale rows of files once at the target
+                conn.executemany("UPDATE files SET path = ?, file_path = ? WHERE path = ?", [(new, file_path, old) for old, new, file_path in keys])
+
+    def _delete_paths(self, conn, keys):
+        """Deletes [(path,), ...] rows and their full-text rows (caller holds the lock and a transaction)."""
+        if self.has_fts:
+            conn.executemany("DELETE FROM files_fts WHERE rowid = (SELECT rowid FROM files WHERE path = ?)", keys)
+        conn.executemany("DELETE FROM files WHERE path = ?", keys)
+
+    def _prefix_range(self, root):
+        """Returns the [low, high) key range covering every path below root."""
+        prefix = normalize_path(root).rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def clear(self, root=None):
+        """Removes every entry (or only those below root). Used for a cold rebuild."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                if root is None:
+                    self._pending = {}
+                    if self.has_fts:
+                        conn.execute("DELETE FROM files_fts")
+                    conn.execute("DELETE FROM files")
+                else:
+                    low, high = self._prefix_range(root)
+                    self._pending = {k: v for k, v in self._pending.items() if not low <= k < high}
+                    if self.has_fts:
+                        conn.execute(
+                            "DELETE FROM files_fts WHERE rowid IN (SELECT rowid FROM files WHERE path >= ? AND path < ?)",
+                            (low, high)
+                        )
+                    conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+
+    def verify(self, root=None):
+        """
+        Checks every indexed file below root against the filesystem.
+        Entries whose file is gone or whose stat signature changed are purged.
+        Returns a dict with counts of checked, missing and stale entries.
+        """
+        self.flush()
+        conn = self._connect()
+        if root is None:
+            rows = conn.execute("SELECT path, mtime_ns, size FROM files").fetchall()
+        else:
+            low, high = self._prefix_range(root)
+            rows = conn.execute(
+                "SELECT path, mtime_ns, size FROM files WHERE path >= ? AND path < ?", (low, high)
+            ).fetchall()
+
+        missing, stale = [], []
+        for path, mtime_ns, size in rows:
+            try:
+                st = os.stat(path)
+            except OSError:
+                missing.append((path,))
+                continue
+            if stat_signature(st) != (mtime_ns, size):
+                stale.append((path,))
+
+        if missing or stale:
+            with self._lock:
+                with conn:
+                    self._delete_paths(conn, missing + stale)
+        return {"checked": len(rows), "missing": len(missing), "stale": len(stale)}
+
+    def search(self, root, terms=(), text_filters=(), seed=None, mtime_range=(None, None), size_filters=(), order="desc", after=None, limit=100):
+        """
+        Returns up to limit (path, mtime_ns) rows below root, ordered by mtime_ns then path key.
+        terms match any full-text column (prefix match), text_filters are (field, text) pairs for a single
+        SEARCH_TEXT_FIELDS column, size_filters are (column, operator, value) with column width or height.
+        after is the (mtime_ns, path) of the previous page's last row.
+        """
+        self.flush()
+        low, high = self._prefix_range(root)
+        where = ["f.path >= ?", "f.path < ?"]
+        params = [low, high]
+
+        if self.has_fts:
+            clauses = [_fts_phrase(term) for term in terms if _has_token(term)]
+            clauses += [f"{field} : {_fts_phrase(text)}" for field, text in text_filters if _has_token(text)]
+            if clauses:
+                where.append("f.rowid IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?)")
+                params.append(" AND ".join(clauses))
+        else:
+            for term in terms:
+                where.append("(f.summary LIKE ? ESCAPE '\\' OR f.path LIKE ? ESCAPE '\\')")
+                params += [_like_pattern(term)] * 2
+            for field, text in text_filters:
+                column = {"name": "path", "model": "model", "sampler": "sampler"}.get(field, "summary")
+                where.append(f"f.{column} LIKE ? ESCAPE '\\'")
+                params.append(_like_pattern(text))
+
+        if seed is not None:
+            where.append("f.seed = ?")
+            params.append(seed)
+        if mtime_range[0] is not None:
+            where.append("f.mtime_ns >= ?")
+            params.append(mtime_range[0])
+        if mtime_range[1] is not None:
+            where.append("f.mtime_ns < ?")
+            params.append(mtime_range[1])
+        for column, operator, value in size_filters:
+            if column not in ("width", "height") or operator not in ("=", "<", "<=", ">", ">="):
+                raise ValueError(f"Invalid size filter: {column}{operator}{value}")
+            where.append(f"f.{column} {operator} ?")
+            params.append(value)
+
+        direction = "DESC" if order == "desc" else "ASC"
+        if after is not None:
+            where.append(f"(f.mtime_ns, f.path) {'<' if order == 'desc' else '>'} (?, ?)")
+            params += [after[0], normalize_path(after[1])]
+        params.append(limit)
+        return self._connect().execute(
+            f"SELECT f.file_path, f.mtime_ns FROM files f WHERE {' AND '.join(where)} "
+            f"ORDER BY f.mtime_ns {direction}, f.path {direction} LIMIT ?",
+            params
+        ).fetchall()
+
+    def unhashed(self, root, algorithm, after="", limit=64):
+        """
+        Returns up to limit (path, mtime_ns, size) rows below root, in path order after the given path,
+        that have no content hash from the given algorithm yet.
+        """
+        self.flush()
+        low, high = self._prefix_range(root)
+        return self._connect().execute(
+            """SELECT file_path, mtime_ns, size FROM files
+            WHERE path >= ? AND path < ? AND path > ? AND (content_hash IS NULL OR content_hash NOT LIKE ?)
+            ORDER BY path LIMIT ?""",
+            (low, high, normalize_path(after) if after else "", algorithm + ":%", limit)
+        ).fetchall()
+
+    def store_hashes(self, rows):
+        """
+        Stores [(path, mtime_ns, size, content_hash, phash), ...]; a row is only updated if the file
+        still has the stat signature it was hashed with.
+        """
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "UPDATE files SET content_hash = ?, phash = ? WHERE path = ? AND mtime_ns = ? AND size = ?",
+                    [(content_hash, phash, normalize_path(path), mtime_ns, size) for path, mtime_ns, size, content_hash, phash in rows]
+                )
+
+    def duplicate_hashes(self, root, limit=None):
+        """Returns (content_hash, path, size) rows below root whose content hash occurs more than once, grouped by hash."""
+        self.flush()
+        low, high = self._prefix_range(root)
+        return self._connect().execute(
+            """SELECT content_hash, file_path, size FROM files WHERE path >= ? AND path < ? AND content_hash IN (
+                SELECT content_hash FROM files WHERE path >= ? AND path < ? AND content_hash IS NOT NULL
+                GROUP BY content_hash HAVING COUNT(*) > 1 ORDER BY MAX(size) DESC LIMIT ?
+            ) ORDER BY size DESC, content_hash, path""",
+            (low, high, low, high, -1 if limit is None else limit)
+        ).fetchall()
+
+    def perceptual_hashes(self, root):
+        """Returns (path, phash) rows below root that have a perceptual hash (signed 64-bit integers)."""
+        self.flush()
+        low, high = self._prefix_range(root)
+        return self._connect().execute(
+            "SELECT file_path, phash FROM files WHERE path >= ? AND path < ? AND phash IS NOT NULL ORDER BY path", (low, high)
+        ).fetchall()
+
+    def signatures(self, directory):
+        """Returns {path key: (mtime_ns, size)} of the indexed files directly inside directory."""
+        self.flush()
+        low, high = self._prefix_range(directory)
+        rows = self._connect().execute(
+            "SELECT path, mtime_ns, size FROM files WHERE path >= ? AND path < ?", (low, high)
+        ).fetchall()
+        return {path: (mtime_ns, size) for path, mtime_ns, size in rows if os.sep not in path[len(low):]}
+
+    def queue_folders(self, tasks):
+        """Persists [(path, root, priority, recursive)] background indexing tasks, keeping the better priority of a folder queued twice."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    """INSERT INTO index_queue (path, root, priority, recursive) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (path) DO UPDATE SET priority = MIN(priority, excluded.priority),
+                        recursive = MAX(recursive, excluded.recursive)""",
+                    [(path, root, priority, int(recursive)) for path, root, priority, recursive in tasks]
+                )
+
+    def dequeue_folder(self, path):
+        """Drops a finished background indexing task."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM index_queue WHERE path = ?", (path,))
+
+    def queued_folders(self):
+        """Returns the persisted background indexing tasks as [(path, root, priority, recursive)]."""
+        rows = self._connect().execute("SELECT path, root, priority, recursive FROM index_queue").fetchall()
+        return [(path, root, priority, bool(recursive)) for path, root, priority, recursive in rows]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_metadata_index():
+    """Returns the shared index, or None if the database could not be opened."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = MetadataIndex()
+                except sqlite3.Error as e:
+                    print(f"Gallery: Metadata index unavailable, falling back to full extraction: {e}")
+                    _index = False
+    return _index or None
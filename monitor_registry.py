@@ -0,0 +1,237 @@
+import os
+import itertools
+import threading
+import folder_paths
+from watchdog.observers import Observer
+from .folder_monitor import FileSystemMonitor, monitor_mode
+
+MONITOR_LINGER = float(os.environ.get("COMFYUI_GALLERY_MONITOR_LINGER", "60"))  # Seconds an unused monitor keeps running
+
+
+def gallery_roots():
+    """Returns {root: directory} for the ComfyUI directories the gallery can show (the /view types)."""
+    return {
+        # Resolved as before roots existed, so configured relative paths keep pointing at the same place
+        "output": os.path.join(folder_paths.get_output_directory(), "..", "output"),
+        "input": folder_paths.get_input_directory(),
+        "temp": folder_paths.get_temp_directory(),
+    }
+
+
+def resolve_root(root, relative_path="./"):
+    """
+    Returns the absolute path of relative_path below a gallery root. Raises ValueError for unknown roots
+    and for paths leading outside the root.
+    """
+    roots = gallery_roots()
+    if root not in roots:
+        raise ValueError(f"Unknown root: {root}")
+    root_dir = os.path.normpath(roots[root])
+    path = os.path.normpath(os.path.join(root_dir, relative_path))
+    if os.path.commonpath([path, root_dir]) != root_dir:
+        raise ValueError(f"Path outside of gallery root: {relative_path}")
+    return path
+
+
+def _contains(directory, path):
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+class MonitorRegistry:
+    """
+    Keeps one FileSystemMonitor per watched directory, shared by every client subscribed to it, with all
+    watches on a single watchdog observer. Each client holds at most one subscription per root. A monitor
+    keeps running for `linger` seconds after its last client left, so a reloaded tab reuses it (and its
+    snapshot) instead of starting over.
+    """
+
+    def __init__(self, linger=MONITOR_LINGER):
+        self.linger = linger
+        self._observer = None
+        self._monitors = {}  # (root, path) -> FileSystemMonitor
+        self._subscribers = {}  # (root, path) -> {client_id, ...}; None stands for clients without an id
+        self._subscriptions = {}  # (client_id, root) -> path
+        self._timers = {}  # (root, path) -> Timer stopping the unused monitor
+        self._tokens = {}  # (root, path) -> number identifying this run of the monitor
+        self._next_token = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _get_observer(self):
+        """Returns the shared observer, starting it on first use (caller holds the lock)."""
+        if self._observer is None or not self._observer.is_alive():
+            self._observer = Observer()
+            self._observer.start()
+        return self._observer
+
+    def subscribe(self, client_id, root, path):
+        """
+        Subscribes client_id to the monitor of path below root, starting the monitor if none is running,
+        and moves the client's previous subscription for that root. Returns True if a running monitor was reused.
+        """
+        key = (root, path)
+        with self._lock:
+            previous = self._subscriptions.get((client_id, root))
+            if previous is not None and previous != path:
+                self._release((root, previous), client_id)
+            self._subscriptions[(client_id, root)] = path
+            self._subscribers.setdefault(key, set()).add(client_id)
+
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            monitor = self._monitors.get(key)
+            if monitor is not None and monitor.thread is not None and monitor.thread.is_alive():
+                return True
+            mode = monitor_mode(path)
+            observer = self._get_observer() if mode == "watchdog" else None  # Polled folders need no observer
+            monitor = self._monitors[key] = FileSystemMonitor(path, root=root, observer=observer, mode=mode)
+            self._tokens[key] = next(self._next_token)
+            monitor.start_monitoring()  # The initial snapshot runs on the monitor thread
+            return False
+
+    def unsubscribe(self, client_id, root=None):
+        """Drops client_id's subscription for root (or for every root)."""
+        with self._lock:
+            for client_root in [r for c, r in self._subscriptions if c == client_id and root in (None, r)]:
+                path = self._subscriptions.pop((client_id, client_root))
+                self._release((client_root, path), client_id)
+
+    def prune(self, active_client_ids):
+        """Drops the subscriptions of clients that are no longer connected (clients without an id are kept)."""
+        with self._lock:
+            for client_id, root in list(self._subscriptions):
+                if client_id is not None and client_id not in active_client_ids:
+                    path = self._subscriptions.pop((client_id, root))
+                    self._release((root, path), client_id)
+
+    def _release(self, key, client_id):
+        """Removes one subscriber and schedules the monitor's stop once it has none (caller holds the lock)."""
+        subscribers = self._subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(client_id)
+        if subscribers or key in self._timers:
+            return
+        del self._subscribers[key]
+        timer = self._timers[key] = threading.Timer(self.linger, self._expire, (key,))
+        timer.daemon = True
+        timer.start()
+
+    def _expire(self, key):
+        with self._lock:
+            if key in self._subscribers or self._timers.get(key) is None:
+                return  # Subscribed again in the meantime
+            del self._timers[key]
+            monitor = self._monitors.pop(key, None)
+            self._tokens.pop(key, None)
+        if monitor is not None:
+            print(f"FileSystemMonitor: No subscribers left for {key[1]}, stopping.")
+            monitor.stop_monitoring()
+
+    def watch_token(self, root, path):
+        """
+        Returns (token, monitor path) of a running monitor whose initial snapshot is done and whose tree
+        contains path, preferring the monitor of path itself, None if there is none. While the token stays
+        the same, every change below path reaches that monitor's change journal, so the journal's seq
+        tells whether path changed.
+        """
+        with self._lock:
+            keys = sorted(self._monitors, key=lambda key: key[1] != path)
+            for monitor_root, monitor_path in keys:
+                monitor = self._monitors[(monitor_root, monitor_path)]
+                if monitor_root != root or not _contains(monitor_path, path):
+                    continue
+                if monitor.thread is not None and monitor.thread.is_alive() and monitor.event_handler.ready.is_set():
+                    return self._tokens[(monitor_root, monitor_path)], monitor_path
+        return None
+
+    def folder_totals(self, root, path):
+        """
+        Returns {relative_dir below path: (totals, subdir names)} from a ready monitor of root whose tree
+        contains path, None if there is none. See GalleryEventHandler.folder_totals.
+        """
+        with self._lock:
+            monitors = [
+                (monitor_path, monitor) for (monitor_root, monitor_path), monitor in self._monitors.items()
+                if monitor_root == root and _contains(monitor_path, path) and monitor.thread is not None and monitor.thread.is_alive()
+            ]
+        for monitor_path, monitor in monitors:
+            subfolder = os.path.relpath(path, monitor_path)
+            folders = monitor.event_handler.folder_totals("" if subfolder == "." else subfolder)
+            if folders is not None:
+                return folders
+        return None
+
+    def _monitors_containing(self, root, paths):
+        """Returns [(monitor, paths inside its tree)] for the monitors of root (caller holds the lock)."""
+        matches = []
+        for (monitor_root, monitor_path), monitor in self._monitors.items():
+            if monitor_root == root:
+                inside = [path for path in paths if _contains(monitor_path, path)]
+                if inside:
+                    matches.append((monitor, inside))
+        return matches
+
+    def suppress(self, root, paths):
+        """Makes the monitors of root ignore watchdog events for paths the gallery is about to change itself."""
+        with self._lock:
+            matches = self._monitors_containing(root, paths)
+        for monitor, inside in matches:
+            monitor.event_handler.suppress(inside)
+
+    def apply_paths(self, root, paths):
+        """Applies files changed by a bulk operation to every monitor of root, one delta per monitor."""
+        with self._lock:
+            matches = self._monitors_containing(root, paths)
+        for monitor, inside in matches:
+            monitor.event_handler.apply_paths(inside)
+
+    def ingest(self, root, path):
+        """Applies a file ComfyUI just wrote to every monitor of root whose tree contains it. Returns how many there were."""
+        with self._lock:
+            monitors = [monitor for (monitor_root, monitor_path), monitor in self._monitors.items() if monitor_root == root and _contains(monitor_path, path)]
+        for monitor in monitors:
+            monitor.event_handler.ingest(path)
+        return len(monitors)
+
+    def status(self):
+        """Returns the running monitors with their subscriber counts."""
+        with self._lock:
+            return [
+                {
+                    "root": root,
+                    "path": path,
+                    "mode": monitor.mode,
+                    "subscribers": len(self._subscribers.get((root, path), ())),
+                    "stopping": (root, path) in self._timers,
+                }
+                for (root, path), monitor in self._monitors.items()
+            ]
+
+    def stop_all(self):
+        """Stops every monitor and the shared observer."""
+        with self._lock:
+            monitors = list(self._monitors.values())
+            for timer in self._timers.values():
+                timer.cancel()
+            self._monitors, self._subscribers, self._subscriptions, self._timers, self._tokens = {}, {}, {}, {}, {}
+            observer, self._observer = self._observer, None
+        for monitor in monitors:
+            monitor.stop_monitoring()
+        if observer is not None and observer.is_alive():
+            observer.stop()
+            observer.join(timeout=2.0)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_monitor_registry():
+    """Returns the shared monitor registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MonitorRegistry()
+    return _registry
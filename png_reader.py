@@ -0,0 +1,94 @@
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+TEXT_CHUNK_TYPES = (b"tEXt", b"zTXt", b"iTXt")
+MAX_TEXT_CHUNK_SIZE = 64 * 1024 * 1024  # Refuse absurd chunk lengths from corrupt files
+READ_BUFFER_SIZE = 64 * 1024
+
+
+def _decompress_text(data, keyword):
+    """Inflates a compressed text payload, refusing to grow it past MAX_TEXT_CHUNK_SIZE (zlib bombs)."""
+    decompressor = zlib.decompressobj()
+    text = decompressor.decompress(data, MAX_TEXT_CHUNK_SIZE)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Text chunk {keyword} inflates to more than {MAX_TEXT_CHUNK_SIZE} bytes")
+    return text
+
+
+def _decode_text_chunk(chunk_type, data):
+    """Decodes a tEXt/zTXt/iTXt payload into (keyword, text) the same way PIL fills img.info."""
+    keyword, _, rest = data.partition(b"\0")
+    keyword = keyword.decode("latin-1")
+
+    if chunk_type == b"tEXt":
+        return keyword, rest.decode("latin-1")
+
+    if chunk_type == b"zTXt":
+        # 1 byte compression method (always zlib) followed by the compressed text
+        return keyword, _decompress_text(rest[1:], keyword).decode("latin-1")
+
+    # iTXt: compression flag, compression method, language tag\0, translated keyword\0, UTF-8 text
+    if len(rest) < 2:
+        raise ValueError(f"Truncated iTXt chunk for {keyword}")
+    compressed = rest[0] == 1
+    _, _, rest = rest[2:].partition(b"\0")  # language tag
+    _, _, text = rest.partition(b"\0")  # translated keyword
+    if compressed:
+        text = _decompress_text(text, keyword)
+    return keyword, text.decode("utf-8")
+
+
+def read_png_size(path):
+    """Returns (width, height) from the IHDR chunk, which PNG requires to come first. Raises ValueError if it is missing."""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        raise ValueError(f"Not a PNG file: {path}")
+    return struct.unpack(">II", header[16:24])
+
+
+def read_png_info(path):
+    """
+    Reads only the PNG header chunks of a file: IHDR for the resolution and every
+    tEXt/zTXt/iTXt chunk before the first IDAT (where ComfyUI stores prompt/workflow).
+    Pixel data is never read. Returns (width, height, {keyword: text}).
+    Raises ValueError if the file is not a well-formed PNG.
+    """
+    width = height = None
+    text = {}
+    with open(path, "rb", buffering=READ_BUFFER_SIZE) as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError(f"Not a PNG file: {path}")
+
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, chunk_type = struct.unpack(">I4s", header)
+
+            if chunk_type in (b"IDAT", b"IEND"):
+                break
+            elif chunk_type == b"IHDR":
+                data = f.read(length)
+                if len(data) < 8:
+                    raise ValueError(f"Truncated IHDR chunk: {path}")
+                width, height = struct.unpack(">II", data[:8])
+            elif chunk_type in TEXT_CHUNK_TYPES:
+                if length > MAX_TEXT_CHUNK_SIZE:
+                    raise ValueError(f"Text chunk too large ({length} bytes): {path}")
+                data = f.read(length)
+                if len(data) < length:
+                    raise ValueError(f"Truncated {chunk_type.decode('ascii')} chunk: {path}")
+                try:
+                    keyword, value = _decode_text_chunk(chunk_type, data)
+                    text[keyword] = value
+                except (ValueError, zlib.error) as e:
+                    print(f"Warning: Skipping undecodable {chunk_type.decode('ascii')} chunk in {path}: {e}")
+            else:
+                f.seek(length, 1)
+            f.seek(4, 1)  # CRC
+
+    if width is None:
+        raise ValueError(f"Missing IHDR chunk: {path}")
+    return width, height, text
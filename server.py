@@ -1,21 +1,44 @@
 from server import PromptServer
 from aiohttp import web
 import os
-import folder_paths
 import time
 from datetime import datetime
 import json
 import math
+import asyncio
+import threading
+from email.utils import formatdate
+from urllib.parse import quote
 
-from .folder_monitor import FileSystemMonitor, scan_directory_initial
-from .folder_scanner import _scan_for_images
+from .monitor_registry import get_monitor_registry, resolve_root
+from .folder_scanner import iter_scan_records, ScanCancelled, rebuild_index, verify_index, extract_metadata, get_file_type
+from .gallery_catalog import Catalog, scan_catalog
+from .folder_tree import folder_tree
+from .bulk_operations import resolve_selection, write_zip, delete_files, move_files
+from .gallery_listing import get_listing_cache, paginate, resolve_folder, resolve_file, DEFAULT_PAGE_SIZE
+from .metadata_index import get_metadata_index
+from .gallery_search import search_gallery
+from .duplicates import find_duplicates, get_duplicate_hasher, HASH_ON_SCAN, DEFAULT_SIMILARITY
+from .thumbnail_cache import get_thumbnail_cache, DEFAULT_THUMBNAIL_SIZE
+from .change_journal import get_change_journal
+from .snapshot_cache import get_snapshot_cache, negotiate, MIN_COMPRESS_SIZE
+from .execution_ingest import install_output_ingest
+from .background_indexer import get_background_indexer, folder_priority, PRIORITY_VISIBLE
+from .gallery_executor import run_blocking, run_in_executor, run_export, run_stream, ClientDisconnected
+from .gallery_stats import get_gallery_stats
 
 # Add ComfyUI root to sys.path HERE
 import sys
 comfy_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(comfy_path)
 
-monitor = None # Initialize monitor to None - monitoring starts on request
+listing_cache = get_listing_cache() # Recently viewed folders with precomputed sort orderings, shared with the monitors
+install_output_ingest(PromptServer.instance)  # New outputs reach the gallery without waiting for watchdog
+get_background_indexer().resume()  # Folders left unindexed by the last run
+
+STREAM_BATCH = 64  # NDJSON records per write
+STREAM_FLUSH_INTERVAL = 0.05  # Seconds a partial batch may wait before it is written
+STREAM_QUEUE_SIZE = 8  # Batches buffered between the scanner and the response, keeps memory flat
 
 def sanitize_json_data(data):
     """Recursively sanitizes data to be JSON serializable."""
@@ -33,19 +56,81 @@ def sanitize_json_data(data):
         return str(data)
 
 
+def _serialize(data):
+    """Sanitizes and serializes data to a JSON string, timing both stages."""
+    stats = get_gallery_stats()
+    with stats.timer("sanitize"):
+        data = sanitize_json_data(data)
+    with stats.timer("serialize"):
+        return json.dumps(data)
+
+
+def _request_root(params):
+    """Returns (root, absolute path) for the root (output, input, temp) and relative_path request parameters."""
+    root = params.get("root") or "output"
+    return root, resolve_root(root, params.get("relative_path") or "./")
+
+
+def _json_response(json_string, **kwargs):
+    """Returns a JSON response for a serialized body, counting it towards bytes_sent."""
+    response = web.Response(text=json_string, content_type="application/json", **kwargs)
+    get_gallery_stats().count("bytes_sent", len(response.body))
+    return response
+
+
+def _snapshot_version(root, full_monitor_path):
+    """
+    Version a listing snapshot below full_monitor_path is valid for: (monitor token, its change journal's
+    seq), or None while no ready monitor watches the path (nothing would tell the snapshot went stale).
+    """
+    watch = get_monitor_registry().watch_token(root, full_monitor_path)
+    if watch is None:
+        return None
+    token, monitor_path = watch
+    return token, get_change_journal(root, monitor_path).seq
+
+
+def _snapshot_response(request, snapshot):
+    """Serves a snapshot: 304 when If-None-Match names it, else its body in the best coding the client accepts."""
+    encoding = negotiate(request.headers.get("Accept-Encoding")) if len(snapshot.body) >= MIN_COMPRESS_SIZE else None
+    headers = {"ETag": snapshot.etag(encoding), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if snapshot.matches(request.headers.get("If-None-Match")):
+        get_gallery_stats().count("snapshot_not_modified")
+        return web.Response(status=304, headers=headers)
+
+    body = snapshot.body
+    if encoding is not None:
+        body = snapshot.encoded(encoding)
+        headers["Content-Encoding"] = encoding
+    get_gallery_stats().count("bytes_sent", len(body))
+    return web.Response(body=body, content_type="application/json", charset="utf-8", headers=headers)
+
+
 @PromptServer.instance.routes.get("/Gallery/images")
 async def get_gallery_images(request):
-    """Endpoint to get gallery images, accepts relative_path."""
-    relative_path = request.rel_url.query.get("relative_path", "./")
-    full_monitor_path = os.path.normpath(os.path.join(folder_paths.get_output_directory(), "..", "output", relative_path))
+    """Endpoint to get gallery images, accepts root and relative_path."""
+    try:
+        root, full_monitor_path = _request_root(request.rel_url.query)
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+
+    if "folder" in request.rel_url.query:
+        return await get_gallery_page(request, root, full_monitor_path)
+
+    key = ("images", root, full_monitor_path)
+    version = _snapshot_version(root, full_monitor_path)
+    snapshot = get_snapshot_cache().get(key, version)
+    if snapshot is not None:
+        return _snapshot_response(request, snapshot)  # Also for stream requests, the client takes plain JSON too
+    if request.rel_url.query.get("stream") == "1" or "application/x-ndjson" in request.headers.get("Accept", ""):
+        return await stream_gallery_images(request, root, full_monitor_path, version)
 
     try:
-        folders_with_metadata, _ = _scan_for_images(
-            full_monitor_path, "output", True
-        )
-        sanitized_folders = sanitize_json_data(folders_with_metadata)
-        json_string = json.dumps({"folders": sanitized_folders})
-        return web.Response(text=json_string, content_type="application/json")
+        json_string = await run_blocking(request, key, _build_gallery_images, root, full_monitor_path)
+        snapshot = get_snapshot_cache().put(key, version, json_string.encode("utf-8"))
+        return _snapshot_response(request, snapshot)
+    except ClientDisconnected:
+        return web.Response(status=499, text="Client disconnected")
     except Exception as e:
         print(f"Error in /Gallery/images: {e}")
         import traceback
@@ -53,25 +138,578 @@ async def get_gallery_images(request):
         return web.Response(status=500, text=str(e))
 
 
+def _build_gallery_images(root, full_monitor_path, cancel_event):
+    """Scans the whole tree and serializes it (runs in the gallery executor)."""
+    # Taken before scanning: replaying changes made during the scan is harmless, missing them is not
+    journal = get_change_journal(root, full_monitor_path)
+    seq = journal.seq
+    catalog = scan_catalog(full_monitor_path, root, True, cancel_event=cancel_event)
+    if HASH_ON_SCAN:
+        get_duplicate_hasher().schedule(full_monitor_path)
+    return _serialize_catalog(catalog, seq, journal.path)
+
+
+def _serialize_catalog(catalog, seq, path):
+    """
+    Serializes a scanned Catalog as {"folders": {folder_key: {name: file_info}}, "seq": n, "path": scope}
+    one folder at a time, so listing entries only exist as dicts for the folder being written. seq and
+    path are those of the change journal of the listed folder, whose events carry the same path.
+    """
+    parts = [
+        f"{json.dumps(folder_key)}: {_serialize({catalog.names[row]: catalog.entry(row) for row in rows})}"
+        for folder_key, rows in catalog.iter_folders()
+    ]
+    return f'{{"folders": {{{", ".join(parts)}}}, "seq": {seq}, "path": {json.dumps(path)}}}'
+
+
+def _stream_gallery_records(root, full_monitor_path, emit, cancel_event, version=None):
+    """
+    Scans the tree and hands NDJSON lines to emit() in batches as files complete (runs in the gallery
+    executor): {"seq": n, "path": scope} first, then {"folder", "name", "file"} per file, then {"done": true, "files": n}.
+    With a version, the finished scan is kept as the snapshot later requests are served from.
+    """
+    journal = get_change_journal(root, full_monitor_path)
+    seq = journal.seq
+    batch = [json.dumps({"seq": seq, "path": journal.path})]
+    emit(batch)  # Headers and the first line go out before the scan starts
+    batch = []
+    last_flush = time.monotonic()
+    count = 0
+    catalog = Catalog(root, relative_path=journal.path)
+    try:
+        for relative_dir, record in iter_scan_records(full_monitor_path, cancel_event=cancel_event):
+            row = catalog.add(relative_dir, *record)
+            folder_key = catalog.folder_key(catalog.folder_ids[row])
+            batch.append(_serialize({"folder": folder_key, "name": catalog.names[row], "file": catalog.entry(row)}))
+            count += 1
+            if len(batch) >= STREAM_BATCH or count == 1 or time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                emit(batch)
+                batch = []
+                last_flush = time.monotonic()
+        batch.append(json.dumps({"done": True, "files": count}))
+        if HASH_ON_SCAN:
+            get_duplicate_hasher().schedule(full_monitor_path)
+    except ScanCancelled:
+        return
+    except Exception as e:
+        print(f"Error in /Gallery/images (stream): {e}")
+        batch.append(json.dumps({"error": str(e)}))
+        version = None
+    emit(batch)
+    if version is not None:
+        get_snapshot_cache().put(("images", root, full_monitor_path), version, _serialize_catalog(catalog, seq, journal.path).encode("utf-8"))
+
+
+async def stream_gallery_images(request, root, full_monitor_path, version=None):
+    """Streams the full tree as NDJSON records while it is being scanned, see _stream_gallery_records."""
+    def produce(emit, cancel_event):
+        _stream_gallery_records(
+            root, full_monitor_path, lambda lines: emit(("\n".join(lines) + "\n").encode("utf-8")), cancel_event, version
+        )
+
+    return await _stream_from_executor(
+        request, produce, {"Content-Type": "application/x-ndjson", "Cache-Control": "no-cache"}, run_stream
+    )
+
+
+async def _stream_from_executor(request, produce, headers, run_in=run_in_executor):
+    """
+    Runs produce(emit, cancel_event) in the gallery executor (or with run_in) and writes each bytes chunk it
+    passes to emit() to a StreamResponse. emit() blocks while the client is slow, so unsent chunks never pile
+    up in memory, and raises ScanCancelled once the client has gone away. If produce raises, the connection
+    is closed without ending the body, so the client sees a failed download rather than a truncated file.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    cancel_event = threading.Event()
+    stats = get_gallery_stats()
+
+    def emit(data):
+        if cancel_event.is_set():
+            raise ScanCancelled()
+        asyncio.run_coroutine_threadsafe(queue.put(data), loop).result()
+
+    def run(cancel_event):
+        end = None
+        try:
+            produce(emit, cancel_event)
+        except ScanCancelled:
+            pass
+        except Exception as e:
+            end = e
+        finally:
+            if not cancel_event.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(end), loop).result()
+
+    response = web.StreamResponse(headers=headers)
+    producer = asyncio.ensure_future(run_in(run, cancel_event))
+    try:
+        await response.prepare(request)
+        while True:
+            data = await queue.get()
+            if data is None:
+                break
+            if isinstance(data, Exception):
+                if request.transport is not None:
+                    request.transport.close()
+                return response
+            stats.count("bytes_sent", len(data))
+            await response.write(data)
+        await response.write_eof()
+    except ConnectionResetError:
+        pass  # Client went away, the scan is cancelled below
+    finally:
+        cancel_event.set()
+        while not queue.empty():
+            queue.get_nowait()  # Unblocks a scanner waiting on a full queue
+        await producer
+    return response
+
+
+def _build_gallery_page(root, full_monitor_path, folder_key, params, cancel_event):
+    """Builds and serializes one page of a folder listing (runs in the gallery executor), None if the folder is missing."""
+    relative_folder = resolve_folder(full_monitor_path, root, folder_key)
+    if not os.path.isdir(os.path.join(full_monitor_path, relative_folder)):
+        return None
+
+    listing = listing_cache.get(full_monitor_path, relative_folder, root)
+    page = paginate(listing, **params)
+    page["folder"] = folder_key
+    if params["cursor"] is None:
+        # Prefetch the thumbnails of the folder being viewed ahead of any backlog
+        get_background_indexer().schedule([(os.path.join(full_monitor_path, relative_folder), root, PRIORITY_VISIBLE, False)])
+    return _serialize(page)
+
+
+async def get_gallery_page(request, root, full_monitor_path):
+    """
+    Paged listing of a single folder: folder, sort (timestamp|name|size), order (asc|desc),
+    filter (name substring), prompt (prompt substring), cursor and limit query parameters.
+    """
+    query = request.rel_url.query
+    try:
+        folder_key = query.get("folder", root)
+        params = dict(
+            sort_key=query.get("sort", "timestamp"),
+            order=query.get("order", "desc"),
+            name_filter=query.get("filter", ""),
+            prompt_filter=query.get("prompt", ""),
+            cursor=query.get("cursor") or None,
+            limit=query.get("limit", DEFAULT_PAGE_SIZE),
+        )
+        key = ("page", root, full_monitor_path, folder_key, tuple(sorted(params.items())))
+        version = _snapshot_version(root, full_monitor_path)
+        snapshot = get_snapshot_cache().get(key, version)
+        if snapshot is None:
+            json_string = await run_blocking(request, key, _build_gallery_page, root, full_monitor_path, folder_key, params)
+            if json_string is None:
+                return web.Response(status=404, text=f"Folder not found: {folder_key}")
+            snapshot = get_snapshot_cache().put(key, version, json_string.encode("utf-8"))
+        return _snapshot_response(request, snapshot)
+    except ClientDisconnected:
+        return web.Response(status=499, text="Client disconnected")
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except Exception as e:
+        print(f"Error in /Gallery/images (paged): {e}")
+        return web.Response(status=500, text=str(e))
+
+
+@PromptServer.instance.routes.get("/Gallery/folders")
+async def get_gallery_folders(request):
+    """
+    Endpoint returning the folder tree below root and relative_path with per-folder file counts, bytes,
+    files per type and newest timestamps (see folder_tree), without listing any file.
+    """
+    try:
+        root, full_monitor_path = _request_root(request.rel_url.query)
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    if not os.path.isdir(full_monitor_path):
+        return web.Response(status=404, text=f"Folder not found: {request.rel_url.query.get('relative_path', './')}")
+
+    try:
+        key = ("folders", root, full_monitor_path)
+        version = _snapshot_version(root, full_monitor_path)
+        snapshot = get_snapshot_cache().get(key, version)
+        if snapshot is None:
+            json_string = await run_blocking(request, key, _build_folder_tree, root, full_monitor_path)
+            snapshot = get_snapshot_cache().put(key, version, json_string.encode("utf-8"))
+        return _snapshot_response(request, snapshot)
+    except ClientDisconnected:
+        return web.Response(status=499, text="Client disconnected")
+    except Exception as e:
+        print(f"Error in /Gallery/folders: {e}")
+        return web.Response(status=500, text=str(e))
+
+
+def _build_folder_tree(root, full_monitor_path, cancel_event):
+    """Builds and serializes the folder tree (runs in the gallery executor)."""
+    journal = get_change_journal(root, full_monitor_path)
+    seq = journal.seq  # Taken first, like the full listing
+    return _serialize({"folders": folder_tree(root, full_monitor_path, cancel_event), "seq": seq, "path": journal.path})
+
+
+def _build_file_metadata(full_path, stat_result, cancel_event):
+    """Extracts and serializes the metadata of one file (runs in the gallery executor)."""
+    metadata = {}
+    if get_file_type(full_path) != "unknown":
+        metadata = extract_metadata(full_path, stat_result, get_metadata_index())
+    return _serialize(metadata)
+
+
+@PromptServer.instance.routes.get("/Gallery/metadata")
+async def get_gallery_metadata(request):
+    """Endpoint returning the full metadata of one file, accepts filename, subfolder, root and relative_path."""
+    query = request.rel_url.query
+    try:
+        _, full_monitor_path = _request_root(query)
+        full_path = resolve_file(full_monitor_path, query.get("subfolder", ""), query.get("filename", ""))
+        stat_result = await run_in_executor(os.stat, full_path)
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except OSError:
+        return web.Response(status=404, text="File not found")
+
+    # Metadata only changes with the file, so its stat signature is a strong validator
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return web.Response(status=304, headers=headers)
+    elif request.if_modified_since is not None and int(stat_result.st_mtime) <= request.if_modified_since.timestamp():
+        return web.Response(status=304, headers=headers)
+
+    try:
+        key = ("metadata", full_path, etag)
+        json_string = await run_blocking(request, key, _build_file_metadata, full_path, stat_result)
+        return _json_response(json_string, headers=headers)
+    except ClientDisconnected:
+        return web.Response(status=499, text="Client disconnected")
+    except Exception as e:
+        print(f"Error in /Gallery/metadata: {e}")
+        return web.Response(status=500, text=str(e))
+
+
+@PromptServer.instance.routes.get("/Gallery/thumbnail")
+async def get_gallery_thumbnail(request):
+    """Endpoint serving a cached thumbnail, accepts filename, subfolder, size, root and relative_path."""
+    query = request.rel_url.query
+    try:
+        root, full_monitor_path = _request_root(query)
+        full_path = resolve_file(full_monitor_path, query.get("subfolder", ""), query.get("filename", ""))
+        size = int(query.get("size", DEFAULT_THUMBNAIL_SIZE))
+        stat_result = await run_in_executor(os.stat, full_path)
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except OSError:
+        return web.Response(status=404, text="File not found")
+
+    cache = get_thumbnail_cache()
+    thumbnail_path = await run_in_executor(cache.get, full_path, stat_result, size)
+    if thumbnail_path is None:
+        try:
+            thumbnail_path = await asyncio.wrap_future(cache.request(full_path, stat_result, size))
+        except Exception as e:
+            print(f"Gallery: Error generating thumbnail for {full_path}: {e}")
+            if get_file_type(full_path) == "video":
+                return web.Response(status=404, text="No poster frame available")
+            # Fall back to the original file so the tile still renders; /view takes subfolders below the root directory
+            subfolder = os.path.relpath(os.path.dirname(full_path), resolve_root(root))
+            subfolder = "" if subfolder == "." else subfolder.replace(os.sep, "/")
+            raise web.HTTPFound(f"/view?filename={quote(os.path.basename(full_path))}&subfolder={quote(subfolder)}&type={quote(root)}")
+
+    # URLs carry the file version (v=mtime), so a thumbnail for a given URL never changes
+    return web.FileResponse(thumbnail_path, headers={
+        "Content-Type": cache.content_type,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    })
+
+
+def _build_search_page(root, full_monitor_path, folder_key, params, cancel_event):
+    """Runs a search and serializes the page (runs in the gallery executor), None without an index."""
+    index = get_metadata_index()
+    if index is None:
+        return None
+    subtree = os.path.join(full_monitor_path, resolve_folder(full_monitor_path, root, folder_key))
+    return _serialize(search_gallery(index, full_monitor_path, root, root=subtree, **params))
+
+
+@PromptServer.instance.routes.get("/Gallery/search")
+async def search_gallery_files(request):
+    """
+    Endpoint searching indexed files by prompt, model, LoRA, sampler, seed, date and resolution.
+    Accepts q (see gallery_search.parse_query), folder (limits the search to that subtree),
+    order (desc|asc), cursor, limit, root and relative_path.
+    """
+    query = request.rel_url.query
+    params = dict(
+        query=query.get("q", ""),
+        order=query.get("order", "desc"),
+        cursor=query.get("cursor") or None,
+        limit=query.get("limit", DEFAULT_PAGE_SIZE),
+    )
+    try:
+        root, full_monitor_path = _request_root(query)
+        folder_key = query.get("folder", root)
+        key = ("search", root, full_monitor_path, folder_key, tuple(sorted(params.items())))
+        json_string = await run_blocking(request, key, _build_search_page, root, full_monitor_path, folder_key, params)
+        if json_string is None:
+            return web.Response(status=503, text="Metadata index unavailable")
+        return _json_response(json_string)
+    except ClientDisconnected:
+        return web.Response(status=499, text="Client disconnected")
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except Exception as e:
+        print(f"Error in /Gallery/search: {e}")
+        return web.Response(status=500, text=str(e))
+
+
+def _build_duplicates(root, full_monitor_path, folder_key, params, cancel_event):
+    """Finds duplicate groups and serializes them (runs in the gallery executor), None without an index."""
+    index = get_metadata_index()
+    if index is None:
+        return None
+    subtree = os.path.join(full_monitor_path, resolve_folder(full_monitor_path, root, folder_key))
+    return _serialize(find_duplicates(index, full_monitor_path, root, root=subtree, **params))
+
+
+@PromptServer.instance.routes.get("/Gallery/duplicates")
+async def get_gallery_duplicates(request):
+    """
+    Endpoint listing identical (mode=exact) or perceptually similar (mode=similar, threshold in bits)
+    files, accepts folder, limit (groups), root and relative_path. Missing hashes are computed in the background.
+    """
+    query = request.rel_url.query
+    try:
+        root, full_monitor_path = _request_root(query)
+        folder_key = query.get("folder", root)
+        params = dict(
+            mode=query.get("mode", "exact"),
+            threshold=int(query.get("threshold", DEFAULT_SIMILARITY)),
+            limit=int(query.get("limit", 100)),
+        )
+        key = ("duplicates", root, full_monitor_path, folder_key, tuple(sorted(params.items())))
+        json_string = await run_blocking(request, key, _build_duplicates, root, full_monitor_path, folder_key, params)
+        if json_string is None:
+            return web.Response(status=503, text="Metadata index unavailable")
+        return _json_response(json_string)
+    except ClientDisconnected:
+        return web.Response(status=499, text="Client disconnected")
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except Exception as e:
+        print(f"Error in /Gallery/duplicates: {e}")
+        return web.Response(status=500, text=str(e))
+
+
+@PromptServer.instance.routes.get("/Gallery/changes")
+async def get_gallery_changes(request):
+    """
+    Endpoint returning every change below a monitored folder after the given sequence number,
+    accepts since, root and relative_path.
+    """
+    try:
+        since = int(request.rel_url.query.get("since", "0"))
+    except ValueError:
+        return web.Response(status=400, text="Invalid since parameter")
+    try:
+        root, full_monitor_path = _request_root(request.rel_url.query)  # Unknown roots get no journal
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    json_string = await run_in_executor(lambda: _serialize(get_change_journal(root, full_monitor_path).since(since)))
+    return _json_response(json_string)
+
+
+@PromptServer.instance.routes.get("/Gallery/stats")
+async def get_gallery_stats_route(request):
+    """
+    Endpoint returning scan counters and per-stage timing histograms as JSON, or in the Prometheus
+    text format with format=prometheus (or an Accept header asking for text/plain). reset=1 zeroes them.
+    """
+    query = request.rel_url.query
+    stats = get_gallery_stats()
+    if query.get("format") == "prometheus" or (query.get("format") != "json" and "text/plain" in request.headers.get("Accept", "")):
+        response = web.Response(body=stats.prometheus().encode("utf-8"), headers={
+            "Content-Type": "text/plain; version=0.0.4; charset=utf-8",
+            "Cache-Control": "no-store",
+        })
+    else:
+        response = web.json_response(stats.snapshot(), headers={"Cache-Control": "no-store"})
+    if query.get("reset") == "1":
+        stats.reset()
+    return response
+
+
+@PromptServer.instance.routes.post("/Gallery/index/rebuild")
+async def rebuild_gallery_index(request):
+    """Endpoint to rebuild (cold) or verify the persistent metadata index, accepts root, relative_path and mode."""
+    try:
+        data = await request.json()
+        relative_path = data.get("relative_path", "./")
+        mode = data.get("mode", "rebuild")
+        try:
+            root, full_monitor_path = _request_root(data)
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
+
+        if not os.path.isdir(full_monitor_path):
+            return web.Response(status=400, text=f"Invalid relative_path: {relative_path}, path not found")
+
+        if mode == "verify":
+            result = await run_in_executor(verify_index, full_monitor_path)
+        elif mode == "rebuild":
+            result = {"files": await run_in_executor(rebuild_index, full_monitor_path, True)}
+            get_snapshot_cache().invalidate(root)  # Summaries were extracted again
+        else:
+            return web.Response(status=400, text=f"Invalid mode: {mode}")
+        return web.json_response(result)
+
+    except Exception as e:
+        print(f"Error in /Gallery/index/rebuild: {e}")
+        return web.Response(status=500, text=str(e))
+
+
+@PromptServer.instance.routes.get("/Gallery/index/status")
+async def get_gallery_index_status(request):
+    """Endpoint reporting the background indexer's queue and whether it is paused for generation."""
+    return web.json_response(get_background_indexer().status(), headers={"Cache-Control": "no-store"})
+
+
+async def _bulk_request(request, allow_form=False):
+    """
+    Reads a bulk request: root, relative_path, files ([{"folder", "name"}]), folder and q. Returns
+    (data, root, full_monitor_path, paths). Raises ValueError for invalid requests. With allow_form,
+    a form with the JSON in its "selection" field is accepted too (so a plain form post can start a
+    download); never for changing requests, as a cross-site form post needs no CORS preflight.
+    """
+    if request.content_type == "application/json":
+        data = await request.json()
+    elif allow_form:
+        data = json.loads((await request.post()).get("selection") or "{}")
+    else:
+        raise ValueError("Expected an application/json body")
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    root, full_monitor_path = _request_root(data)
+    if not data.get("files") and data.get("q") is None:
+        raise ValueError("Select files, or a folder with q (\"\" for all of its files)")
+    paths = await run_in_executor(
+        resolve_selection, full_monitor_path, root, data.get("files") or (), data.get("folder"), data.get("q")
+    )
+    return data, root, full_monitor_path, paths
+
+
+@PromptServer.instance.routes.post("/Gallery/export")
+async def export_gallery_files(request):
+    """
+    Endpoint streaming a selection (see _bulk_request) as a zip download, written while the files are read.
+    """
+    try:
+        _, root, full_monitor_path, paths = await _bulk_request(request, allow_form=True)
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except Exception as e:
+        print(f"Error in /Gallery/export: {e}")
+        return web.Response(status=500, text=str(e))
+
+    def produce(emit, cancel_event):
+        try:
+            write_zip(paths, full_monitor_path, emit, cancel_event)
+        except ScanCancelled:
+            raise
+        except Exception as e:
+            print(f"Error in /Gallery/export: {e}")  # Headers are out, the response is aborted
+            raise
+
+    filename = f"gallery-{root}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    return await _stream_from_executor(
+        request,
+        produce,
+        {"Content-Type": "application/zip", "Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+        run_export,
+    )
+
+
+@PromptServer.instance.routes.post("/Gallery/delete")
+async def delete_gallery_files(request):
+    """
+    Endpoint deleting a selection (see _bulk_request). The index and clients are updated in one batch;
+    returns the number deleted, the files that could not be and the change journal seq.
+    """
+    if request.content_type != "application/json":
+        return web.Response(status=415, text="Expected an application/json body")
+    try:
+        _, root, full_monitor_path, paths = await _bulk_request(request)
+        deleted, errors = await run_in_executor(delete_files, root, paths)
+        return web.json_response({
+            "deleted": len(deleted),
+            "errors": [{"path": path, "error": error} for path, error in errors],
+            "seq": get_change_journal(root, full_monitor_path).seq,
+        })
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except Exception as e:
+        print(f"Error in /Gallery/delete: {e}")
+        return web.Response(status=500, text=str(e))
+
+
+@PromptServer.instance.routes.post("/Gallery/move")
+async def move_gallery_files(request):
+    """
+    Endpoint moving a selection (see _bulk_request) into the folder named by destination (a folder key,
+    created if missing). Files keep their names and are left in place if the name is taken.
+    """
+    if request.content_type != "application/json":
+        return web.Response(status=415, text="Expected an application/json body")
+    try:
+        data, root, full_monitor_path, paths = await _bulk_request(request)
+        if not data.get("destination"):
+            raise ValueError("Missing destination folder")
+        destination = os.path.join(full_monitor_path, resolve_folder(full_monitor_path, root, data["destination"]))
+        moved, errors = await run_in_executor(move_files, root, paths, destination)
+        return web.json_response({
+            "moved": len(moved),
+            "errors": [{"path": path, "error": error} for path, error in errors],
+            "seq": get_change_journal(root, full_monitor_path).seq,
+        })
+    except ValueError as e:
+        return web.Response(status=400, text=str(e))
+    except Exception as e:
+        print(f"Error in /Gallery/move: {e}")
+        return web.Response(status=500, text=str(e))
+
+
 @PromptServer.instance.routes.post("/Gallery/monitor/start")
 async def start_gallery_monitor(request):
-    """Endpoint to start gallery monitoring, accepts relative_path."""
-    global monitor
-    if monitor and monitor.thread and monitor.thread.is_alive(): # Use monitor.thread.is_alive()
-        print("FileSystemMonitor: Monitor already running, stopping previous monitor.")
-        monitor.stop_monitoring()
-
+    """
+    Endpoint subscribing a client to the monitor of a folder, accepts root, relative_path and client_id
+    (ComfyUI's websocket client id). Clients watching the same folder share one monitor.
+    """
     try:
         data = await request.json()
         relative_path = data.get("relative_path", "./")
-        full_monitor_path = os.path.normpath(os.path.join(folder_paths.get_output_directory(), "..", "output", relative_path))
+        try:
+            root, full_monitor_path = _request_root(data)
+        except ValueError as e:
+            return web.Response(status=400, text=str(e))
 
         if not os.path.isdir(full_monitor_path):
             return web.Response(status=400, text=f"Invalid relative_path: {relative_path}, path not found")
 
-        monitor = FileSystemMonitor(full_monitor_path)
-        monitor.start_monitoring()
-        return web.Response(text="Gallery monitor started", content_type="text/plain")
+        registry = get_monitor_registry()
+        registry.prune(set(PromptServer.instance.sockets))  # Tabs closed without unsubscribing
+        reused = registry.subscribe(data.get("client_id"), root, full_monitor_path)
+        if not reused:
+            get_background_indexer().schedule([(full_monitor_path, root, folder_priority(full_monitor_path), True)])
+        journal = get_change_journal(root, full_monitor_path)
+        return web.json_response({"root": root, "path": journal.path, "reused": reused, "seq": journal.seq})
 
     except Exception as e:
         print(f"Error starting gallery monitor: {e}")
@@ -80,14 +718,24 @@ async def start_gallery_monitor(request):
 
 @PromptServer.instance.routes.post("/Gallery/monitor/stop")
 async def stop_gallery_monitor(request):
-    """Endpoint to stop gallery monitoring."""
-    global monitor
-    if monitor and monitor.thread and monitor.thread.is_alive(): # Use monitor.thread.is_alive()
-        monitor.stop_monitoring()
-        monitor = None
-        return web.Response(text="Gallery monitor stopped", content_type="text/plain")
-    else:
-        return web.Response(text="Gallery monitor is not running.", status=200, content_type="text/plain")
+    """
+    Endpoint unsubscribing a client, accepts client_id and root (every root if left out). The monitor
+    stops once no client is subscribed to it anymore.
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        data = {}  # Older clients post no body
+    registry = get_monitor_registry()
+    registry.unsubscribe(data.get("client_id"), data.get("root"))
+    registry.prune(set(PromptServer.instance.sockets))
+    return web.Response(text="Gallery monitor subscription removed", content_type="text/plain")
+
+
+@PromptServer.instance.routes.get("/Gallery/monitor/status")
+async def get_gallery_monitor_status(request):
+    """Endpoint listing the running monitors and their subscriber counts."""
+    return web.json_response({"monitors": get_monitor_registry().status()})
 
 
 @PromptServer.instance.routes.patch("/Gallery/updateImages")
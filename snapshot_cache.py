@@ -0,0 +1,158 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from .gallery_stats import get_gallery_stats
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SNAPSHOT_CACHE_BUDGET = int(os.environ.get("COMFYUI_GALLERY_SNAPSHOT_CACHE_MB", "64")) * 1024 * 1024
+MIN_COMPRESS_SIZE = 1024  # Smaller bodies are sent as they are
+
+# Content codings in order of preference, only those whose module is installed
+ENCODINGS = OrderedDict()
+if brotli is not None:
+    ENCODINGS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    ENCODINGS["zstd"] = lambda body: zstandard.ZstdCompressor(level=3).compress(body)
+ENCODINGS["gzip"] = lambda body: gzip.compress(body, compresslevel=6)
+
+
+def negotiate(accept_encoding):
+    """Returns the preferred content coding the Accept-Encoding header allows, None for identity."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip() and quality > 0:
+            accepted.add(coding.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class Snapshot:
+    """
+    A serialized response body plus its compressed forms, made on first request per coding.
+    The strong ETag is a digest of the body, suffixed with the coding as each coding is its own representation.
+    """
+
+    def __init__(self, body, version):
+        self.body = body
+        self.version = version
+        self.digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(body) for body in self._encoded.values())
+
+    def etag(self, encoding=None):
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def matches(self, if_none_match):
+        """True if an If-None-Match header names this body in any coding."""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]  # Weak comparison is fine for If-None-Match
+            if tag == "*" or tag.strip('"').split("-")[0] == self.digest:
+                return True
+        return False
+
+    def encoded(self, encoding):
+        """Returns the body in the given content coding, compressing it once."""
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    body = self._encoded[encoding] = ENCODINGS[encoding](self.body)
+        return body
+
+
+class SnapshotCache:
+    """
+    Most recently used listing snapshots keyed by request, each valid for one version (see server's
+    _snapshot_version). Snapshots made without a version are handed out but not kept.
+    """
+
+    def __init__(self, budget=SNAPSHOT_CACHE_BUDGET):
+        self.budget = budget
+        self._snapshots = OrderedDict()  # key -> Snapshot
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Returns the snapshot stored for key if it is still at version, else None."""
+        stats = get_gallery_stats()
+        if version is None:
+            stats.count("snapshot_misses")
+            return None
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None or snapshot.version != version:
+                stats.count("snapshot_misses")
+                return None
+            self._snapshots.move_to_end(key)
+            self._trim()  # Compressed forms added since the last put count too
+        stats.count("snapshot_hits")
+        return snapshot
+
+    def put(self, key, version, body):
+        """Wraps body (bytes) in a Snapshot and keeps it for version, unless version is None."""
+        snapshot = Snapshot(body, version)
+        if version is not None:
+            with self._lock:
+                self._snapshots[key] = snapshot
+                self._snapshots.move_to_end(key)
+                self._trim()
+        return snapshot
+
+    def _trim(self):
+        total = sum(snapshot.size for snapshot in self._snapshots.values())
+        while total > self.budget and len(self._snapshots) > 1:
+            _, snapshot = self._snapshots.popitem(last=False)
+            total -= snapshot.size
+
+    def invalidate(self, root=None):
+        """Drops every snapshot, or those of one root (keys are (kind, root, ...))."""
+        with self._lock:
+            if root is None:
+                self._snapshots.clear()
+            else:
+                for key in [key for key in self._snapshots if key[1] == root]:
+                    del self._snapshots[key]
+
+
+_snapshot_cache = None
+_snapshot_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache():
+    """Returns the shared snapshot cache."""
+    global _snapshot_cache
+    if _snapshot_cache is None:
+        with _snapshot_cache_lock:
+            if _snapshot_cache is None:
+                _snapshot_cache = SnapshotCache()
+    return _snapshot_cache
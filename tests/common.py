@@ -0,0 +1,48 @@
+"""Shared helpers for the tests: loads the extension as a package outside ComfyUI (see benchmarks/common.py)."""
+import os
+import sys
+import types
+import struct
+import zlib
+import tempfile
+import importlib
+import importlib.util
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "comfyui_gallery"
+
+# Every test run gets a throwaway metadata index instead of the one next to the extension
+os.environ.setdefault("COMFYUI_GALLERY_INDEX", os.path.join(tempfile.mkdtemp(), "index.db"))
+
+
+def load_gallery_module(name):
+    """Imports a submodule of the extension (e.g. "png_reader") without ComfyUI."""
+    if "folder_paths" not in sys.modules:
+        folder_paths = types.ModuleType("folder_paths")
+        folder_paths.get_output_directory = lambda: os.path.join(os.getcwd(), "output")
+        folder_paths.get_input_directory = lambda: os.path.join(os.getcwd(), "input")
+        folder_paths.get_temp_directory = lambda: os.path.join(os.getcwd(), "temp")
+        sys.modules["folder_paths"] = folder_paths
+    if PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE_NAME, os.path.join(REPO_ROOT, "__init__.py"), submodule_search_locations=[REPO_ROOT]
+        )
+        sys.modules[PACKAGE_NAME] = importlib.util.module_from_spec(spec)  # Package body (routes) is not executed
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+def png_chunk(kind, data):
+    """Returns one PNG chunk with its length and CRC."""
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def write_png(path, chunks=(), size=(1, 1), trailing=()):
+    """Writes a black PNG with the (chunk type, payload) chunks before its pixel data and trailing after it."""
+    width, height = size
+    pixels = zlib.compress(b"".join(b"\x00" + b"\x00" * 3 * width for _ in range(height)))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(b"".join(png_chunk(kind, data) for kind, data in chunks))
+        f.write(png_chunk(b"IDAT", pixels))
+        f.write(b"".join(png_chunk(kind, data) for kind, data in trailing))
+        f.write(png_chunk(b"IEND", b""))
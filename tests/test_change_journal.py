@@ -0,0 +1,84 @@
+"""Checks the change journal's sequence numbers, catch-up and coalesced, batched emission."""
+import sys
+import types
+import unittest
+from unittest import mock
+
+from common import load_gallery_module
+
+
+class _ManualTimer:
+    """Stands in for threading.Timer; the test fires it."""
+
+    def __init__(self, delay, function):
+        self.delay = delay
+        self.function = function
+        self.daemon = False
+
+    def start(self):
+        pass
+
+
+def changes(folder, *names, action="add"):
+    return {"folders": {folder: {name: {"action": action} for name in names}}}
+
+
+class ChangeJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        change_journal = load_gallery_module("change_journal")
+        self.journal = change_journal.ChangeJournal("output", "sub", retention=5, min_interval=0, max_batch=3)
+        self.sent = []
+        prompt_server = types.SimpleNamespace(send_sync=lambda event, data: self.sent.append((event, data)))
+        server = types.ModuleType("server")
+        server.PromptServer = types.SimpleNamespace(instance=prompt_server)
+        patches = [
+            mock.patch.dict(sys.modules, {"server": server}),
+            mock.patch.object(change_journal.threading, "Timer", _ManualTimer),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def emit_all(self):
+        while self.journal._timer is not None:
+            self.journal._timer.function()
+
+    def test_sequence_numbers(self):
+        self.journal.record(changes("sub", "a.png", "b.png"))
+        self.journal.record(changes("sub/x", "c.png"))
+        self.assertEqual(self.journal.seq, 3)
+
+    def test_since_coalesces_per_file(self):
+        self.journal.record(changes("sub", "a.png", "b.png"))
+        self.journal.record(changes("sub", "a.png", action="remove"))
+        self.assertEqual(self.journal.since(1), {
+            "root": "output", "path": "sub", "seq": 3, "reset": False,
+            "folders": {"sub": {"b.png": {"action": "add"}, "a.png": {"action": "remove"}}},
+        })
+        self.assertEqual(self.journal.since(3)["folders"], {})
+        self.assertFalse(self.journal.since(3)["reset"])
+
+    def test_since_outside_history_resets(self):
+        self.journal.record(changes("sub", *(f"{i}.png" for i in range(7))))  # Only the last 5 are retained
+        self.assertFalse(self.journal.since(2)["reset"])
+        self.assertTrue(self.journal.since(1)["reset"])
+        self.assertTrue(self.journal.since(8)["reset"])
+
+    def test_emission_is_coalesced_and_batched(self):
+        self.journal.record(changes("sub", "a.png", "b.png"))
+        self.journal.record(changes("sub", "a.png", action="remove"))
+        self.journal.record(changes("sub/x", "c.png", "d.png"))
+        self.emit_all()
+
+        self.assertEqual([event for event, _ in self.sent], ["Gallery.file_change"] * 2)
+        first, second = (data for _, data in self.sent)
+        self.assertEqual((first["first_seq"], first["seq"]), (1, 4))
+        self.assertEqual(first["folders"], {"sub": {"b.png": {"action": "add"}, "a.png": {"action": "remove"}}, "sub/x": {"c.png": {"action": "add"}}})
+        self.assertEqual((second["first_seq"], second["seq"]), (5, 5))
+        self.assertEqual(second["folders"], {"sub/x": {"d.png": {"action": "add"}}})
+        self.assertEqual((second["root"], second["path"]), ("output", "sub"))
+
+
+if __name__ == "__main__":
+    unittest.main()
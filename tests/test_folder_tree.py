@@ -0,0 +1,89 @@
+"""
+Checks that folders created, moved or deleted after the initial snapshot show up in /Gallery/folders.
+
+Usage: python -m unittest discover tests (needs the packages from requirements.txt)
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from common import load_gallery_module, write_png
+
+
+class _Registry:
+    """Serves folder_totals from one handler, like a MonitorRegistry watching the test folder."""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def folder_totals(self, root, path):
+        return self.handler.folder_totals("")
+
+
+class FolderTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder_monitor = load_gallery_module("folder_monitor")
+        self.folder_tree = load_gallery_module("folder_tree")
+        self.base_path = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.base_path, "a"))
+        write_png(os.path.join(self.base_path, "a", "first.png"))
+
+        self.handler = self.folder_monitor.GalleryEventHandler(self.base_path, root="output")
+        self.handler.known_folders = self.folder_monitor.snapshot_tree(self.base_path)
+        self.handler.ready.set()
+        self.get_monitor_registry = self.folder_tree.get_monitor_registry
+        self.folder_tree.get_monitor_registry = lambda: _Registry(self.handler)
+
+    def tearDown(self):
+        self.folder_tree.get_monitor_registry = self.get_monitor_registry
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def tree(self):
+        return self.folder_tree.folder_tree("output", self.base_path)
+
+    def key(self, *names):
+        return os.path.join("output", *names)
+
+    def test_created_folder(self):
+        os.makedirs(os.path.join(self.base_path, "a", "new"))
+        write_png(os.path.join(self.base_path, "a", "new", "second.png"))
+        self.handler.apply_changes(set(), {os.path.join(self.base_path, "a", "new")})
+
+        tree = self.tree()
+        self.assertEqual(tree[self.key("a")]["children"], [self.key("a", "new")])
+        self.assertEqual(tree[self.key("a", "new")]["files"], 1)
+        self.assertEqual(tree[self.key("a")]["total_files"], 2)
+        self.assertEqual(tree["output"]["total_files"], 2)
+
+    def test_file_in_new_nested_folder(self):
+        os.makedirs(os.path.join(self.base_path, "b", "c"))
+        write_png(os.path.join(self.base_path, "b", "c", "third.png"))
+        self.handler.apply_changes({os.path.join(self.base_path, "b", "c", "third.png")}, set())
+
+        tree = self.tree()
+        self.assertEqual(tree["output"]["children"], [self.key("a"), self.key("b")])
+        self.assertEqual(tree[self.key("b")]["children"], [self.key("b", "c")])
+        self.assertEqual(tree["output"]["total_files"], 2)
+
+    def test_moved_and_deleted_folder(self):
+        os.makedirs(os.path.join(self.base_path, "d"))
+        source, target = os.path.join(self.base_path, "a"), os.path.join(self.base_path, "d", "a")
+        os.rename(source, target)
+        self.handler.apply_changes(set(), {source, target})
+
+        tree = self.tree()
+        self.assertEqual(tree["output"]["children"], [self.key("d")])
+        self.assertEqual(tree[self.key("d")]["children"], [self.key("d", "a")])
+        self.assertEqual(tree["output"]["total_files"], 1)
+
+        shutil.rmtree(os.path.join(self.base_path, "d"))
+        self.handler.apply_changes(set(), {os.path.join(self.base_path, "d")})
+        tree = self.tree()
+        self.assertEqual(tree["output"]["children"], [])
+        self.assertEqual(tree["output"]["total_files"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
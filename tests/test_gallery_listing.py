@@ -0,0 +1,64 @@
+"""Checks keyset pagination of folder listings (gallery_listing.paginate and its cursors)."""
+import types
+import unittest
+
+from common import load_gallery_module
+
+
+def stat(timestamp, size):
+    return types.SimpleNamespace(st_mtime=timestamp, st_mtime_ns=int(timestamp * 1e9), st_size=size)
+
+
+class PaginateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.gallery_listing = load_gallery_module("gallery_listing")
+        self.catalog = load_gallery_module("gallery_catalog").Catalog()
+        # Equal timestamps and sizes, so the name has to break the ties across page boundaries
+        for name, timestamp, size in [
+            ("b.png", 10, 300), ("a.png", 10, 100), ("C.png", 30, 200), ("d.png", 20, 100),
+            ("e.png", 20, 400), ("f.png", 40, 100), ("g.png", 10, 200),
+        ]:
+            self.catalog.add("", name, stat(timestamp, size), "image", {"positive": f"prompt of {name}"})
+
+    def pages(self, limit=3, **kwargs):
+        """Returns the names of every page, following next_cursor to the end."""
+        pages, cursor = [], None
+        while True:
+            page = self.gallery_listing.paginate(self.catalog, cursor=cursor, limit=limit, **kwargs)
+            pages.append([entry["name"] for entry in page["files"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    def test_timestamp_desc(self):
+        self.assertEqual(self.pages(), [["f.png", "C.png", "e.png"], ["d.png", "g.png", "b.png"], ["a.png"]])
+
+    def test_orders_and_sorts(self):
+        self.assertEqual(self.pages(sort_key="timestamp", order="asc"), [["a.png", "b.png", "g.png"], ["d.png", "e.png", "C.png"], ["f.png"]])
+        self.assertEqual(self.pages(sort_key="size", order="asc"), [["a.png", "d.png", "f.png"], ["C.png", "g.png", "b.png"], ["e.png"]])
+        self.assertEqual(self.pages(sort_key="name", order="asc", limit=4), [["a.png", "b.png", "C.png", "d.png"], ["e.png", "f.png", "g.png"]])
+
+    def test_filter(self):
+        page = self.gallery_listing.paginate(self.catalog, prompt_filter="OF C", limit=3)
+        self.assertEqual([entry["name"] for entry in page["files"]], ["C.png"])
+        self.assertIsNone(page["total"])
+        self.assertEqual(self.pages(name_filter="png", limit=5), [["f.png", "C.png", "e.png", "d.png", "g.png"], ["b.png", "a.png"]])
+
+    def test_files_added_between_pages(self):
+        first = self.gallery_listing.paginate(self.catalog, limit=3)
+        self.assertEqual(first["total"], 7)
+        self.catalog.add("", "new.png", stat(50, 100), "image", {})
+        second = self.gallery_listing.paginate(self.catalog, cursor=first["next_cursor"], limit=3)
+        self.assertEqual([entry["name"] for entry in second["files"]], ["d.png", "g.png", "b.png"])
+
+    def test_cursor_validation(self):
+        cursor = self.gallery_listing.encode_cursor("timestamp", 20, "d.png")
+        self.assertEqual(self.gallery_listing.decode_cursor(cursor, "timestamp"), (20, "d.png"))
+        self.assertRaises(ValueError, self.gallery_listing.decode_cursor, cursor, "name")
+        self.assertRaises(ValueError, self.gallery_listing.decode_cursor, "not a cursor", "timestamp")
+        self.assertRaises(ValueError, self.gallery_listing.paginate, self.catalog, sort_key="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Checks the header-only PNG reader (png_reader) against hand-built files."""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+from contextlib import redirect_stdout
+from unittest import mock
+
+from common import load_gallery_module, write_png
+
+
+def text_chunk(keyword, text):
+    return b"tEXt", keyword.encode("latin-1") + b"\0" + text.encode("latin-1")
+
+
+def ztxt_chunk(keyword, data):
+    return b"zTXt", keyword.encode("latin-1") + b"\0\0" + zlib.compress(data)
+
+
+def itxt_chunk(keyword, text, compressed=False):
+    data = text.encode("utf-8")
+    if compressed:
+        data = zlib.compress(data)
+    return b"iTXt", keyword.encode("latin-1") + b"\0" + bytes([int(compressed), 0]) + b"en\0" + b"\0" + data
+
+
+class PngReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.png_reader = load_gallery_module("png_reader")
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "image.png")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def read(self):
+        with redirect_stdout(io.StringIO()):  # Skipped chunks are reported with a warning
+            return self.png_reader.read_png_info(self.path)
+
+    def test_size(self):
+        write_png(self.path, size=(3, 2))
+        self.assertEqual(self.png_reader.read_png_size(self.path), (3, 2))
+        self.assertEqual(self.read(), (3, 2, {}))
+
+    def test_text_chunks(self):
+        write_png(self.path, [
+            text_chunk("prompt", '{"3": {}}'),
+            ztxt_chunk("workflow", b'{"nodes": []}'),
+            itxt_chunk("parameters", "a café ☕"),
+            itxt_chunk("comment", "zipped ☕", compressed=True),
+        ])
+        self.assertEqual(self.read()[2], {
+            "prompt": '{"3": {}}', "workflow": '{"nodes": []}', "parameters": "a café ☕", "comment": "zipped ☕",
+        })
+
+    def test_text_after_pixel_data_is_not_read(self):
+        write_png(self.path, [text_chunk("prompt", "{}")], trailing=[text_chunk("late", "ignored")])
+        self.assertEqual(self.read()[2], {"prompt": "{}"})
+
+    def test_zlib_bomb_is_skipped(self):
+        write_png(self.path, [ztxt_chunk("workflow", b"\0" * 4096), text_chunk("prompt", "{}")])
+        with mock.patch.object(self.png_reader, "MAX_TEXT_CHUNK_SIZE", 1024):
+            self.assertEqual(self.read()[2], {"prompt": "{}"})
+
+    def test_oversized_chunk(self):
+        write_png(self.path, [text_chunk("prompt", "x" * 2048)])
+        with mock.patch.object(self.png_reader, "MAX_TEXT_CHUNK_SIZE", 1024):
+            self.assertRaises(ValueError, self.read)
+
+    def test_truncated_chunk(self):
+        write_png(self.path, [text_chunk("prompt", "x" * 100)])
+        with open(self.path, "r+b") as f:
+            f.truncate(33 + 40)  # Signature and IHDR, then 40 bytes into the tEXt chunk
+        self.assertRaises(ValueError, self.read)
+
+    def test_not_a_png(self):
+        with open(self.path, "wb") as f:
+            f.write(b"GIF89a" + b"\0" * 32)
+        self.assertRaises(ValueError, self.read)
+        self.assertRaises(ValueError, self.png_reader.read_png_size, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Checks the prompt graph summarizer (metadata_extractor.summarizePrompt) on small API-format graphs."""
+import unittest
+
+from common import load_gallery_module
+
+
+def encode(text, clip=("1", 1)):
+    return {"class_type": "CLIPTextEncode", "inputs": {"text": text, "clip": list(clip)}}
+
+
+class SummarizePromptTest(unittest.TestCase):
+
+    def setUp(self):
+        self.summarize = load_gallery_module("metadata_extractor").summarizePrompt
+
+    def test_ksampler(self):
+        prompt = {
+            "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "sdxl.safetensors"}},
+            "10": {"class_type": "LoraLoader", "inputs": {"lora_name": "style.safetensors", "strength_model": 0.8, "model": ["4", 0], "clip": ["4", 1]}},
+            "6": encode("a cat", ("10", 1)),
+            "7": encode("blurry", ("10", 1)),
+            "3": {"class_type": "KSampler", "inputs": {
+                "seed": 42, "steps": 20, "cfg": 7.0, "sampler_name": "euler", "scheduler": "normal", "denoise": 1.0,
+                "model": ["10", 0], "positive": ["6", 0], "negative": ["7", 0], "latent_image": ["5", 0],
+            }},
+        }
+        self.assertEqual(self.summarize(prompt), {
+            "sampler": "euler", "scheduler": "normal", "steps": 20, "cfg": 7.0, "seed": 42, "denoise": 1.0,
+            "model": "sdxl.safetensors", "loras": [{"name": "style.safetensors", "strength": 0.8}],
+            "positive": "a cat", "negative": "blurry",
+        })
+
+    def test_flux_zero_out_negative(self):
+        # The standard Flux graph: the negative is the positive conditioning zeroed out
+        prompt = {
+            "12": {"class_type": "UNETLoader", "inputs": {"unet_name": "flux1-dev.safetensors"}},
+            "6": encode("a cat"),
+            "35": {"class_type": "FluxGuidance", "inputs": {"guidance": 3.5, "conditioning": ["6", 0]}},
+            "33": {"class_type": "ConditioningZeroOut", "inputs": {"conditioning": ["6", 0]}},
+            "3": {"class_type": "KSampler", "inputs": {
+                "seed": 1, "steps": 20, "cfg": 1.0, "sampler_name": "euler", "scheduler": "simple", "denoise": 1.0,
+                "model": ["12", 0], "positive": ["35", 0], "negative": ["33", 0], "latent_image": ["5", 0],
+            }},
+        }
+        summary = self.summarize(prompt)
+        self.assertEqual(summary["positive"], "a cat")
+        self.assertNotIn("negative", summary)
+
+    def test_negative_ignores_unknown_conditioning_inputs(self):
+        prompt = {
+            "6": encode("a cat"),
+            "8": {"class_type": "SomeCustomConditioning", "inputs": {"conditioning": ["6", 0]}},
+            "3": {"class_type": "KSampler", "inputs": {"seed": 1, "positive": ["6", 0], "negative": ["8", 0]}},
+        }
+        self.assertNotIn("negative", self.summarize(prompt))
+
+    def test_negative_through_combine(self):
+        prompt = {
+            "6": encode("a cat"),
+            "7": encode("blurry"),
+            "8": encode("text"),
+            "9": {"class_type": "ConditioningCombine", "inputs": {"conditioning_1": ["7", 0], "conditioning_2": ["8", 0]}},
+            "3": {"class_type": "KSampler", "inputs": {"seed": 1, "positive": ["6", 0], "negative": ["9", 0]}},
+        }
+        self.assertEqual(self.summarize(prompt)["negative"], "blurry\ntext")
+
+    def test_sampler_custom_advanced(self):
+        prompt = {
+            "6": encode("a cat"),
+            "22": {"class_type": "BasicGuider", "inputs": {"model": ["12", 0], "conditioning": ["6", 0]}},
+            "25": {"class_type": "RandomNoise", "inputs": {"noise_seed": 7}},
+            "16": {"class_type": "KSamplerSelect", "inputs": {"sampler_name": "euler"}},
+            "17": {"class_type": "BasicScheduler", "inputs": {"scheduler": "simple", "steps": 28, "denoise": 1.0, "model": ["12", 0]}},
+            "12": {"class_type": "UNETLoader", "inputs": {"unet_name": "flux1-dev.safetensors"}},
+            "13": {"class_type": "SamplerCustomAdvanced", "inputs": {
+                "noise": ["25", 0], "guider": ["22", 0], "sampler": ["16", 0], "sigmas": ["17", 0], "latent_image": ["5", 0],
+            }},
+        }
+        summary = self.summarize(prompt)
+        self.assertEqual((summary["seed"], summary["steps"], summary["sampler"]), (7, 28, "euler"))
+        self.assertEqual((summary["model"], summary["positive"]), ("flux1-dev.safetensors", "a cat"))
+
+    def test_no_sampler(self):
+        prompt = {"1": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}}}
+        self.assertEqual(self.summarize(prompt), {"model": "model.safetensors"})
+
+
+if __name__ == "__main__":
+    unittest.main()
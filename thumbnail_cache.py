@@ -0,0 +1,184 @@
+import os
+import hashlib
+import threading
+import time
+import concurrent.futures
+from PIL import Image, ImageOps, features
+from .metadata_index import normalize_path, stat_signature
+from .media_probe import extract_poster_frame
+from .folder_scanner import VIDEO_EXTENSIONS
+from .gallery_stats import get_gallery_stats
+
+# Thumbnails live next to the extension, content-addressed by source path + mtime + size
+THUMBNAIL_DIR = os.environ.get(
+    "COMFYUI_GALLERY_THUMBNAILS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnails")
+)
+THUMBNAIL_SIZES = (256, 512)  # Longest edge of each size bucket
+DEFAULT_THUMBNAIL_SIZE = 256
+DISK_BUDGET_BYTES = int(os.environ.get("COMFYUI_GALLERY_THUMBNAIL_BUDGET_MB", "1024")) * 1024 * 1024
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+TOUCH_INTERVAL = 3600  # Seconds between LRU timestamp refreshes of a cached thumbnail
+
+
+def bucket_size(requested):
+    """Returns the smallest size bucket that covers the requested edge length."""
+    for size in THUMBNAIL_SIZES:
+        if requested <= size:
+            return size
+    return THUMBNAIL_SIZES[-1]
+
+
+def render_thumbnail(source_path, target_path, size, image_format):
+    """
+    Writes a thumbnail of source_path (first frame for animations, ffmpeg poster frame for videos)
+    with its longest edge <= size. Raises ValueError if no frame can be obtained.
+    """
+    source = source_path
+    if source_path.lower().endswith(VIDEO_EXTENSIONS):
+        source = extract_poster_frame(source_path, size)
+        if source is None:
+            raise ValueError(f"No poster frame available for {source_path}")
+
+    with Image.open(source) as img:
+        img.draft("RGB", (size, size))  # Lets JPEG decode at a reduced scale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((size, size), Image.LANCZOS)
+        if image_format == "JPEG" or img.mode not in ("RGB", "RGBA"):
+            has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha and image_format != "JPEG" else "RGB")
+
+        tmp_path = f"{target_path}.{threading.get_ident()}.tmp"
+        try:
+            if image_format == "WEBP":
+                img.save(tmp_path, "WEBP", quality=80, method=4)
+            else:
+                img.save(tmp_path, "JPEG", quality=85, optimize=True)
+            os.replace(tmp_path, target_path)  # Atomic, so readers never see a partial file
+        except BaseException:
+            try:
+                os.remove(tmp_path)  # Partial write, never picked up by the cache
+            except OSError:
+                pass
+            raise
+
+
+class ThumbnailCache:
+    """Size-bucketed thumbnail cache on disk with a bounded generator pool and LRU eviction."""
+
+    def __init__(self, cache_dir=THUMBNAIL_DIR, max_bytes=DISK_BUDGET_BYTES, max_workers=MAX_WORKERS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.image_format = "WEBP" if features.check("webp") else "JPEG"
+        self.extension = ".webp" if self.image_format == "WEBP" else ".jpg"
+        self.content_type = "image/webp" if self.image_format == "WEBP" else "image/jpeg"
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="GalleryThumbnail")
+        self._in_flight = {}  # cache key -> Future, so concurrent requests share one render
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Disk usage, measured lazily on the first write
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_key(self, full_path, stat_result, size):
+        mtime_ns, file_size = stat_signature(stat_result)
+        raw = f"{normalize_path(full_path)}|{mtime_ns}|{file_size}|{size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.extension)
+
+    def get(self, full_path, stat_result, size=DEFAULT_THUMBNAIL_SIZE):
+        """Returns the cached thumbnail path, or None if it has not been generated yet."""
+        path = self.cache_path(self.cache_key(full_path, stat_result, bucket_size(size)))
+        try:
+            cached_mtime = os.stat(path).st_mtime
+        except OSError:
+            get_gallery_stats().count("thumbnail_cache_misses")
+            return None
+        get_gallery_stats().count("thumbnail_cache_hits")
+        if time.time() - cached_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)  # Mark as recently used for LRU eviction
+            except OSError:
+                pass
+        return path
+
+    def request(self, full_path, stat_result, size=DEFAULT_THUMBNAIL_SIZE):
+        """Returns a Future resolving to the thumbnail path, generating it in the worker pool if needed."""
+        size = bucket_size(size)
+        key = self.cache_key(full_path, stat_result, size)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._executor.submit(self._generate, full_path, key, size)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _generate(self, full_path, key, size):
+        path = self.cache_path(key)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        render_thumbnail(full_path, path, size, self.image_format)
+        self._account(os.path.getsize(path))
+        return path
+
+    def _account(self, added_bytes):
+        """Adds a new thumbnail to the disk usage and evicts old ones when over budget."""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._iter_cached())
+            else:
+                self._total_bytes += added_bytes
+            if self._total_bytes <= self.max_bytes:
+                return
+            self._evict(int(self.max_bytes * 0.9))
+
+    def _iter_cached(self):
+        """Yields (path, mtime, size) for every cached thumbnail."""
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_mtime, st.st_size
+
+    def _evict(self, target_bytes):
+        """Deletes least recently used thumbnails until disk usage is below target_bytes."""
+        entries = sorted(self._iter_cached(), key=lambda item: item[1])
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for path, _, size in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+        print(f"Gallery: Evicted {removed} thumbnails, cache now {total / (1024 * 1024):.1f} MB")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    """Returns the shared thumbnail cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ThumbnailCache()
+    return _cache
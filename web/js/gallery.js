@@ -1,5 +1,6 @@
+import { app } from "../../scripts/app.js";
 import { galleryStyles } from './gallery_styles.js'; // Import styles
-import { resetGallery } from "./gallery_ui.js";
+import { resetGallery, loadFolderFiles } from "./gallery_ui.js";
 /**
  * Represents the image gallery component, handling differential updates.
  */
@@ -21,6 +22,14 @@ export class Gallery {
          * @type {Object<string, Object<string, object>>}
          */
         this.folders = options.folders || {};
+        /**
+         * Folder summaries from /Gallery/folders by folder name, null when the full listing was loaded instead.
+         * Folders are then listed only when opened.
+         * @type {Object<string, object> | null}
+         */
+        this.folderTree = null;
+        /** @type {Set<string>} */
+        this.loadedFolders = new Set(); // Folders of the tree whose files have been requested
         /** @type {HTMLButtonElement | null} */
         this.galleryButton = null;
         /** @type {HTMLDivElement | null} */
@@ -33,6 +42,10 @@ export class Gallery {
         this.sortButtons = [];
         /** @type {string} */
         this.searchText = "";
+        /** @type {{folder: string, text: string, names: Set<string>} | null} */
+        this.serverMatches = null; // Files matched by /Gallery/search (prompts, model, LoRAs, seed...)
+        /** @type {number | null} */
+        this.searchTimer = null;
         /** @type {HTMLDivElement | null} */
         this.fullscreenContainer = null;
         /** @type {HTMLImageElement | null} */
@@ -416,6 +429,7 @@ export class Gallery {
         searchInput.addEventListener('input', (event) => {
             this.searchText = event.target.value;
             this.loadFolderImages(this.currentFolder);
+            this.scheduleServerSearch();
         });
         searchContainer.appendChild(searchInput);
         const clearSearchButton = document.createElement('button');
@@ -539,8 +553,21 @@ export class Gallery {
         folderNames.forEach(folderName => {
             const folderButton = document.createElement('button');
             folderButton.textContent = folderName;
+            folderButton.dataset.folder = folderName;
             folderButton.classList.add('folder-button');
-            folderButton.addEventListener('click', () => this.loadFolderImages(folderName));
+            const summary = this.folderTree?.[folderName];
+            if (summary) {
+                const count = document.createElement('span');
+                count.classList.add('folder-count');
+                count.textContent = summary.files;
+                folderButton.prepend(count);
+                const newest = summary.newest ? `, newest ${new Date(summary.newest * 1000).toLocaleString()}` : '';
+                folderButton.title = `${folderName}\n${summary.files} files, ${(summary.bytes / 1048576).toFixed(1)} MB${newest}`;
+            }
+            folderButton.addEventListener('click', () => {
+                this.loadFolderImages(folderName);
+                this.scheduleServerSearch();
+            });
             if (folderName === this.currentFolder) {
                 folderButton.classList.add('active-folder');
             } else {
@@ -561,11 +588,18 @@ export class Gallery {
     loadFolderImages(folderName) {
         if (!folderName) return;
         this.currentFolder = folderName;
+        if (this.folderTree && !this.loadedFolders.has(folderName)) {
+            this.loadedFolders.add(folderName);
+            loadFolderFiles(folderName).catch(e => {
+                this.loadedFolders.delete(folderName); // Tried again when the folder is opened next
+                console.error(`Error loading folder ${folderName}:`, e);
+            });
+        }
 
         // Update active folder button
         const folderButtons = this.galleryPopup.querySelectorAll('.folder-button');
         folderButtons.forEach(button => {
-            button.classList.toggle('active-folder', button.textContent === folderName);
+            button.classList.toggle('active-folder', button.dataset.folder === folderName);
         });
 
         const imageDisplay = this.galleryPopup?.querySelector('.image-display');
@@ -575,7 +609,7 @@ export class Gallery {
         let folderContent = this.folders[folderName]; // Get folder content from nested structure
 
         if (!folderContent || Object.keys(folderContent).length === 0) { // Check if folderContent is empty
-            imageDisplay.textContent = 'No images in this folder.';
+            imageDisplay.textContent = this.folderTree?.[folderName]?.files ? 'Loading images...' : 'No images in this folder.';
             imageDisplay.classList.add('empty-gallery-message');
             return;
         }
@@ -586,7 +620,7 @@ export class Gallery {
         let filteredImages = images;
         if (this.searchText) {
             const searchTerm = this.searchText.toLowerCase();
-            filteredImages = images.filter(imageInfo => imageInfo.name.toLowerCase().includes(searchTerm));
+            filteredImages = images.filter(imageInfo => this.matchesSearch(imageInfo, folderName, searchTerm));
         }
 
 
@@ -615,6 +649,49 @@ export class Gallery {
         this.setupLazyLoading(imageDisplay);
     }
 
+    /**
+     * Returns whether an image matches the search box: by name, or as a server-side search result.
+     */
+    matchesSearch(imageInfo, folderName, searchTerm) {
+        if (imageInfo.name.toLowerCase().includes(searchTerm)) return true;
+        const matches = this.serverMatches;
+        return !!matches && matches.folder === folderName && matches.text === this.searchText && matches.names.has(imageInfo.name);
+    }
+
+    /**
+     * Debounces a /Gallery/search request for the current folder and search text, then redisplays the folder.
+     * Field filters such as model:, lora:, seed: or after: are handled by the server.
+     */
+    scheduleServerSearch() {
+        clearTimeout(this.searchTimer);
+        const folder = this.currentFolder;
+        const text = this.searchText;
+        if (!folder || !text.trim()) {
+            this.serverMatches = null;
+            return;
+        }
+        this.searchTimer = setTimeout(async () => {
+            const params = new URLSearchParams({
+                q: text,
+                folder: folder,
+                limit: 1000,
+                relative_path: this.currentSettings.relativePath || './',
+            });
+            try {
+                const response = await app.api.fetchApi(`/Gallery/search?${params}`);
+                if (!response.ok) return; // Unparsable query or no index: keep the name matches
+                const data = await response.json();
+                const names = new Set(data.files.filter(file => file.folder === folder).map(file => file.name));
+                this.serverMatches = { folder, text, names };
+                if (this.currentFolder === folder && this.searchText === text) {
+                    this.loadFolderImages(folder);
+                }
+            } catch (e) {
+                console.error("Error searching gallery:", e);
+            }
+        }, 250);
+    }
+
     /**
      * Creates and appends an image card to the image display area.
      * @param {HTMLElement} imageDisplay - The container for image cards.
@@ -627,12 +704,10 @@ export class Gallery {
         const imageContainer = document.createElement('div');
         imageContainer.classList.add('image-container-inner');
 
-        if (
-            !imageInfo.name.endsWith(".mp4")
-        ) {
+        if (imageInfo.type !== 'video') {
             const imageElement = document.createElement('img');
             imageElement.alt = imageInfo.name;
-            imageElement.dataset.src = imageInfo.url;
+            imageElement.dataset.src = imageInfo.thumbnail_url || imageInfo.url; // Full resolution is only loaded in fullscreen
             imageElement.classList.add('gallery-image');
             imageElement.onerror = () => {
                 imageElement.src = "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 24 24'%3E%3Cpath d='M0 0h24v24H0z' fill='none'/%3E%3Cpath d='M21 19V5c0-1.1-.9-2-2-2H5c-1.1 0-2 .9-2 2v14c0 1.1.9 2 2 2h14c1.1 0 2-.9 2-2zM8.5 13.5l2.5 3.01L14.5 12l4.5 6H5l3.5-4.5z' fill='%23c0392b'/%3E%3C/svg%3E";
@@ -646,6 +721,10 @@ export class Gallery {
             if (this.currentSettings.autoPlayVideos) imageElement.autoplay = "autoplay";
             imageElement.loop = true;
             imageElement.muted = true;
+            if (imageInfo.thumbnail_url) {
+                imageElement.poster = imageInfo.thumbnail_url; // Server-side poster frame
+                if (!this.currentSettings.autoPlayVideos) imageElement.preload = "none"; // Don't fetch the video until played
+            }
             imageElement.src = imageInfo.url;
             imageElement.classList.add('gallery-media');
             imageElement.onerror = () => {
@@ -676,7 +755,7 @@ export class Gallery {
             infoButton.textContent = 'Info';
             infoButton.onclick = (event) => {
                 event.stopPropagation();
-                this.showInfoWindow(imageInfo.metadata, imageInfo.url);
+                this.showInfoWindow(imageInfo);
             };
             overlay.appendChild(infoButton);
         }
@@ -724,11 +803,35 @@ export class Gallery {
     }
 
     /**
-     * Shows the info window for an image, displaying its metadata.
-     * @param {object} metadata - The metadata of the image.
-     * @param {string} imageUrl - The URL of the image preview.
+     * Fetches the full metadata of a file on demand (listing entries only carry a summary).
+     * @param {object} imageInfo - The listing entry of the file.
+     * @returns {Promise<object>} The metadata object, or an empty object on error.
      */
-    showInfoWindow(metadata, imageUrl) {
+    async fetchMetadata(imageInfo) {
+        const viewParams = new URLSearchParams(imageInfo.url.split('?')[1] || '');
+        const params = new URLSearchParams({
+            filename: viewParams.get('filename') || imageInfo.name,
+            subfolder: viewParams.get('subfolder') || '',
+            relative_path: this.currentSettings.relativePath || './'
+        });
+        try {
+            const response = await app.api.fetchApi(`/Gallery/metadata?${params}`);
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return await response.json();
+        } catch (e) {
+            console.error("Error fetching metadata:", e);
+            return {};
+        }
+    }
+
+    /**
+     * Shows the info window for an image, displaying its listing summary.
+     * @param {object} imageInfo - The listing entry of the image (name, url, summary).
+     */
+    showInfoWindow(imageInfo) {
+        const imageUrl = imageInfo.url;
         this.fullscreenContainer.innerHTML = '';
         this.fullscreenContainer.style.display = 'flex';
 
@@ -742,7 +845,7 @@ export class Gallery {
         infoContent.classList.add('info-content');
         this.fullscreenContainer.appendChild(infoContent);
 
-        this.populateInfoWindowContent(infoContent, metadata, imageUrl);
+        this.populateInfoWindowContent(infoContent, imageInfo, imageUrl);
 
         this.infoWindow.style.display = 'block';
         this.rawMetadataWindow.style.display = 'none';
@@ -752,12 +855,13 @@ export class Gallery {
 
 
     /**
-     * Populates the content of the info window with image metadata.
+     * Populates the content of the info window from the server-side summary of the file.
+     * The full metadata (prompt graph, workflow) is only fetched for the raw metadata view.
      * @param {HTMLElement} infoContent - The container for the info window content.
-     * @param {object} metadata - The image metadata object.
+     * @param {object} imageInfo - The listing entry of the image (name, resolution, size, date, summary).
      * @param {string} imageUrl - The URL of the image preview.
      */
-    populateInfoWindowContent(infoContent, metadata, imageUrl) {
+    populateInfoWindowContent(infoContent, imageInfo, imageUrl) {
         infoContent.innerHTML = '';
 
         // Image Preview
@@ -779,44 +883,38 @@ export class Gallery {
             row.appendChild(labelSpan);
             const valueSpan = document.createElement('span');
             valueSpan.classList.add('metadata-value');
-            valueSpan.textContent = value || 'N/A';
+            valueSpan.textContent = value === 0 ? '0' : (value || 'N/A'); // Seed or denoise may be 0
             row.appendChild(valueSpan);
             metadataTable.appendChild(row);
         };
 
-        addMetadataRow("Filename", metadata.fileinfo?.filename);
-        addMetadataRow("Resolution", metadata.fileinfo?.resolution);
-        addMetadataRow("File Size", metadata.fileinfo?.size);
-        addMetadataRow("Date Created", metadata.fileinfo?.date);
-        addMetadataRow("Model", metadata.prompt?.['1']?.inputs?.ckpt_name || metadata.prompt?.['1']?.inputs?.ckpt_name?.content);
-        addMetadataRow("Positive Prompt", metadata.prompt?.['2']?.inputs?.prompt || metadata.prompt?.['7']?.inputs?.text);
-        addMetadataRow("Negative Prompt", metadata.prompt?.['3']?.inputs?.prompt || metadata.prompt?.['8']?.inputs?.text);
-        addMetadataRow("Sampler", metadata.prompt?.['10']?.inputs?.sampler_name);
-        addMetadataRow("Scheduler", metadata.prompt?.['10']?.inputs?.scheduler);
-        addMetadataRow("Steps", metadata.prompt?.['10']?.inputs?.steps);
-        addMetadataRow("CFG Scale", metadata.prompt?.['10']?.inputs?.cfg);
-        addMetadataRow("Seed", metadata.prompt?.['10']?.inputs?.seed);
-
-        let loras = [];
-        for (const key in metadata.prompt) {
-            if (metadata.prompt[key].class_type === 'LoraLoader') {
-                loras.push(metadata.prompt[key].inputs.lora_name);
-            } else if (metadata.prompt[key].class_type === 'Power Lora Loader (rgthree)') {
-                for (let loraKey in metadata.prompt[key].inputs) {
-                    if (loraKey.startsWith('lora_') && metadata.prompt[key].inputs[loraKey].on) {
-                        loras.push(metadata.prompt[key].inputs[loraKey].lora);
-                    }
-                }
-            }
+        const summary = imageInfo.summary || {};
+        addMetadataRow("Filename", imageInfo.name);
+        addMetadataRow("Resolution", imageInfo.resolution);
+        addMetadataRow("File Size", imageInfo.size);
+        addMetadataRow("Date Created", imageInfo.date);
+        addMetadataRow("Model", summary.model);
+        addMetadataRow("Positive Prompt", summary.positive);
+        addMetadataRow("Negative Prompt", summary.negative);
+        addMetadataRow("Sampler", summary.sampler);
+        addMetadataRow("Scheduler", summary.scheduler);
+        addMetadataRow("Steps", summary.steps);
+        addMetadataRow("CFG Scale", summary.cfg);
+        addMetadataRow("Seed", summary.seed);
+        if (summary.denoise !== undefined && summary.denoise !== 1) {
+            addMetadataRow("Denoise", summary.denoise);
         }
+
+        const loras = (summary.loras || []).map(lora =>
+            typeof lora === 'string' ? lora : (lora.strength != null ? `${lora.name} (${lora.strength})` : lora.name));
         addMetadataRow("LoRAs", loras.length > 0 ? loras.join(', ') : 'N/A');
 
         const rawMetadataButton = document.createElement('button');
         rawMetadataButton.textContent = 'Show Raw Metadata';
         rawMetadataButton.classList.add('raw-metadata-button');
-        rawMetadataButton.onclick = (event) => {
+        rawMetadataButton.onclick = async (event) => {
             event.stopPropagation();
-            this.showRawMetadataWindow(metadata);
+            this.showRawMetadataWindow(await this.fetchMetadata(imageInfo));
         };
         infoContent.appendChild(rawMetadataButton);
     }
@@ -973,6 +1071,8 @@ export class Gallery {
      */
     clearGallery() {
         this.folders = {};
+        this.folderTree = null;
+        this.loadedFolders = new Set();
         if (this.galleryPopup) {
             this.populateFolderNavigation(this.galleryPopup.querySelector('.folder-navigation'));
         }
@@ -984,11 +1084,68 @@ export class Gallery {
      */
     initializeFolders(initialFolders) {
         this.folders = initialFolders;
+        this.folderTree = null;
+        if (this.galleryPopup) {
+            this.populateFolderNavigation(this.galleryPopup.querySelector('.folder-navigation'));
+        }
+    }
+
+    /**
+     * Initializes the gallery from the /Gallery/folders tree: every folder holding files is shown right
+     * away, its files are listed when it is opened.
+     * @param {object} tree - Folder summaries by folder name ({ files, bytes, types, newest, ... }).
+     */
+    initializeTree(tree) {
+        this.folders = {};
+        this.loadedFolders = new Set();
+        this.updateTree(tree);
+    }
+
+    /**
+     * Replaces the folder summaries after changes, adding folders that gained files and dropping
+     * unopened ones that have none left.
+     * @param {object} tree - Folder summaries by folder name.
+     */
+    updateTree(tree) {
+        this.folderTree = tree;
+        for (const folderName in tree) {
+            if (tree[folderName].files > 0 && !this.folders[folderName]) {
+                this.folders[folderName] = {};
+            }
+        }
+        for (const folderName in this.folders) {
+            if (!tree[folderName]?.files && !this.loadedFolders.has(folderName)) {
+                delete this.folders[folderName];
+            }
+        }
         if (this.galleryPopup) {
             this.populateFolderNavigation(this.galleryPopup.querySelector('.folder-navigation'));
         }
     }
 
+    /**
+     * Merges a chunk of streamed listing records into the gallery data and refreshes the view.
+     * @param {object} folders - Files in nested dictionary format: { folderName: { fileName: fileData } }.
+     */
+    appendFolders(folders) {
+        let newFolder = false;
+        for (const folderName in folders) {
+            if (!this.folders[folderName]) {
+                this.folders[folderName] = {};
+                newFolder = true;
+            }
+            Object.assign(this.folders[folderName], folders[folderName]);
+        }
+        if (this.galleryPopup) {
+            if (newFolder) {
+                this.populateFolderNavigation(this.galleryPopup.querySelector('.folder-navigation'));
+            }
+            if (this.currentFolder && folders[this.currentFolder]) {
+                this.loadFolderImages(this.currentFolder);
+            }
+        }
+    }
+
     /**
      * Updates the gallery with changes received from the server.
      * @param {object} changes - An object describing the changes, in format:
@@ -1009,6 +1166,9 @@ export class Gallery {
                  this.folders[folderName] = {}; // Initialize folder if it doesn't exist yet
                  this.populateFolderNavigation(this.galleryPopup.querySelector('.folder-navigation')); // Re-populate navigation to show new folder
             }
+            if (this.folderTree && !this.loadedFolders.has(folderName)) {
+                continue; // Not opened yet, listed in full when it is
+            }
             if (this.folders[folderName]) { // Proceed only if folder exists (or was just created)
                 for (const filename in folderChanges) {
                     const fileChange = folderChanges[filename];
@@ -1099,11 +1259,18 @@ export class Gallery {
     loadFolderImages(folderName) {
         if (!folderName) return;
         this.currentFolder = folderName;
+        if (this.folderTree && !this.loadedFolders.has(folderName)) {
+            this.loadedFolders.add(folderName);
+            loadFolderFiles(folderName).catch(e => {
+                this.loadedFolders.delete(folderName); // Tried again when the folder is opened next
+                console.error(`Error loading folder ${folderName}:`, e);
+            });
+        }
 
         // Update active folder button
         const folderButtons = this.galleryPopup.querySelectorAll('.folder-button');
         folderButtons.forEach(button => {
-            button.classList.toggle('active-folder', button.textContent === folderName);
+            button.classList.toggle('active-folder', button.dataset.folder === folderName);
         });
 
         const imageDisplay = this.galleryPopup?.querySelector('.image-display');
@@ -1113,7 +1280,7 @@ export class Gallery {
         let folderContent = this.folders[folderName]; // Get folder content from nested structure
 
         if (!folderContent || Object.keys(folderContent).length === 0) { // Check if folderContent is empty
-            imageDisplay.textContent = 'No images in this folder.';
+            imageDisplay.textContent = this.folderTree?.[folderName]?.files ? 'Loading images...' : 'No images in this folder.';
             imageDisplay.classList.add('empty-gallery-message');
             return;
         }
@@ -1124,7 +1291,7 @@ export class Gallery {
         let filteredImages = images;
         if (this.searchText) {
             const searchTerm = this.searchText.toLowerCase();
-            filteredImages = images.filter(imageInfo => imageInfo.name.toLowerCase().includes(searchTerm));
+            filteredImages = images.filter(imageInfo => this.matchesSearch(imageInfo, folderName, searchTerm));
         }
 
 
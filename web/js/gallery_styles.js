@@ -100,6 +100,7 @@ export const galleryStyles = `
     }
     .folder-button:hover, .folder-button.active { background-color: #777; }
     .active-folder { background-color: #3498db; color: white; }
+    .folder-count { float: right; margin-left: 6px; opacity: 0.7; font-size: 0.85em; }
 
     .image-display {
         flex: 1; padding-left: 20px;
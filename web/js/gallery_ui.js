@@ -3,6 +3,11 @@ import { Gallery } from './gallery.js';
 import { GallerySettings } from './gallery_settings.js'; // Import GallerySettings
 let gallery;
 let gallerySettingsInstance;
+let lastSeq = null; // Sequence number of the last change applied, used to catch up after gaps
+let galleryPath = null; // Folder (below the root) whose change journal lastSeq belongs to, other folders' changes are ignored
+const GALLERY_ROOT = "output"; // Root the gallery shows, other roots' changes are ignored
+const FOLDER_PAGE_SIZE = 200; // Files per request when a folder is opened
+let treeRefreshTimer = null;
 
 /**
  * Starts monitoring the gallery output directory via API call.
@@ -12,7 +17,7 @@ function startMonitoring(relativePath) {
     app.api.fetchApi("/Gallery/monitor/start", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ relative_path: relativePath })
+        body: JSON.stringify({ relative_path: relativePath, root: GALLERY_ROOT, client_id: app.api.clientId })
     }).then(response => {
         if (response.ok) {
             console.log(`Gallery monitoring started for path: ${relativePath}`);
@@ -23,11 +28,13 @@ function startMonitoring(relativePath) {
 }
 
 /**
- * Stops monitoring the gallery output directory via API call.
+ * Unsubscribes this client from the gallery monitor via API call (the monitor stops once no client uses it).
  */
 function stopMonitoring() {
     app.api.fetchApi("/Gallery/monitor/stop", {
         method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ root: GALLERY_ROOT, client_id: app.api.clientId })
     }).then(response => {
         if (response.ok) {
             console.log("Gallery monitoring stopped.");
@@ -37,23 +44,138 @@ function stopMonitoring() {
     });
 }
 
+/**
+ * Loads the gallery as an NDJSON stream, adding tiles while the server is still scanning.
+ * Falls back to the single JSON document when the response isn't streamed.
+ * @param {string} relativePath - The relative path to load.
+ */
+async function loadGallery(relativePath) {
+    const response = await app.api.fetchApi(`/Gallery/images?relative_path=${encodeURIComponent(relativePath)}&stream=1`, {
+        headers: { "Accept": "application/x-ndjson" }
+    });
+    if (!response.body || !(response.headers.get("Content-Type") || "").includes("application/x-ndjson")) {
+        let data;
+        try {
+            data = JSON.parse(await response.text());
+        } catch (e) {
+            console.error("Error parsing JSON response:", e);
+            data = { folders: {} };
+        }
+        lastSeq = data.seq ?? null;
+        galleryPath = data.path ?? null;
+        gallery.initializeFolders(data.folders || {});
+        return;
+    }
+
+    gallery.initializeFolders({});
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split("\n");
+        buffer = done ? "" : lines.pop(); // Keep the incomplete last line for the next chunk
+        const chunk = {};
+        for (const line of lines) {
+            if (!line) continue;
+            const record = JSON.parse(line);
+            if (record.file) {
+                (chunk[record.folder] ??= {})[record.name] = record.file;
+            } else if (record.seq !== undefined) {
+                lastSeq = record.seq;
+                galleryPath = record.path ?? null;
+            } else if (record.error) {
+                console.error("Error streaming gallery:", record.error);
+            }
+        }
+        if (Object.keys(chunk).length > 0) {
+            gallery.appendFolders(chunk);
+        }
+        if (done) break;
+    }
+}
+
+/**
+ * Loads the folder tree with per-folder counts, so the folders show before any file is listed.
+ * Falls back to loading every file when the server has no /Gallery/folders.
+ * @param {string} relativePath - The relative path to load.
+ */
+async function loadFolderTree(relativePath) {
+    const response = await app.api.fetchApi(`/Gallery/folders?relative_path=${encodeURIComponent(relativePath)}&root=${GALLERY_ROOT}`);
+    if (!response.ok) {
+        await loadGallery(relativePath);
+        return;
+    }
+    const data = await response.json();
+    lastSeq = data.seq ?? null;
+    galleryPath = data.path ?? null;
+    gallery.initializeTree(data.folders || {});
+}
+
+/**
+ * Fetches the folder tree again shortly after changes, to update the counts of folders not opened yet.
+ */
+function scheduleTreeRefresh() {
+    if (!gallery || !gallery.folderTree) return;
+    clearTimeout(treeRefreshTimer);
+    treeRefreshTimer = setTimeout(() => {
+        const relativePath = gallery.currentSettings.relativePath || './';
+        app.api.fetchApi(`/Gallery/folders?relative_path=${encodeURIComponent(relativePath)}&root=${GALLERY_ROOT}`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => { if (data && gallery.folderTree) gallery.updateTree(data.folders || {}); })
+            .catch(e => console.error("Error refreshing gallery folders:", e));
+    }, 1000);
+}
+
+/**
+ * Lists one folder page by page through the paged /Gallery/images mode, adding each page as it arrives.
+ * @param {string} folderName - The folder key, as in the folder tree.
+ */
+export async function loadFolderFiles(folderName) {
+    const relativePath = gallery.currentSettings.relativePath || './';
+    let cursor = null;
+    do {
+        const params = new URLSearchParams({ relative_path: relativePath, root: GALLERY_ROOT, folder: folderName, limit: FOLDER_PAGE_SIZE });
+        if (cursor) params.set("cursor", cursor);
+        const response = await app.api.fetchApi(`/Gallery/images?${params}`);
+        if (!response.ok) throw new Error(`${response.status} ${response.statusText}`);
+        const page = await response.json();
+        const files = {};
+        for (const file of page.files) {
+            files[file.name] = file;
+        }
+        gallery.appendFolders({ [folderName]: files });
+        cursor = page.next_cursor;
+    } while (cursor);
+}
+
 export function resetGallery(relativePath) {
   gallery.clearGallery();
   startMonitoring(relativePath);
+  loadFolderTree(relativePath).catch(e => console.error("Error loading gallery:", e));
+}
 
-  app.api.fetchApi(`/Gallery/images?relative_path=${encodeURIComponent(relativePath)}`)
-      .then(response => response.text())
-      .then(text => {
-          try {
-              return JSON.parse(text);
-          } catch (e) {
-              console.error("Error parsing JSON response:", e);
-              return { folders: {} };
-          }
-      })
-      .then(data => {
-          gallery.initializeFolders(data.folders || {});
-      });
+/**
+ * Fetches the changes missed since lastSeq (after a reconnect or a skipped message) and applies them.
+ */
+function catchUpChanges() {
+    if (!gallery || lastSeq === null) return;
+    const relativePath = gallery.currentSettings.relativePath || './';
+    app.api.fetchApi(`/Gallery/changes?since=${lastSeq}&root=${GALLERY_ROOT}&relative_path=${encodeURIComponent(relativePath)}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.reset) { // History no longer covers our position, reload everything
+                resetGallery(gallery.currentSettings.relativePath);
+                return;
+            }
+            if (Object.keys(data.folders || {}).length > 0) {
+                gallery.updateImages(data);
+                scheduleTreeRefresh();
+            }
+            lastSeq = data.seq;
+        })
+        .catch(e => console.error("Error fetching gallery changes:", e));
 }
 
 app.registerExtension({
@@ -78,21 +200,7 @@ app.registerExtension({
             }
 
             startMonitoring(initialSettings.relativePath);
-
-            app.api.fetchApi(`/Gallery/images?relative_path=${encodeURIComponent(initialSettings.relativePath)}`)
-                .then(response => response.text())
-                .then(text => {
-                    try {
-                        return JSON.parse(text);
-                    } catch (e) {
-                        console.error("Error parsing JSON response:", e);
-                        return { folders: {} };
-                    }
-                })
-                .then(data => {
-                    console.log("data:", data);
-                    gallery.initializeFolders(data.folders || {});
-                });
+            loadFolderTree(initialSettings.relativePath).catch(e => console.error("Error loading gallery:", e));
         }
     },
     async nodeCreated(node) {
@@ -114,13 +222,31 @@ app.registerExtension({
 
 app.api.addEventListener("Gallery.file_change", (event) => {
     console.log("file_change:", event.detail);
+    if (event.detail && event.detail.root && event.detail.root !== GALLERY_ROOT) return;
+    // Each monitored folder numbers its own changes with folder keys relative to it
+    if (event.detail && event.detail.path !== undefined && event.detail.path !== galleryPath) return;
     if (gallery && event.detail) {
+        if (lastSeq !== null && event.detail.first_seq > lastSeq + 1) {
+            catchUpChanges(); // A message was missed, fetch the whole gap instead
+            return;
+        }
         gallery.updateImages(event.detail);
+        scheduleTreeRefresh();
+        if (event.detail.seq !== undefined) lastSeq = event.detail.seq;
     } else {
         console.warn("Gallery update event received without change data.");
     }
 });
 
+app.api.addEventListener("reconnected", () => {
+    catchUpChanges();
+});
+
+window.addEventListener("pagehide", () => {
+    // fetchApi may not finish while the page unloads, a beacon does
+    navigator.sendBeacon(app.api.apiURL("/Gallery/monitor/stop"), JSON.stringify({ client_id: app.api.clientId }));
+});
+
 
 app.api.addEventListener("Gallery.update", (event) => {
     if (gallery) {